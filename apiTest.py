@@ -1,6 +1,9 @@
 import requests
 import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:5000/api"
 
@@ -10,6 +13,7 @@ user_id = None
 note_id = None
 tag_id = None
 test_user_email = None
+sync_token = None
 
 
 def print_result(test_name, success, response=None):
@@ -47,6 +51,23 @@ def test_health():
         return False
 
 
+def test_connection_pool():
+    """Test that requests borrow pooled connections instead of opening new ones."""
+    requests.get(f"{BASE_URL}/health")
+    before = requests.get(f"{BASE_URL}/metrics").json()['shards']
+    for _ in range(10):
+        requests.get(f"{BASE_URL}/health")
+    r = requests.get(f"{BASE_URL}/metrics")
+    after = r.json()['shards']
+
+    catalog_before, catalog_after = before['pools']['0'], after['pools']['0']
+    success = (r.status_code == 200 and after['count'] >= 1 and
+               catalog_after['requests_num'] >= catalog_before['requests_num'] + 10 and
+               catalog_after['connections_num'] == catalog_before['connections_num'])
+    print_result("Connection Pool", success, r if not success else None)
+    return success
+
+
 # ==================== AUTH TESTS ====================
 
 def test_register():
@@ -279,6 +300,22 @@ def test_create_note():
         return False
 
 
+def test_stats_refreshed_in_background():
+    """Test that the stats recount queued by a note write catches up."""
+    notes = requests.get(f"{BASE_URL}/notes", headers=get_headers()).json()['notes']
+    for _ in range(50):
+        r = requests.get(f"{BASE_URL}/users/{user_id}/stats", headers=get_headers())
+        if r.status_code == 200 and r.json()['stats']['total_notes'] == len(notes):
+            break
+        time.sleep(0.1)
+    jobs = requests.get(f"{BASE_URL}/metrics").json()['jobs']
+
+    success = (r.status_code == 200 and r.json()['stats']['total_notes'] == len(notes) and
+               jobs['completed'] > 0 and jobs['failed'] == 0)
+    print_result("Stats Refreshed In Background", success, r if not success else None)
+    return success
+
+
 def test_create_note_no_title():
     """Test create note without title."""
     data = {
@@ -302,6 +339,32 @@ def test_create_note_invalid_status():
     return success
 
 
+def test_create_note_with_tags():
+    """Test that a note's tags are assigned with it and that an unknown tag id writes nothing."""
+    if not tag_id:
+        print_result("Create Note With Tags", False)
+        return False
+
+    title = f"Tagged Note {int(time.time())}"
+    r = requests.post(f"{BASE_URL}/notes", json={"title": title, "tag_ids": [tag_id, tag_id]},
+                      headers=get_headers())
+    r_unknown = requests.post(f"{BASE_URL}/notes", json={"title": f"{title} unknown", "tag_ids": [tag_id, 2147483647]},
+                              headers=get_headers())
+    r_invalid = requests.post(f"{BASE_URL}/notes", json={"title": title, "tag_ids": ["abc"]}, headers=get_headers())
+    r_list = requests.get(f"{BASE_URL}/notes", params={"sort_by": "created_date", "limit": 10}, headers=get_headers())
+
+    success = (r.status_code == 201 and [t['tag_id'] for t in r.json()['note']['tags']] == [tag_id] and
+               r_unknown.status_code == 400 and r_invalid.status_code == 400 and
+               r_list.status_code == 200 and
+               all(n['title'] != f"{title} unknown" for n in r_list.json()['notes']))
+
+    if r.status_code == 201:
+        requests.delete(f"{BASE_URL}/notes/{r.json()['note']['note_id']}", headers=get_headers())
+
+    print_result("Create Note With Tags", success, r_unknown if not success else None)
+    return success
+
+
 def test_get_notes():
     """Test get all notes."""
     r = requests.get(f"{BASE_URL}/notes", headers=get_headers())
@@ -318,6 +381,113 @@ def test_get_notes_filtered():
     return success
 
 
+def test_get_notes_paginated():
+    """Test get notes with limit/offset."""
+    r = requests.get(f"{BASE_URL}/notes?limit=1&offset=0", headers=get_headers())
+    success = r.status_code == 200 and len(r.json().get('notes', [])) <= 1
+    print_result("Get Notes Paginated", success, r if not success else None)
+    return success
+
+
+def test_get_notes_invalid_limit():
+    """Test get notes with an out-of-range limit."""
+    r = requests.get(f"{BASE_URL}/notes?limit=0", headers=get_headers())
+    success = r.status_code == 400
+    print_result("Get Notes Invalid Limit (should fail)", success, r if not success else None)
+    return success
+
+
+def test_get_notes_multi_tag_filter():
+    """Test get notes filtered by several tags with all/none modes."""
+    if not note_id or not tag_id:
+        print_result("Get Notes Multi-Tag Filter", False)
+        return False
+
+    r_all = requests.get(f"{BASE_URL}/notes?tag_ids={tag_id}&tag_mode=all", headers=get_headers())
+    r_none = requests.get(f"{BASE_URL}/notes?tag_ids={tag_id}&tag_mode=none", headers=get_headers())
+    success = (r_all.status_code == 200 and r_none.status_code == 200
+               and note_id in [n['note_id'] for n in r_all.json()['notes']]
+               and note_id not in [n['note_id'] for n in r_none.json()['notes']])
+    print_result("Get Notes Multi-Tag Filter", success, r_all if not success else None)
+    return success
+
+
+def test_get_notes_invalid_tag_mode():
+    """Test get notes with an unknown tag_mode."""
+    r = requests.get(f"{BASE_URL}/notes?tag_ids=1,2&tag_mode=xor", headers=get_headers())
+    success = r.status_code == 400
+    print_result("Get Notes Invalid Tag Mode (should fail)", success, r if not success else None)
+    return success
+
+
+def test_get_notes_date_range():
+    """Test get notes within created/modified date windows."""
+    if not note_id:
+        print_result("Get Notes Date Range", False)
+        return False
+
+    r_in = requests.get(f"{BASE_URL}/notes?created_after=2000-01-01&modified_before=2999-01-01T00:00:00Z",
+                        headers=get_headers())
+    r_out = requests.get(f"{BASE_URL}/notes?created_after=2999-01-01", headers=get_headers())
+    r_invalid = requests.get(f"{BASE_URL}/notes?created_after=2024-02-01&created_before=2024-01-01",
+                             headers=get_headers())
+    success = (r_in.status_code == 200 and r_out.status_code == 200
+               and note_id in [n['note_id'] for n in r_in.json()['notes']]
+               and r_out.json()['notes'] == []
+               and r_invalid.status_code == 400)
+    print_result("Get Notes Date Range", success, r_invalid if not success else None)
+    return success
+
+
+def test_get_notes_histogram():
+    """Test note counts per day and week."""
+    notes = requests.get(f"{BASE_URL}/notes", headers=get_headers()).json().get('notes', [])
+    r_day = requests.get(f"{BASE_URL}/notes/histogram?interval=day", headers=get_headers())
+    r_week = requests.get(f"{BASE_URL}/notes/histogram?interval=week&field=last_modified", headers=get_headers())
+    r_invalid = requests.get(f"{BASE_URL}/notes/histogram?interval=fortnight", headers=get_headers())
+    success = (r_day.status_code == 200 and r_week.status_code == 200
+               and r_day.json()['total'] == len(notes) == r_week.json()['total']
+               and sum(b['count'] for b in r_day.json()['buckets']) == len(notes)
+               and r_invalid.status_code == 400)
+    print_result("Get Notes Histogram", success, r_day if not success else None)
+    return success
+
+
+def test_get_notes_facets():
+    """Test get notes with facet counts."""
+    r = requests.get(f"{BASE_URL}/notes?facets=true", headers=get_headers())
+    facets = r.json().get('facets', {}) if r.status_code == 200 else {}
+    success = (r.status_code == 200 and 'status' in facets and 'tags' in facets
+               and facets.get('total') == len(r.json()['notes']))
+    print_result("Get Notes Facets", success, r if not success else None)
+    return success
+
+
+def test_get_notes_coalesced():
+    """Test that identical concurrent listings share one execution and return identical responses."""
+    urls = [f"{BASE_URL}/notes?facets=true&sort_by=title", f"{BASE_URL}/notes?sort_by=title&facets=true"] * 4
+    start = threading.Barrier(len(urls))
+
+    def fetch(url):
+        start.wait()
+        return requests.get(url, headers=get_headers())
+
+    # A round can finish before any request overlaps another, so try a few
+    for _ in range(10):
+        before = requests.get(f"{BASE_URL}/metrics").json()['coalescing']
+        with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+            responses = list(pool.map(fetch, urls))
+        after = requests.get(f"{BASE_URL}/metrics").json()['coalescing']
+        shared = after['shared'] - before['shared']
+        calls = (after['executed'] - before['executed']) + shared
+        success = (all(r.status_code == 200 for r in responses) and
+                   len({r.content for r in responses}) == 1 and calls == len(urls) and shared > 0)
+        if success:
+            break
+    print_result("Get Notes Coalesced", success, responses[0] if not success else None)
+    return success
+
+
 def test_get_note():
     """Test get single note."""
     if not note_id:
@@ -346,6 +516,237 @@ def test_update_note():
     return success
 
 
+def test_update_note_conflict():
+    """Test that a write based on a stale version is rejected."""
+    if not note_id:
+        print_result("Update Note Conflict", False)
+        return False
+
+    r = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers())
+    etag = r.headers.get('ETag')
+    headers = dict(get_headers(), **{'If-Match': etag})
+
+    r1 = requests.put(f"{BASE_URL}/notes/{note_id}", json={"content": "First writer"}, headers=headers)
+    r2 = requests.put(f"{BASE_URL}/notes/{note_id}", json={"content": "Second writer"}, headers=headers)
+    success = (etag is not None and r1.status_code == 200 and r2.status_code == 409
+               and r2.json().get('current_version') == r1.json()['note']['version'])
+    print_result("Update Note Conflict", success, r2 if not success else None)
+    return success
+
+
+def test_update_note_tags():
+    """Test that replacing a note's tags keeps the ones that stay and rejects unknown ids."""
+    if not note_id or not tag_id:
+        print_result("Update Note Tags", False)
+        return False
+
+    other = requests.post(f"{BASE_URL}/tags", json={"tag_name": f"diff-tag-{int(time.time())}", "color": "#3366FF"},
+                          headers=get_headers())
+    if other.status_code != 201:
+        print_result("Update Note Tags", False, other)
+        return False
+    other_id = other.json()['tag']['tag_id']
+
+    def assigned():
+        r = requests.get(f"{BASE_URL}/notes/{note_id}/tags", headers=get_headers())
+        return {t['tag_id']: t['assigned_date'] for t in r.json()['tags']}
+
+    url = f"{BASE_URL}/notes/{note_id}"
+    before = assigned()
+    r1 = requests.put(url, json={"tag_ids": [tag_id, other_id]}, headers=get_headers())
+    after = assigned()
+    r2 = requests.put(url, json={"tag_ids": [other_id]}, headers=get_headers())
+    r_unknown = requests.put(url, json={"tag_ids": [tag_id, 2147483647]}, headers=get_headers())
+    final = assigned()
+
+    requests.put(url, json={"tag_ids": list(before)}, headers=get_headers())
+    requests.delete(f"{BASE_URL}/tags/{other_id}", headers=get_headers())
+
+    success = (tag_id in before and r1.status_code == 200 and
+               sorted(t['tag_id'] for t in r1.json()['note']['tags']) == sorted([tag_id, other_id]) and
+               after[tag_id] == before[tag_id] and
+               r2.status_code == 200 and [t['tag_id'] for t in r2.json()['note']['tags']] == [other_id] and
+               r_unknown.status_code == 400 and list(final) == [other_id])
+    print_result("Update Note Tags", success, r_unknown if not success else None)
+    return success
+
+
+def test_update_note_invalid_tag_ids():
+    """Test that malformed tag_ids in an update are rejected with 400."""
+    if not note_id:
+        print_result("Update Note Invalid Tag Ids (should fail)", False)
+        return False
+
+    bad_values = ["abc", 5, [None], ["abc"]]
+    responses = [requests.put(f"{BASE_URL}/notes/{note_id}", json={"tag_ids": value}, headers=get_headers())
+                 for value in bad_values]
+    success = all(r.status_code == 400 and r.json()['error'] == 'tag_ids must be a list of integers'
+                  for r in responses)
+    failed = next((r for r in responses if r.status_code != 400), responses[0])
+    print_result("Update Note Invalid Tag Ids (should fail)", success, failed if not success else None)
+    return success
+
+
+def test_large_note_content():
+    """Test that a large body is offloaded, listed as a preview and readable by range."""
+    if not note_id:
+        print_result("Large Note Content", False)
+        return False
+
+    content = ''.join(f"Line {i} of a very long note\n" for i in range(5000))
+    r = requests.put(f"{BASE_URL}/notes/{note_id}", json={"content": content}, headers=get_headers())
+    listed = r.json().get('note', {})
+
+    r1 = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers())
+    r2 = requests.get(f"{BASE_URL}/notes/{note_id}?offset=50000&length=1000", headers=get_headers())
+    success = (r.status_code == 200 and listed.get('content_truncated') is True
+               and listed.get('content_length') == len(content)
+               and r1.json()['note']['content'] == content
+               and r2.json()['note']['content'] == content[50000:51000]
+               and r2.json()['note']['next_offset'] == 51000)
+    print_result("Large Note Content", success, r2 if not success else None)
+    return success
+
+
+def test_stream_note_content():
+    """Test replacing a note body with a streamed text upload."""
+    if not note_id:
+        print_result("Stream Note Content", False)
+        return False
+
+    content = "Streamed line ✓\n" * 20000
+    chunks = (content[i:i + 4096].encode('utf-8') for i in range(0, len(content), 4096))
+    headers = dict(get_headers(), **{'Content-Type': 'text/plain; charset=utf-8'})
+    r = requests.put(f"{BASE_URL}/notes/{note_id}/content", data=chunks, headers=headers)
+
+    r1 = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers())
+    success = (r.status_code == 200 and r.json()['note']['content_length'] == len(content)
+               and r1.json()['note']['content'] == content)
+    print_result("Stream Note Content", success, r if not success else None)
+    return success
+
+
+def test_patch_note_content():
+    """Test applying text edits to an inline note body and rejecting a stale base."""
+    if not note_id:
+        print_result("Patch Note Content", False)
+        return False
+
+    r = requests.put(f"{BASE_URL}/notes/{note_id}", json={"content": "Hello world"}, headers=get_headers())
+    version = r.json()['note']['version']
+    edits = [{"offset": 0, "delete": 5, "insert": "Goodbye"}, {"offset": 11, "delete": 0, "insert": "!"}]
+
+    r1 = requests.patch(f"{BASE_URL}/notes/{note_id}/content",
+                        json={"base_version": version, "edits": edits}, headers=get_headers())
+    r2 = requests.patch(f"{BASE_URL}/notes/{note_id}/content",
+                        json={"base_version": version, "edits": edits}, headers=get_headers())
+    content = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers()).json()['note']['content']
+    success = r1.status_code == 200 and r2.status_code == 409 and content == "Goodbye world!"
+    print_result("Patch Note Content", success, r1 if not success else None)
+    return success
+
+
+def test_patch_large_note_content():
+    """Test applying a small edit to an offloaded note body."""
+    if not note_id:
+        print_result("Patch Large Note Content", False)
+        return False
+
+    r = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers())
+    note = r.json()['note']
+    offset = note['content_length'] - 10
+    r1 = requests.patch(f"{BASE_URL}/notes/{note_id}/content", json={
+        "base_version": note['version'],
+        "edits": [{"offset": offset, "delete": 1, "insert": "EDITED"}]
+    }, headers=get_headers())
+
+    expected = note['content'][:offset] + "EDITED" + note['content'][offset + 1:]
+    content = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers()).json()['note']['content']
+    success = r1.status_code == 200 and content == expected
+    print_result("Patch Large Note Content", success, r1 if not success else None)
+    return success
+
+
+def test_note_revisions():
+    """Test that each body change is listed as a revision and can be rebuilt."""
+    if not note_id:
+        print_result("Note Revisions", False)
+        return False
+
+    versions = []
+    for content in ["Revision one", "Revision two"]:
+        r = requests.put(f"{BASE_URL}/notes/{note_id}", json={"content": content}, headers=get_headers())
+        versions.append(r.json()['note']['version'])
+    r = requests.patch(f"{BASE_URL}/notes/{note_id}/content", json={
+        "base_version": versions[-1],
+        "edits": [{"offset": 9, "delete": 3, "insert": "three"}]
+    }, headers=get_headers())
+
+    r1 = requests.get(f"{BASE_URL}/notes/{note_id}/revisions", headers=get_headers())
+    listed = [rev['version'] for rev in r1.json().get('revisions', [])]
+    bodies = [requests.get(f"{BASE_URL}/notes/{note_id}/revisions/{v}", headers=get_headers())
+              .json().get('revision', {}).get('content') for v in versions]
+    r2 = requests.get(f"{BASE_URL}/notes/{note_id}/revisions/0", headers=get_headers())
+
+    success = (r.status_code == 200 and r1.status_code == 200 and
+               listed[:2] == versions[::-1] and bodies == ["Revision one", "Revision two"] and
+               r2.status_code == 404)
+    print_result("Note Revisions", success, r1 if not success else None)
+    return success
+
+
+def test_note_draft():
+    """Test that a burst of autosaved drafts is written as one update."""
+    if not note_id:
+        print_result("Note Draft", False)
+        return False
+
+    version = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers()).json()['note']['version']
+    statuses = [requests.put(f"{BASE_URL}/notes/{note_id}/draft",
+                             json={"base_version": version, "content": f"Draft {i}"},
+                             headers=get_headers()).status_code for i in range(5)]
+    r = requests.post(f"{BASE_URL}/notes/{note_id}/draft/flush",
+                      json={"base_version": version}, headers=get_headers())
+    note = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers()).json()['note']
+
+    success = (statuses == [202] * 5 and r.status_code == 200 and
+               r.json()['note']['version'] == version + 1 and
+               note['content'] == "Draft 4" and note['version'] == version + 1)
+    print_result("Note Draft", success, r if not success else None)
+    return success
+
+
+def test_note_draft_other_user():
+    """Test that reading someone else's note does not write its pending draft."""
+    if not note_id:
+        print_result("Note Draft Other User", False)
+        return False
+
+    other = requests.post(f"{BASE_URL}/auth/register", json={
+        "name": "Other User",
+        "email": f"otheruser_{int(time.time() * 1000)}@example.com",
+        "password": "testpass123"
+    })
+    if other.status_code != 201:
+        print_result("Note Draft Other User", False, other)
+        return False
+    other_headers = {"Content-Type": "application/json", "Authorization": f"Bearer {other.json()['token']}"}
+
+    version = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers()).json()['note']['version']
+    requests.put(f"{BASE_URL}/notes/{note_id}/draft",
+                 json={"base_version": version, "content": "Private draft"}, headers=get_headers())
+    pending = requests.get(f"{BASE_URL}/metrics").json()['drafts']['pending']
+    r = requests.get(f"{BASE_URL}/notes/{note_id}", headers=other_headers)
+    still_pending = requests.get(f"{BASE_URL}/metrics").json()['drafts']['pending']
+    saved = requests.post(f"{BASE_URL}/notes/{note_id}/draft/flush",
+                          json={"base_version": version}, headers=get_headers())
+
+    success = (r.status_code == 404 and pending >= 1 and still_pending == pending
+               and saved.status_code == 200 and saved.json()['note']['version'] == version + 1)
+    print_result("Note Draft Other User", success, r if not success else None)
+    return success
+
+
 def test_update_note_status_pinned():
     """Test pin note."""
     if not note_id:
@@ -372,6 +773,32 @@ def test_update_note_status_archived():
     return success
 
 
+def test_get_notes_archived_filter():
+    """Test listing archived notes on their own, without them, and with everything else."""
+    if not note_id:
+        print_result("Get Notes Archived Filter", False)
+        return False
+
+    listed = {}
+    for archived in ['include', 'exclude', 'only']:
+        r = requests.get(f"{BASE_URL}/notes?archived={archived}&limit=500", headers=get_headers())
+        if r.status_code != 200:
+            print_result("Get Notes Archived Filter", False, r)
+            return False
+        listed[archived] = r.json()['notes']
+
+    r_invalid = requests.get(f"{BASE_URL}/notes?archived=sometimes", headers=get_headers())
+    success = (note_id in [n['note_id'] for n in listed['include']]
+               and note_id in [n['note_id'] for n in listed['only']]
+               and note_id not in [n['note_id'] for n in listed['exclude']]
+               and all(n['status'] == 'Archived' for n in listed['only'])
+               and all(n['status'] != 'Archived' for n in listed['exclude'])
+               and len(listed['include']) == len(listed['only']) + len(listed['exclude'])
+               and r_invalid.status_code == 400)
+    print_result("Get Notes Archived Filter", success, r_invalid if not success else None)
+    return success
+
+
 def test_update_note_status_active():
     """Test activate note."""
     if not note_id:
@@ -445,6 +872,14 @@ def test_search_notes():
     return success
 
 
+def test_search_notes_facets():
+    """Test search with facet counts."""
+    r = requests.get(f"{BASE_URL}/search?q=test&facets=true", headers=get_headers())
+    success = r.status_code == 200 and r.json().get('facets', {}).get('total') == r.json().get('count')
+    print_result("Search Notes Facets", success, r if not success else None)
+    return success
+
+
 def test_search_notes_no_query():
     """Test search without query."""
     r = requests.get(f"{BASE_URL}/search", headers=get_headers())
@@ -453,6 +888,147 @@ def test_search_notes_no_query():
     return success
 
 
+def test_search_chunk_boundary():
+    """Test that search finds terms crossing the offload threshold and a chunk boundary of a large body."""
+    stamp = int(time.time())
+    terms = [f"thresholdedge{stamp}", f"chunkedge{stamp}"]
+    content = ('a' * (16384 - 5) + terms[0]).ljust(32768 - 5, 'b') + terms[1] + 'c' * 1000
+    r = requests.post(f"{BASE_URL}/notes", json={"title": "Chunk Boundary", "content": content}, headers=get_headers())
+    if r.status_code != 201:
+        print_result("Search Chunk Boundary", False, r)
+        return False
+    created_id = r.json()['note']['note_id']
+
+    results = [requests.get(f"{BASE_URL}/search", params={"q": term}, headers=get_headers()) for term in terms]
+    requests.delete(f"{BASE_URL}/notes/{created_id}", headers=get_headers())
+
+    success = (r.json()['note']['content_truncated'] is True and
+               all(res.status_code == 200 and [n['note_id'] for n in res.json()['notes']] == [created_id]
+                   for res in results))
+    print_result("Search Chunk Boundary", success, results[1] if not success else None)
+    return success
+
+
+def test_search_cache():
+    """Test that repeated searches hit the cache, pages slice it and writes invalidate it."""
+    term = f"cachedterm{int(time.time())}"
+    first = requests.post(f"{BASE_URL}/notes", json={"title": f"{term} one"}, headers=get_headers())
+    if first.status_code != 201:
+        print_result("Search Cache", False, first)
+        return False
+
+    # The first search starts the change listener; results are cached once it is connected
+    requests.get(f"{BASE_URL}/search", params={"q": term}, headers=get_headers())
+    time.sleep(0.5)
+    requests.get(f"{BASE_URL}/search", params={"q": term}, headers=get_headers())
+    before = requests.get(f"{BASE_URL}/metrics").json()['search_cache']
+    r = requests.get(f"{BASE_URL}/search", params={"q": term.upper()}, headers=get_headers())
+    after = requests.get(f"{BASE_URL}/metrics").json()['search_cache']
+
+    second = requests.post(f"{BASE_URL}/notes", json={"title": f"{term} two"}, headers=get_headers())
+    r2 = requests.get(f"{BASE_URL}/search", params={"q": term, "limit": 1, "offset": 1}, headers=get_headers())
+
+    success = (r.status_code == 200 and r.json()['count'] == 1 and
+               after['hits'] == before['hits'] + 1 and after['id_bytes'] > 0 and
+               r2.status_code == 200 and r2.json()['count'] == 2 and
+               [n['note_id'] for n in r2.json()['notes']] == [first.json()['note']['note_id']])
+
+    for created in (first, second):
+        if created.status_code == 201:
+            requests.delete(f"{BASE_URL}/notes/{created.json()['note']['note_id']}", headers=get_headers())
+
+    print_result("Search Cache", success, r2 if not success else None)
+    return success
+
+
+def test_suggest():
+    """Test title prefix suggestions, literal wildcards and the limit check."""
+    if not note_id:
+        print_result("Suggest", False)
+        return False
+
+    title = requests.get(f"{BASE_URL}/notes/{note_id}", headers=get_headers()).json()['note']['title']
+    r = requests.get(f"{BASE_URL}/suggest", params={"q": title[:4].upper()}, headers=get_headers())
+    r2 = requests.get(f"{BASE_URL}/suggest", params={"q": "%"}, headers=get_headers())
+    r3 = requests.get(f"{BASE_URL}/suggest", params={"q": "a", "limit": 0}, headers=get_headers())
+
+    success = (r.status_code == 200 and note_id in [t['note_id'] for t in r.json()['titles']] and
+               r2.status_code == 200 and all('%' in t['title'] for t in r2.json()['titles']) and
+               r3.status_code == 400)
+    print_result("Suggest", success, r if not success else None)
+    return success
+
+
+# ==================== BOOTSTRAP TESTS ====================
+
+def test_bootstrap():
+    """Test the combined dashboard bootstrap endpoint."""
+    r = requests.get(f"{BASE_URL}/bootstrap", headers=get_headers())
+    data = r.json() if r.status_code == 200 else {}
+    success = (r.status_code == 200
+               and all(key in data for key in ('notes', 'has_more', 'tags', 'stats', 'facets', 'sync_token'))
+               and data['stats']['total_notes'] >= len(data['notes']))
+    print_result("Bootstrap", success, r if not success else None)
+    return success
+
+
+# ==================== SYNC TESTS ====================
+
+def test_sync_full():
+    """Test sync without a token returns a full reset."""
+    global sync_token
+
+    r = requests.get(f"{BASE_URL}/sync", headers=get_headers())
+    success = r.status_code == 200 and r.json().get('reset') is True and 'token' in r.json()
+    if success:
+        sync_token = r.json()['token']
+    print_result("Sync Full", success, r if not success else None)
+    return success
+
+
+def test_sync_delta():
+    """Test sync returns only notes changed since the token."""
+    if not note_id or not sync_token:
+        print_result("Sync Delta", False)
+        return False
+
+    requests.patch(f"{BASE_URL}/notes/{note_id}/status", json={"status": "Pinned"}, headers=get_headers())
+    r = requests.get(f"{BASE_URL}/sync", params={"since": sync_token}, headers=get_headers())
+    data = r.json() if r.status_code == 200 else {}
+    success = (r.status_code == 200 and data.get('reset') is False
+               and [n['note_id'] for n in data.get('notes', [])] == [note_id])
+    print_result("Sync Delta", success, r if not success else None)
+    return success
+
+
+def test_change_events():
+    """Test the event stream reports a write to one of our notes."""
+    if not note_id:
+        print_result("Change Events", False)
+        return False
+
+    r = requests.get(f"{BASE_URL}/events", params={"token": token}, stream=True, timeout=10)
+    success = False
+    try:
+        requests.patch(f"{BASE_URL}/notes/{note_id}/status", json={"status": "Active"}, headers=get_headers())
+        for line in r.iter_lines(decode_unicode=True):
+            if line == "event: change":
+                success = True
+                break
+    finally:
+        r.close()
+    print_result("Change Events", success, r if not success else None)
+    return success
+
+
+def test_change_events_without_token():
+    """Test the event stream rejects requests without a token."""
+    r = requests.get(f"{BASE_URL}/events")
+    success = r.status_code == 401
+    print_result("Change Events Without Token (should fail)", success, r if not success else None)
+    return success
+
+
 # ==================== CLEANUP TESTS ====================
 
 def test_delete_note():
@@ -467,6 +1043,18 @@ def test_delete_note():
     return success
 
 
+def test_sync_tombstone():
+    """Test sync reports the deleted note."""
+    if not note_id or not sync_token:
+        print_result("Sync Tombstone", False)
+        return False
+
+    r = requests.get(f"{BASE_URL}/sync", params={"since": sync_token}, headers=get_headers())
+    success = r.status_code == 200 and note_id in r.json().get('deleted_note_ids', [])
+    print_result("Sync Tombstone", success, r if not success else None)
+    return success
+
+
 def test_delete_tag():
     """Test delete tag."""
     if not tag_id:
@@ -479,6 +1067,18 @@ def test_delete_tag():
     return success
 
 
+def test_rate_limit():
+    """Test that a burst of searches beyond the limit gets 429 with Retry-After."""
+    responses = [requests.get(f"{BASE_URL}/search?q=rate", headers=get_headers()) for _ in range(60)]
+    limited = [r for r in responses if r.status_code == 429]
+    metrics = requests.get(f"{BASE_URL}/metrics").json()['admission']['classes']['search']
+
+    success = (bool(limited) and all(r.headers.get('Retry-After', '').isdigit() for r in limited) and
+               metrics['rate_limited'] >= len(limited))
+    print_result("Rate Limit", success, responses[-1] if not success else None)
+    return success
+
+
 # ==================== MAIN ====================
 
 def run_all_tests():
@@ -493,6 +1093,7 @@ def run_all_tests():
     tests = [
         # Health
         ("Health Check", test_health),
+        ("Connection Pool", test_connection_pool),
 
         # Auth
         ("Register/Login", test_register),
@@ -515,14 +1116,35 @@ def run_all_tests():
 
         # Notes
         ("Create Note", test_create_note),
+        ("Stats Refreshed In Background", test_stats_refreshed_in_background),
         ("Create Note No Title", test_create_note_no_title),
         ("Create Note Invalid Status", test_create_note_invalid_status),
+        ("Create Note With Tags", test_create_note_with_tags),
         ("Get All Notes", test_get_notes),
         ("Get Notes Filtered", test_get_notes_filtered),
+        ("Get Notes Paginated", test_get_notes_paginated),
+        ("Get Notes Invalid Limit", test_get_notes_invalid_limit),
+        ("Get Notes Multi-Tag Filter", test_get_notes_multi_tag_filter),
+        ("Get Notes Invalid Tag Mode", test_get_notes_invalid_tag_mode),
+        ("Get Notes Date Range", test_get_notes_date_range),
+        ("Get Notes Histogram", test_get_notes_histogram),
+        ("Get Notes Facets", test_get_notes_facets),
+        ("Get Notes Coalesced", test_get_notes_coalesced),
         ("Get Single Note", test_get_note),
         ("Update Note", test_update_note),
+        ("Update Note Conflict", test_update_note_conflict),
+        ("Update Note Tags", test_update_note_tags),
+        ("Update Note Invalid Tag Ids", test_update_note_invalid_tag_ids),
+        ("Large Note Content", test_large_note_content),
+        ("Stream Note Content", test_stream_note_content),
+        ("Patch Large Note Content", test_patch_large_note_content),
+        ("Patch Note Content", test_patch_note_content),
+        ("Note Revisions", test_note_revisions),
+        ("Note Draft", test_note_draft),
+        ("Note Draft Other User", test_note_draft_other_user),
         ("Pin Note", test_update_note_status_pinned),
         ("Archive Note", test_update_note_status_archived),
+        ("Get Notes Archived Filter", test_get_notes_archived_filter),
         ("Activate Note", test_update_note_status_active),
 
         # Note-Tag Associations
@@ -533,11 +1155,26 @@ def run_all_tests():
 
         # Search
         ("Search Notes", test_search_notes),
+        ("Search Notes Facets", test_search_notes_facets),
         ("Search No Query", test_search_notes_no_query),
+        ("Search Chunk Boundary", test_search_chunk_boundary),
+        ("Search Cache", test_search_cache),
+        ("Suggest", test_suggest),
+
+        # Bootstrap
+        ("Bootstrap", test_bootstrap),
+
+        # Sync
+        ("Sync Full", test_sync_full),
+        ("Sync Delta", test_sync_delta),
+        ("Change Events", test_change_events),
+        ("Change Events Without Token", test_change_events_without_token),
 
         # Cleanup
         ("Delete Note", test_delete_note),
+        ("Sync Tombstone", test_sync_tombstone),
         ("Delete Tag", test_delete_tag),
+        ("Rate Limit", test_rate_limit),
     ]
 
     print("\n--- Running Tests ---\n")
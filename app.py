@@ -4,15 +4,30 @@
 # SELECT setval('tags_tag_id_seq', (SELECT MAX(tag_id) FROM tags) + 1);
 # SELECT setval('notetags_notetag_id_seq', (SELECT MAX(notetag_id) FROM notetags) + 1);
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
 from functools import wraps
 import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.pq import TransactionStatus
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, PoolTimeout
+import array
+import atexit
 import bcrypt
+import codecs
+import difflib
+import itertools
 import jwt
+import json
+import math
 import os
+import queue
 import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
@@ -25,6 +40,73 @@ CORS(app, supports_credentials=True)
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
 
+# Maximum number of matching notes counted when computing facets
+app.config['FACET_LIMIT'] = int(os.getenv('FACET_LIMIT', '10000'))
+
+# How long deletions are kept for delta sync; older sync tokens get a full reset
+app.config['TOMBSTONE_RETENTION_DAYS'] = int(os.getenv('TOMBSTONE_RETENTION_DAYS', '30'))
+# How often each worker process deletes expired tombstones
+app.config['TOMBSTONE_PRUNE_SECONDS'] = float(os.getenv('TOMBSTONE_PRUNE_SECONDS', '3600'))
+
+# Number of notes returned by /api/bootstrap for the first render
+app.config['BOOTSTRAP_PAGE_SIZE'] = int(os.getenv('BOOTSTRAP_PAGE_SIZE', '50'))
+
+# Note bodies longer than this many characters are stored in note_content_chunks
+app.config['CONTENT_OFFLOAD_THRESHOLD'] = int(os.getenv('CONTENT_OFFLOAD_THRESHOLD', '16384'))
+
+# Revision history: a full snapshot every N revisions (bounds reconstruction
+# to N deltas), and how many days / revisions per note are kept
+app.config['REVISION_SNAPSHOT_INTERVAL'] = int(os.getenv('REVISION_SNAPSHOT_INTERVAL', '20'))
+app.config['REVISION_RETENTION_DAYS'] = int(os.getenv('REVISION_RETENTION_DAYS', '90'))
+app.config['REVISION_MAX_PER_NOTE'] = int(os.getenv('REVISION_MAX_PER_NOTE', '200'))
+
+# archive_notes.py archives active notes not modified for this many days
+app.config['AUTO_ARCHIVE_DAYS'] = int(os.getenv('AUTO_ARCHIVE_DAYS', '180'))
+
+# Autosave drafts are written to the database once no new draft arrived for
+# DRAFT_IDLE_SECONDS, or at the latest DRAFT_MAX_AGE_SECONDS after the first
+# unsaved one. With DRAFT_SPILL_DIR set, pending drafts are also kept on disk
+# (fsynced if DRAFT_SPILL_FSYNC) and survive a restart.
+app.config['DRAFT_IDLE_SECONDS'] = float(os.getenv('DRAFT_IDLE_SECONDS', '2'))
+app.config['DRAFT_MAX_AGE_SECONDS'] = float(os.getenv('DRAFT_MAX_AGE_SECONDS', '30'))
+app.config['DRAFT_SPILL_DIR'] = os.getenv('DRAFT_SPILL_DIR', '')
+app.config['DRAFT_SPILL_FSYNC'] = os.getenv('DRAFT_SPILL_FSYNC', 'false').lower() == 'true'
+
+# Admission control: a token bucket per user and route class (requests per
+# second, burst size), and a cap on concurrent database-bound requests per
+# worker process that a request waits up to ADMISSION_WAIT_SECONDS for
+app.config['RATE_LIMITS'] = {
+    'read': (float(os.getenv('RATE_READ_PER_SECOND', '20')), float(os.getenv('RATE_READ_BURST', '100'))),
+    'search': (float(os.getenv('RATE_SEARCH_PER_SECOND', '5')), float(os.getenv('RATE_SEARCH_BURST', '20'))),
+    'write': (float(os.getenv('RATE_WRITE_PER_SECOND', '10')), float(os.getenv('RATE_WRITE_BURST', '50'))),
+}
+app.config['MAX_CONCURRENT_REQUESTS'] = int(os.getenv('MAX_CONCURRENT_REQUESTS', '16'))
+app.config['ADMISSION_WAIT_SECONDS'] = float(os.getenv('ADMISSION_WAIT_SECONDS', '0.5'))
+
+# Background jobs: worker threads per process, attempts per job (retried
+# after JOB_RETRY_SECONDS, doubling each time), and how long shutdown waits
+# for the queue to drain
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '2'))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+app.config['JOB_RETRY_SECONDS'] = float(os.getenv('JOB_RETRY_SECONDS', '0.5'))
+app.config['JOB_DRAIN_SECONDS'] = float(os.getenv('JOB_DRAIN_SECONDS', '10'))
+
+# Login timestamps are buffered and written in one UPDATE at most
+# LOGIN_FLUSH_SECONDS after a login (0 writes each login on its own), or as
+# soon as LOGIN_BATCH_SIZE users are waiting
+app.config['LOGIN_FLUSH_SECONDS'] = float(os.getenv('LOGIN_FLUSH_SECONDS', '5'))
+app.config['LOGIN_BATCH_SIZE'] = int(os.getenv('LOGIN_BATCH_SIZE', '1000'))
+
+# Search results: the note ids matching a query and filters are cached per
+# user, for up to SEARCH_CACHE_ENTRIES searches and SEARCH_CACHE_MAX_BYTES of
+# ids in total (0 entries turns the cache off)
+app.config['SEARCH_CACHE_ENTRIES'] = int(os.getenv('SEARCH_CACHE_ENTRIES', '1000'))
+app.config['SEARCH_CACHE_MAX_BYTES'] = int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Change events: bursts for the same user within this window become one event
+app.config['EVENT_COALESCE_SECONDS'] = float(os.getenv('EVENT_COALESCE_SECONDS', '0.25'))
+app.config['EVENT_HEARTBEAT_SECONDS'] = float(os.getenv('EVENT_HEARTBEAT_SECONDS', '15'))
+
 # Database configuration
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
@@ -35,17 +117,262 @@ DB_CONFIG = {
 }
 
 
-def get_db_connection():
-    """Create and return a database connection."""
-    # psycopg uses 'dbname' instead of 'database'
-    config = DB_CONFIG.copy()
-    if 'database' in config:
+# Sharding: DB_SHARDS is a comma-separated list of conninfo strings, one
+# per shard (e.g. postgresql://user:pw@host:5432/noteflow); the first is the
+# catalog shard. Unset, DB_CONFIG is the only shard. Each process keeps a
+# pool of DB_POOL_MIN_SIZE to DB_POOL_MAX_SIZE connections per shard, and
+# caches which shard a user lives on for SHARD_MAP_TTL_SECONDS. A request
+# waits at most DB_POOL_TIMEOUT_SECONDS for a connection, then gets a 503.
+app.config['DB_SHARDS'] = [s.strip() for s in os.getenv('DB_SHARDS', '').split(',') if s.strip()]
+app.config['DB_POOL_MIN_SIZE'] = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+app.config['DB_POOL_MAX_SIZE'] = int(os.getenv('DB_POOL_MAX_SIZE', '20'))
+app.config['DB_POOL_TIMEOUT_SECONDS'] = float(os.getenv('DB_POOL_TIMEOUT_SECONDS', '5'))
+app.config['SHARD_MAP_TTL_SECONDS'] = float(os.getenv('SHARD_MAP_TTL_SECONDS', '5'))
+
+
+# ==================== DATABASE SHARDS ====================
+
+CATALOG_SHARD = 0
+
+# Expired shard map entries are dropped once this many are cached
+MAX_SHARD_MAP_ENTRIES = 10000
+
+
+class PooledConnection(psycopg.Connection):
+    """Connection whose close() hands it back to its pool.
+
+    Handlers keep opening and closing connections as before; closing rolls
+    back anything left open and turns autocommit off again, so the next
+    borrower gets a clean connection without paying for a new backend.
+    """
+
+    shard = CATALOG_SHARD
+    lease = 0
+    _returning = False
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None or self._returning:
+            super().close()
+            return
+        self._returning = True
+        try:
+            try:
+                if self.info.transaction_status in (TransactionStatus.INTRANS, TransactionStatus.INERROR):
+                    self.rollback()
+                self.autocommit = False
+            except psycopg.Error:
+                # A broken connection; the pool replaces it
+                pass
+            pool.putconn(self)
+        finally:
+            self._returning = False
+
+
+class ShardRouter:
+    """Place users on shards and hand out pooled connections to them.
+
+    The catalog shard holds every user, the authoritative tag catalog and
+    the user_shards map; a user's notes, tags and stats live on the shard
+    the map names (the catalog if there is no row). Other shards keep a
+    copy of their users' rows and of the tag catalog, so every query for
+    one user runs on one database. rebalance_shards.py marks a user
+    `moving` while copying them to another shard.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pools = {}
+        self.shard_map = {}
+        self.leases = itertools.count(1)
+
+    def conninfos(self):
+        """Connection strings of all shards, catalog first."""
+        if app.config['DB_SHARDS']:
+            return app.config['DB_SHARDS']
+        # psycopg uses 'dbname' instead of 'database'
+        config = DB_CONFIG.copy()
         config['dbname'] = config.pop('database')
-    conn = psycopg.connect(
-        **config,
-        row_factory=dict_row
-    )
-    return conn
+        return [make_conninfo(**config)]
+
+    @property
+    def shard_count(self):
+        return len(self.conninfos())
+
+    def _pool(self, shard):
+        with self.lock:
+            pool = self.pools.get(shard)
+            if pool is None:
+                pool = ConnectionPool(
+                    self.conninfos()[shard],
+                    connection_class=PooledConnection,
+                    kwargs={'row_factory': dict_row},
+                    min_size=app.config['DB_POOL_MIN_SIZE'],
+                    max_size=app.config['DB_POOL_MAX_SIZE'],
+                    name=f'shard-{shard}',
+                    open=True
+                )
+                self.pools[shard] = pool
+        return pool
+
+    def connect(self, shard=CATALOG_SHARD):
+        """Borrow a connection to a shard; close() returns it.
+
+        Raises PoolTimeout if none frees up within DB_POOL_TIMEOUT_SECONDS,
+        e.g. while the shard is down; the request then answers 503.
+        """
+        try:
+            conn = self._pool(shard).getconn(timeout=app.config['DB_POOL_TIMEOUT_SECONDS'])
+        except PoolTimeout:
+            if has_request_context():
+                g.pool_timeout = shard
+            raise
+        conn.shard = shard
+        conn.lease = next(self.leases)
+        if has_request_context():
+            g.setdefault('db_leases', []).append((conn, conn.lease))
+        return conn
+
+    def dedicated_connection(self, shard=CATALOG_SHARD):
+        """Open a connection outside the pool, for sessions such as LISTEN."""
+        return psycopg.connect(self.conninfos()[shard], row_factory=dict_row)
+
+    def lookup_many(self, user_ids):
+        """Return {user_id: (shard, moving)}, from the cache where it is fresh."""
+        if self.shard_count == 1:
+            return {user_id: (CATALOG_SHARD, False) for user_id in user_ids}
+
+        now = time.monotonic()
+        found = {}
+        with self.lock:
+            for user_id in user_ids:
+                entry = self.shard_map.get(user_id)
+                if entry and entry[2] > now:
+                    found[user_id] = entry[:2]
+        missing = [user_id for user_id in user_ids if user_id not in found]
+        if not missing:
+            return found
+
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT user_id, shard, moving FROM user_shards WHERE user_id = ANY(%s)",
+                (missing,)
+            ).fetchall()
+        finally:
+            conn.close()
+        placed = {row['user_id']: (row['shard'], row['moving']) for row in rows}
+
+        expires = now + app.config['SHARD_MAP_TTL_SECONDS']
+        with self.lock:
+            if len(self.shard_map) > MAX_SHARD_MAP_ENTRIES:
+                self.shard_map = {k: v for k, v in self.shard_map.items() if v[2] > now}
+            for user_id in missing:
+                found[user_id] = placed.get(user_id, (CATALOG_SHARD, False))
+                self.shard_map[user_id] = found[user_id] + (expires,)
+        return found
+
+    def lookup(self, user_id):
+        """Return (shard, moving) for a user."""
+        return self.lookup_many([user_id])[user_id]
+
+    def shard_for(self, user_id):
+        return self.lookup(user_id)[0]
+
+    def forget(self, user_id):
+        """Drop a user's cached placement."""
+        with self.lock:
+            self.shard_map.pop(user_id, None)
+
+    def place_new_user(self, email):
+        """Pick the shard for a new account."""
+        return zlib.crc32(email.lower().encode('utf-8')) % self.shard_count
+
+    def close(self):
+        with self.lock:
+            pools, self.pools = self.pools, {}
+        for pool in pools.values():
+            pool.close()
+
+    def metrics(self):
+        with self.lock:
+            pools = dict(self.pools)
+            cached = len(self.shard_map)
+        stats = {}
+        for shard, pool in pools.items():
+            counters = pool.get_stats()
+            stats[shard] = {key: counters.get(key, 0) for key in
+                            ('pool_size', 'pool_available', 'requests_waiting', 'requests_num', 'connections_num')}
+        return {'count': self.shard_count, 'cached_users': cached, 'pools': stats}
+
+
+shard_router = ShardRouter()
+# Registered first, so it runs last, after the job queue has drained
+atexit.register(shard_router.close)
+
+
+def get_db_connection(user_id=None):
+    """Return a pooled connection to a user's shard, or to the catalog shard without one."""
+    if user_id is None:
+        return shard_router.connect()
+    return shard_router.connect(shard_router.shard_for(user_id))
+
+
+def shard_unavailable():
+    retry_after = max(1, math.ceil(app.config['DB_POOL_TIMEOUT_SECONDS']))
+    return (jsonify({'error': 'Database is unavailable, please retry', 'retry_after': retry_after}),
+            503, {'Retry-After': str(retry_after)})
+
+
+@app.after_request
+def unavailable_on_pool_timeout(response):
+    """Turn a handler's 500 into a 503 when the request could not get a connection."""
+    if response.status_code == 500 and g.get('pool_timeout') is not None:
+        return app.make_response(shard_unavailable())
+    return response
+
+
+@app.teardown_request
+def return_db_connections(exc):
+    """Hand back connections a handler left open, e.g. on an early error return."""
+    for conn, lease in g.pop('db_leases', []):
+        # Still lent out under this request's lease
+        if conn.lease == lease and getattr(conn, '_pool', None) is not None:
+            conn.close()
+
+
+def run_pipeline(conn, statements, commit=False):
+    """Send (sql, params) statements in one pipeline and return each one's rows.
+
+    Statements whose parameters do not depend on each other's results cost a
+    single network round trip together instead of one each. With commit=True
+    the COMMIT travels in the same pipeline. Statements without a result set
+    (e.g. UPDATE without RETURNING) yield an empty list.
+    """
+    cursors = []
+    with conn.pipeline():
+        for sql, params in statements:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            cursors.append(cur)
+        if commit:
+            conn.commit()
+
+    results = [cur.fetchall() if cur.description else [] for cur in cursors]
+    for cur in cursors:
+        cur.close()
+    return results
+
+
+def decode_auth_token(token):
+    """Return (user_id, None) for a valid JWT or (None, error message)."""
+    try:
+        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        return data['user_id'], None
+    except jwt.ExpiredSignatureError:
+        return None, 'Token has expired'
+    except jwt.InvalidTokenError:
+        return None, 'Invalid token'
 
 
 def token_required(f):
@@ -65,21 +392,482 @@ def token_required(f):
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
 
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = data['user_id']
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
+        current_user_id, error = decode_auth_token(token)
+        if error:
+            return jsonify({'error': error}), 401
+
+        if shard_router.lookup(current_user_id)[1]:
+            # rebalance_shards.py is copying this user's data to another shard
+            retry_after = max(1, math.ceil(app.config['SHARD_MAP_TTL_SECONDS']))
+            return (jsonify({'error': 'Account is being moved, please retry', 'retry_after': retry_after}),
+                    503, {'Retry-After': str(retry_after)})
 
+        g.current_user_id = current_user_id
         return f(current_user_id, *args, **kwargs)
 
     return decorated
 
 
+# ==================== ADMISSION CONTROL ====================
+
+# Idle buckets are forgotten once this many are tracked
+MAX_RATE_BUCKETS = 10000
+
+
+class AdmissionControl:
+    """Shed load before it reaches Postgres.
+
+    Each (user, route class) pair has a token bucket refilled at the class's
+    rate up to its burst size, so one client cannot monopolize the database.
+    Admitted requests then need one of MAX_CONCURRENT_REQUESTS slots, which
+    keeps the number of concurrent queries from this worker bounded during
+    spikes. Counters for both are exposed through /api/metrics.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.slots = threading.BoundedSemaphore(app.config['MAX_CONCURRENT_REQUESTS'])
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counters = {}
+
+    def take_token(self, user_id, route_class):
+        """Spend a token; returns 0 if the request may proceed, else seconds until it may."""
+        rate, burst = app.config['RATE_LIMITS'][route_class]
+        key = (user_id, route_class)
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return (1 - tokens) / rate
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > MAX_RATE_BUCKETS:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as a new one
+        for key, (tokens, last) in list(self.buckets.items()):
+            rate, burst = app.config['RATE_LIMITS'][key[1]]
+            if tokens + (now - last) * rate >= burst:
+                del self.buckets[key]
+
+    def enter(self):
+        """Take a concurrency slot, waiting up to ADMISSION_WAIT_SECONDS; returns whether one was free."""
+        if not self.slots.acquire(timeout=app.config['ADMISSION_WAIT_SECONDS']):
+            return False
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return True
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def count(self, route_class, outcome):
+        with self.lock:
+            key = (route_class, outcome)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'max_concurrent': app.config['MAX_CONCURRENT_REQUESTS'],
+                'tracked_buckets': len(self.buckets),
+                'classes': {
+                    route_class: {
+                        'rate_per_second': rate,
+                        'burst': burst,
+                        'admitted': self.counters.get((route_class, 'admitted'), 0),
+                        'rate_limited': self.counters.get((route_class, 'rate_limited'), 0),
+                        'overloaded': self.counters.get((route_class, 'overloaded'), 0)
+                    } for route_class, (rate, burst) in app.config['RATE_LIMITS'].items()
+                }
+            }
+
+
+admission_control = AdmissionControl()
+
+
+def too_many_requests(message, retry_after):
+    """429 response telling the client when to retry."""
+    retry_after = max(1, math.ceil(retry_after))
+    return jsonify({'error': message, 'retry_after': retry_after}), 429, {'Retry-After': str(retry_after)}
+
+
+def admission_controlled(route_class):
+    """Decorator applying rate limits and the concurrency cap; goes below @token_required."""
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(current_user_id, *args, **kwargs):
+            retry_after = admission_control.take_token(current_user_id, route_class)
+            if retry_after:
+                admission_control.count(route_class, 'rate_limited')
+                return too_many_requests('Too many requests', retry_after)
+
+            if not admission_control.enter():
+                admission_control.count(route_class, 'overloaded')
+                return too_many_requests('Server is busy, please retry', 1)
+
+            admission_control.count(route_class, 'admitted')
+            try:
+                return f(current_user_id, *args, **kwargs)
+            finally:
+                admission_control.leave()
+
+        return decorated
+
+    return decorator
+
+
+# ==================== REQUEST COALESCING ====================
+
+class SingleFlight:
+    """Run one execution per key at a time and hand its result to everyone waiting on it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.write_generations = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Return fn()'s result, joining an identical call already in progress."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call['done'].wait()
+        else:
+            try:
+                call['result'] = fn()
+            except Exception as e:
+                call['error'] = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call['done'].set()
+
+        if call['error'] is not None:
+            raise call['error']
+        return call['result']
+
+    def write_generation(self, user_id):
+        with self.lock:
+            return self.write_generations.get(user_id, 0)
+
+    def note_write(self, user_id):
+        """Keep the user's later reads from joining calls that started before this write."""
+        with self.lock:
+            self.write_generations[user_id] = self.write_generations.get(user_id, 0) + 1
+
+    def metrics(self):
+        with self.lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_progress': len(self.calls)}
+
+
+single_flight = SingleFlight()
+
+
+@app.after_request
+def note_user_write(response):
+    if request.method != 'GET' and g.get('current_user_id') is not None:
+        single_flight.note_write(g.current_user_id)
+        search_cache.invalidate(g.current_user_id)
+    return response
+
+
+def coalesced(f):
+    """Decorator sharing one execution among identical concurrent reads.
+
+    Requests with the same route, user and query parameters (in any order)
+    that arrive while one is running wait for it and get the same response
+    bytes. A write by the user starts a new generation, so reads issued
+    after it never get a response computed before it. Goes between
+    @token_required and @admission_controlled, so only the execution that
+    actually runs is rate limited.
+    """
+
+    @wraps(f)
+    def decorated(current_user_id, *args, **kwargs):
+        key = (
+            request.endpoint, current_user_id, single_flight.write_generation(current_user_id),
+            tuple(sorted(request.args.items(multi=True))), tuple(sorted(kwargs.items()))
+        )
+
+        def run():
+            response = unavailable_on_pool_timeout(app.make_response(f(current_user_id, *args, **kwargs)))
+            return response.get_data(), response.status_code, list(response.headers)
+
+        body, status, headers = single_flight.do(key, run)
+        return Response(body, status=status, headers=headers)
+
+    return decorated
+
+
+# ==================== BACKGROUND JOBS ====================
+
+class JobQueue:
+    """Run bookkeeping writes on a few worker threads, off the request path.
+
+    A job with a key is only queued once while it is pending, so a burst of
+    writes by one user causes a single stats recount. The key is released
+    when the job starts, so work enqueued during a run is not lost. Failed
+    jobs are retried with exponential backoff up to JOB_MAX_ATTEMPTS times,
+    and pending jobs are drained at exit.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.pending_keys = set()
+        self.workers = []
+        self.waiting_retries = 0
+        self.counters = {'completed': 0, 'failed': 0, 'retried': 0, 'deduplicated': 0}
+
+    def enqueue(self, key, fn, *args):
+        """Queue fn(*args) unless a job with the same key is already pending."""
+        with self.lock:
+            if key is not None and key in self.pending_keys:
+                self.counters['deduplicated'] += 1
+                return False
+            if key is not None:
+                self.pending_keys.add(key)
+            if not self.workers:
+                for i in range(app.config['JOB_WORKERS']):
+                    worker = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                    worker.start()
+                    self.workers.append(worker)
+        self.jobs.put((key, fn, args, 1))
+        return True
+
+    def _work(self):
+        while True:
+            key, fn, args, attempt = self.jobs.get()
+            with self.lock:
+                self.pending_keys.discard(key)
+            try:
+                fn(*args)
+                self._count('completed')
+            except Exception as e:
+                if attempt < app.config['JOB_MAX_ATTEMPTS']:
+                    self._count('retried')
+                    self._retry_later(key, fn, args, attempt)
+                else:
+                    self._count('failed')
+                    app.logger.error(f'Job {fn.__name__}{args} failed after {attempt} attempts: {e}')
+            finally:
+                self.jobs.task_done()
+
+    def _retry_later(self, key, fn, args, attempt):
+        def retry():
+            with self.lock:
+                self.waiting_retries -= 1
+                if key is not None and key in self.pending_keys:
+                    # A newer job does the same work
+                    return
+                if key is not None:
+                    self.pending_keys.add(key)
+            self.jobs.put((key, fn, args, attempt + 1))
+
+        with self.lock:
+            self.waiting_retries += 1
+        timer = threading.Timer(app.config['JOB_RETRY_SECONDS'] * 2 ** (attempt - 1), retry)
+        timer.daemon = True
+        timer.start()
+
+    def _count(self, outcome):
+        with self.lock:
+            self.counters[outcome] += 1
+
+    def drain(self, timeout=None):
+        """Wait until no job is queued, running or waiting to be retried; returns whether that happened."""
+        deadline = time.monotonic() + (app.config['JOB_DRAIN_SECONDS'] if timeout is None else timeout)
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not self.jobs.unfinished_tasks and not self.waiting_retries:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.counters, pending=self.jobs.unfinished_tasks, waiting_retries=self.waiting_retries)
+
+
+job_queue = JobQueue()
+atexit.register(job_queue.drain)
+
+
+def run_job_statement(sql, params, shard=CATALOG_SHARD):
+    """Execute and commit one statement on a shard."""
+    conn = shard_router.connect(shard)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def schedule_user_stats_refresh(user_id):
+    """Recount a user's notes and tags in the background; call after the write commits."""
+    job_queue.enqueue(('user_stats', user_id), run_job_statement,
+                      UPDATE_USER_STATS_QUERY, (user_id, user_id, user_id), shard_router.shard_for(user_id))
+
+
+class LoginRecorder:
+    """Write-behind buffer for userstats.last_login_date.
+
+    Logins only note the time in memory. Each batch is written as a single
+    UPDATE ... FROM (VALUES ...) job, so a login spike costs one transaction
+    per LOGIN_FLUSH_SECONDS instead of one per login. Times are sent as ages
+    relative to the database clock, so they stay exact when a batch is
+    written late or retried.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flush_timer = None
+        self.batches = 0
+        self.rows = 0
+
+    def record(self, user_id):
+        with self.lock:
+            self.pending[user_id] = time.monotonic()
+            if app.config['LOGIN_FLUSH_SECONDS'] <= 0 or len(self.pending) >= app.config['LOGIN_BATCH_SIZE']:
+                batch = self._take()
+            else:
+                batch = None
+                if self.flush_timer is None:
+                    self.flush_timer = threading.Timer(app.config['LOGIN_FLUSH_SECONDS'], self.flush)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+        if batch:
+            job_queue.enqueue(None, write_last_logins, batch)
+
+    def _take(self):
+        batch, self.pending = self.pending, {}
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        self.batches += 1
+        self.rows += len(batch)
+        return batch
+
+    def flush(self):
+        """Queue the buffered logins for writing now."""
+        with self.lock:
+            batch = self._take() if self.pending else None
+        if batch:
+            job_queue.enqueue(None, write_last_logins, batch)
+
+    def metrics(self):
+        with self.lock:
+            return {'pending': len(self.pending), 'batches': self.batches, 'rows': self.rows}
+
+
+def write_last_logins(batch):
+    """Set last_login_date for {user_id: monotonic login time} in one statement per shard."""
+    now = time.monotonic()
+    by_shard = {}
+    for user_id, (shard, moving) in shard_router.lookup_many(list(batch)).items():
+        by_shard.setdefault(shard, []).append((user_id, now - batch[user_id]))
+    for shard, rows in by_shard.items():
+        run_job_statement(
+            f"""
+            UPDATE userstats u SET last_login_date = NOW() - make_interval(secs => v.age)
+            FROM (VALUES {', '.join(['(%s::int, %s::float8)'] * len(rows))}) AS v(user_id, age)
+            WHERE u.user_id = v.user_id
+            """,
+            [value for row in rows for value in row],
+            shard
+        )
+
+
+login_recorder = LoginRecorder()
+# Registered after the job queue, so it runs first and the drain writes the last batch
+atexit.register(login_recorder.flush)
+
+
+class TombstonePruner:
+    """Delete tombstones older than TOMBSTONE_RETENTION_DAYS on a timer.
+
+    Every TOMBSTONE_PRUNE_SECONDS one delete per shard is queued as a job,
+    starting when the process serves its first request. Sync tokens older
+    than the retention get a full reset, so no client needs them anymore.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = False
+        self.timer = None
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        self.prune()
+
+    def prune(self):
+        """Queue the deletes now and schedule the next run."""
+        for shard in range(shard_router.shard_count):
+            job_queue.enqueue(('prune_tombstones', shard), run_job_statement,
+                              "DELETE FROM tombstones WHERE deleted_at < NOW() - make_interval(days => %s)",
+                              (app.config['TOMBSTONE_RETENTION_DAYS'],), shard)
+        with self.lock:
+            self.timer = threading.Timer(app.config['TOMBSTONE_PRUNE_SECONDS'], self.prune)
+            self.timer.daemon = True
+            self.timer.start()
+
+
+tombstone_pruner = TombstonePruner()
+
+
+@app.before_request
+def start_tombstone_pruner():
+    tombstone_pruner.start()
+
+
 # ==================== AUTH ENDPOINTS ====================
 
+def create_shard_user(shard, user, password_hash):
+    """Copy a new catalog user to their shard and start their stats there."""
+    conn = shard_router.connect(shard)
+    try:
+        run_pipeline(conn, [
+            (
+                "INSERT INTO users (user_id, name, email, password, created_at) VALUES (%s, %s, %s, %s, %s)",
+                (user['user_id'], user['name'], user['email'], password_hash, user['created_at'])
+            ),
+            (
+                """
+                INSERT INTO userstats (user_id, total_notes, total_active_tags, last_login_date)
+                VALUES (%s, 0, 0, NOW())
+                """,
+                (user['user_id'],)
+            ),
+        ], commit=True)
+    finally:
+        conn.close()
+
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new user."""
@@ -100,31 +888,44 @@ def register():
 
         password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
+        shard = shard_router.place_new_user(email)
         conn = get_db_connection()
-        cur = conn.cursor()
 
         try:
-            cur.execute(
+            # The userstats and shard map rows find the new user by email, so
+            # the inserts and the commit go out in one pipeline.
+            statements = [(
                 """
                 INSERT INTO users (name, email, password, created_at)
                 VALUES (%s, %s, %s, NOW())
                 RETURNING user_id, name, email, created_at
                 """,
                 (name, email, password_hash)
-            )
-            new_user = cur.fetchone()
-
-            # Use ON CONFLICT to handle case where userstats entry might exist
-            cur.execute(
-                """
-                INSERT INTO userstats (user_id, total_notes, total_active_tags, last_login_date)
-                VALUES (%s, 0, 0, NOW())
-                ON CONFLICT (user_id) DO UPDATE SET last_login_date = NOW()
-                """,
-                (new_user['user_id'],)
-            )
+            )]
+            if shard == CATALOG_SHARD:
+                statements.append((
+                    # Use ON CONFLICT to handle case where userstats entry might exist
+                    """
+                    INSERT INTO userstats (user_id, total_notes, total_active_tags, last_login_date)
+                    SELECT user_id, 0, 0, NOW() FROM users WHERE email = %s
+                    ON CONFLICT (user_id) DO UPDATE SET last_login_date = NOW()
+                    """,
+                    (email,)
+                ))
+            else:
+                statements.append((
+                    "INSERT INTO user_shards (user_id, shard) SELECT user_id, %s FROM users WHERE email = %s",
+                    (shard, email)
+                ))
+            new_user = run_pipeline(conn, statements, commit=True)[0][0]
 
-            conn.commit()
+            if shard != CATALOG_SHARD:
+                try:
+                    create_shard_user(shard, new_user, password_hash)
+                except Exception:
+                    conn.execute("DELETE FROM users WHERE user_id = %s", (new_user['user_id'],))
+                    conn.commit()
+                    raise
 
             token = jwt.encode({
                 'user_id': new_user['user_id'],
@@ -153,7 +954,6 @@ def register():
             conn.rollback()
             return jsonify({'error': f'Registration failed: {str(e)}'}), 500
         finally:
-            cur.close()
             conn.close()
 
     except Exception as e:
@@ -188,15 +988,11 @@ def login():
             conn.close()
             return jsonify({'error': 'Invalid email or password'}), 401
 
-        cur.execute(
-            "UPDATE userstats SET last_login_date = NOW() WHERE user_id = %s",
-            (user['user_id'],)
-        )
-        conn.commit()
-
         cur.close()
         conn.close()
 
+        login_recorder.record(user['user_id'])
+
         token = jwt.encode({
             'user_id': user['user_id'],
             'exp': datetime.utcnow() + timedelta(days=7)
@@ -219,6 +1015,7 @@ def login():
 
 @app.route('/api/auth/me', methods=['GET'])
 @token_required
+@admission_controlled('read')
 def get_current_user(current_user_id):
     """Get current authenticated user's information."""
     try:
@@ -254,6 +1051,7 @@ def get_current_user(current_user_id):
 
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 @token_required
+@admission_controlled('read')
 def get_user(current_user_id, user_id):
     """Get user by ID."""
     if current_user_id != user_id:
@@ -290,6 +1088,7 @@ def get_user(current_user_id, user_id):
 
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
 @token_required
+@admission_controlled('write')
 def update_user(current_user_id, user_id):
     """Update user profile."""
     if current_user_id != user_id:
@@ -323,16 +1122,24 @@ def update_user(current_user_id, user_id):
             return jsonify({'error': 'No fields to update'}), 400
 
         values.append(user_id)
-
-        cur.execute(
-            f"""
+        update_sql = f"""
             UPDATE users SET {', '.join(update_fields)}
             WHERE user_id = %s
             RETURNING user_id, name, email, created_at
-            """,
-            values
-        )
+        """
+
+        cur.execute(update_sql, values)
         updated_user = cur.fetchone()
+
+        shard = shard_router.shard_for(user_id)
+        if shard != CATALOG_SHARD:
+            # Keep the shard's copy of the user in step
+            shard_conn = shard_router.connect(shard)
+            try:
+                shard_conn.execute(update_sql, values)
+                shard_conn.commit()
+            finally:
+                shard_conn.close()
         conn.commit()
 
         cur.close()
@@ -356,12 +1163,23 @@ def update_user(current_user_id, user_id):
 
 @app.route('/api/users/<int:user_id>', methods=['DELETE'])
 @token_required
+@admission_controlled('write')
 def delete_user(current_user_id, user_id):
     """Delete user account."""
     if current_user_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
     try:
+        shard = shard_router.shard_for(user_id)
+        if shard != CATALOG_SHARD:
+            # Notes, tags and stats on the user's shard cascade from its copy
+            shard_conn = shard_router.connect(shard)
+            try:
+                shard_conn.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+                shard_conn.commit()
+            finally:
+                shard_conn.close()
+
         conn = get_db_connection()
         cur = conn.cursor()
 
@@ -371,6 +1189,7 @@ def delete_user(current_user_id, user_id):
 
         cur.close()
         conn.close()
+        shard_router.forget(user_id)
 
         if not deleted:
             return jsonify({'error': 'User not found'}), 404
@@ -383,168 +1202,612 @@ def delete_user(current_user_id, user_id):
 
 # ==================== USER STATS ENDPOINTS ====================
 
+# userstats row, note counts by status and distinct tags in use; each takes (user_id,)
+USER_STATS_QUERIES = [
+    "SELECT * FROM userstats WHERE user_id = %s",
+    """
+    SELECT 
+        COUNT(*) as total_notes,
+        COUNT(CASE WHEN status = 'Active' THEN 1 END) as active_notes,
+        COUNT(CASE WHEN status = 'Pinned' THEN 1 END) as pinned_notes,
+        COUNT(CASE WHEN status = 'Archived' THEN 1 END) as archived_notes
+    FROM notes WHERE user_id = %s
+    """,
+    "SELECT COUNT(DISTINCT tag_id) as active_tags FROM notetags WHERE user_id = %s"
+]
+
+
+def format_user_stats(stats, note_stats, tag_stats):
+    """Serialize the results of USER_STATS_QUERIES for a JSON response."""
+    return {
+        'user_id': stats['user_id'],
+        'total_notes': note_stats['total_notes'],
+        'active_notes': note_stats['active_notes'],
+        'pinned_notes': note_stats['pinned_notes'],
+        'archived_notes': note_stats['archived_notes'],
+        'total_active_tags': tag_stats['active_tags'],
+        'last_login_date': stats['last_login_date'].isoformat() if stats['last_login_date'] else None
+    }
+
+
 @app.route('/api/users/<int:user_id>/stats', methods=['GET'])
 @token_required
+@coalesced
+@admission_controlled('read')
 def get_user_stats(current_user_id, user_id):
     """Get user statistics dashboard."""
     if current_user_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        conn = get_db_connection(current_user_id)
+        stats_rows, note_stats_rows, tag_stats_rows = run_pipeline(
+            conn, [(sql, (user_id,)) for sql in USER_STATS_QUERIES]
+        )
+        conn.close()
 
-        cur.execute("SELECT * FROM userstats WHERE user_id = %s", (user_id,))
-        stats = cur.fetchone()
+        if not stats_rows:
+            return jsonify({'error': 'Stats not found'}), 404
 
-        cur.execute(
-            """
-            SELECT 
-                COUNT(*) as total_notes,
-                COUNT(CASE WHEN status = 'Active' THEN 1 END) as active_notes,
-                COUNT(CASE WHEN status = 'Pinned' THEN 1 END) as pinned_notes,
-                COUNT(CASE WHEN status = 'Archived' THEN 1 END) as archived_notes
-            FROM notes WHERE user_id = %s
-            """,
-            (user_id,)
-        )
-        note_stats = cur.fetchone()
+        return jsonify({'stats': format_user_stats(stats_rows[0], note_stats_rows[0], tag_stats_rows[0])}), 200
 
-        cur.execute(
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Recount a user's notes and distinct tags in use; takes (user_id, user_id, user_id).
+# Run as a background job through schedule_user_stats_refresh.
+UPDATE_USER_STATS_QUERY = """
+    UPDATE userstats
+    SET total_notes = (SELECT COUNT(*) FROM notes WHERE user_id = %s),
+        total_active_tags = (SELECT COUNT(DISTINCT tag_id) FROM notetags WHERE user_id = %s)
+    WHERE user_id = %s
+"""
+
+
+# ==================== NOTES ENDPOINTS ====================
+
+NOTE_SORT_FIELDS = ['created_date', 'last_modified', 'title']
+TAG_MODES = ['any', 'all', 'none']
+ARCHIVED_MODES = ['include', 'exclude', 'only']
+MAX_PAGE_SIZE = 500
+
+# Date window parameters and their conditions; *_after is inclusive, *_before exclusive
+DATE_RANGE_FILTERS = {
+    'created_after': "n.created_date >= %s",
+    'created_before': "n.created_date < %s",
+    'modified_after': "n.last_modified >= %s",
+    'modified_before': "n.last_modified < %s",
+}
+HISTOGRAM_INTERVALS = ['day', 'week', 'month']
+HISTOGRAM_FIELDS = ['created_date', 'last_modified']
+
+# Archived notes form the cold tier, with indexes of their own (migrations/010).
+# The predicates are written as literals so every plan, generic ones too,
+# can match them to the tier's partial indexes.
+HOT_TIER = "n.status <> 'Archived'"
+COLD_TIER = "n.status = 'Archived'"
+
+# Offloaded bodies: chunk size (fixed, existing chunks depend on it) and the
+# preview kept in notes.content; both match migrations/005
+CONTENT_CHUNK_CHARS = 32768
+CONTENT_PREVIEW_CHARS = 2000
+MAX_CONTENT_EDITS = 1000
+
+# Tries for an update without If-Match that loses a race with another write
+UPDATE_ATTEMPTS = 3
+
+
+def spans_tiers(status=None, archived='include'):
+    """Whether a note filter can match notes of both tiers."""
+    return not status and archived == 'include'
+
+
+def build_notes_filter(user_id, status=None, tag_ids=None, search=None, tag_mode='any',
+                       archived='include', date_range=None):
+    """Build the WHERE clause shared by note listings and facets; returns (sql, params)."""
+    where = "n.user_id = %s"
+    params = [user_id]
+
+    for name, condition in DATE_RANGE_FILTERS.items():
+        if date_range and name in date_range:
+            where += f" AND {condition}"
+            params.append(date_range[name])
+
+    if archived == 'exclude':
+        where += f" AND {HOT_TIER}"
+    elif archived == 'only':
+        where += f" AND {COLD_TIER}"
+
+    if status:
+        where += " AND n.status = %s"
+        params.append(status)
+        if archived == 'include':
+            where += f" AND {COLD_TIER if status == 'Archived' else HOT_TIER}"
+
+    # Tag filters are semi-/anti-joins, so a note matches at most once no
+    # matter how many tags it carries and no DISTINCT is needed.
+    if tag_ids:
+        if tag_mode == 'all':
+            for tag_id in tag_ids:
+                where += """
+                    AND EXISTS (SELECT 1 FROM notetags nt
+                                WHERE nt.user_id = %s AND nt.note_id = n.note_id AND nt.tag_id = %s)
+                """
+                params.extend([user_id, tag_id])
+        else:
+            where += f"""
+                AND {'NOT ' if tag_mode == 'none' else ''}EXISTS (
+                    SELECT 1 FROM notetags nt
+                    WHERE nt.user_id = %s AND nt.note_id = n.note_id AND nt.tag_id = ANY(%s))
             """
-            SELECT COUNT(DISTINCT nt.tag_id) as active_tags
-            FROM notetags nt
-            JOIN notes n ON nt.note_id = n.note_id
-            WHERE n.user_id = %s
-            """,
-            (user_id,)
+            params.extend([user_id, list(tag_ids)])
+
+    if search:
+        # Each chunk is matched together with the start of the next one, so
+        # a term that crosses a chunk boundary is still found
+        where += """
+            AND (n.title ILIKE %s OR n.content ILIKE %s
+                 OR (n.content_offloaded AND EXISTS (
+                     SELECT 1 FROM note_content_chunks c
+                     LEFT JOIN note_content_chunks next_c
+                         ON next_c.note_id = c.note_id AND next_c.chunk_no = c.chunk_no + 1
+                     WHERE c.note_id = n.note_id
+                       AND c.data || COALESCE(left(next_c.data, %s), '') ILIKE %s)))
+        """
+        search_param = f'%{search}%'
+        params.extend([search_param, search_param, len(search) - 1, search_param])
+
+    return where, params
+
+
+def build_tiered_query(columns, where, params, order_by=None, limit=None):
+    """Select notes matching a filter from both tiers, merged in order; returns (query, params).
+
+    Each tier is read in order through its own partial indexes and gives
+    at most `limit` rows, so only those few rows are sorted into one list.
+    order_by may only name selected columns, without the n. prefix; without
+    it the tiers are simply appended.
+    """
+    ordering = f" ORDER BY {order_by}" if order_by else ""
+    tiers = []
+    tier_params = []
+    for tier in (HOT_TIER, COLD_TIER):
+        tier_query = f"SELECT {columns} FROM notes n WHERE {where} AND {tier}{ordering}"
+        tier_params += params
+        if limit is not None:
+            tier_query += " LIMIT %s"
+            tier_params.append(limit)
+        tiers.append(f"({tier_query})")
+    return ' UNION ALL '.join(tiers) + ordering, tier_params
+
+
+def build_notes_query(user_id, status=None, tag_ids=None, search=None,
+                      sort_by='last_modified', order='desc', limit=None, offset=None,
+                      tag_mode='any', archived='include', date_range=None):
+    """Build the note listing query used by get_notes; returns (query, params)."""
+    where, params = build_notes_filter(user_id, status, tag_ids, search, tag_mode, archived, date_range)
+    columns = """n.note_id, n.title, n.content, n.status,
+               n.created_date, n.last_modified, n.user_id, n.version,
+               n.content_length, n.content_offloaded"""
+
+    if sort_by not in NOTE_SORT_FIELDS:
+        sort_by = 'last_modified'
+
+    # note_id breaks ties so pages are stable and match the composite indexes
+    order = 'DESC' if order.lower() == 'desc' else 'ASC'
+    order_by = f"{sort_by} {order}, note_id {order}"
+
+    if spans_tiers(status, archived):
+        page_end = None if limit is None else limit + (offset or 0)
+        query, params = build_tiered_query(columns, where, params, order_by, page_end)
+    else:
+        query = f"""
+        SELECT {columns}
+        FROM notes n
+        WHERE {where}
+        ORDER BY {order_by}
+    """
+
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    if offset:
+        query += " OFFSET %s"
+        params.append(offset)
+
+    return query, params
+
+
+def build_facets_query(user_id, where, params, both_tiers=False):
+    """Build the facet aggregate over a note filter; returns (query, params).
+
+    Only the FACET_LIMIT most recently modified matches are counted, so
+    facets never cost more than the listing itself; 'capped' is set when
+    the result set was larger. both_tiers is set when the filter can match
+    active and archived notes (see spans_tiers).
+    """
+    limit = app.config['FACET_LIMIT']
+    columns = "n.note_id, n.status, n.last_modified"
+    order_by = "last_modified DESC, note_id DESC"
+    if both_tiers:
+        filtered, params = build_tiered_query(columns, where, params, order_by, limit + 1)
+        filtered += " LIMIT %s"
+    else:
+        filtered = f"SELECT {columns} FROM notes n WHERE {where} ORDER BY {order_by} LIMIT %s"
+    query = f"""
+        WITH filtered AS (
+            {filtered}
+        ), counted AS (
+            SELECT note_id, status FROM filtered
+            ORDER BY last_modified DESC, note_id DESC
+            LIMIT %s
         )
-        tag_stats = cur.fetchone()
+        SELECT GROUPING(c.status) AS by_tag, GROUPING(nt.tag_id) AS by_status,
+               c.status, nt.tag_id, COUNT(DISTINCT c.note_id) AS note_count,
+               (SELECT COUNT(*) FROM filtered) > %s AS capped
+        FROM counted c
+        LEFT JOIN notetags nt ON nt.user_id = %s AND nt.note_id = c.note_id
+        GROUP BY GROUPING SETS ((c.status), (nt.tag_id), ())
+    """
+    return query, params + [limit + 1, limit, limit, user_id]
+
+
+def format_facets(rows):
+    """Turn facet aggregate rows into the JSON facets object."""
+    facets = {'total': 0, 'capped': False, 'status': {}, 'tags': [], 'untagged': 0}
+    for row in rows:
+        if row['by_tag'] and row['by_status']:
+            facets['total'] = row['note_count']
+            facets['capped'] = row['capped']
+        elif row['by_tag']:
+            if row['tag_id'] is None:
+                facets['untagged'] = row['note_count']
+            else:
+                facets['tags'].append({'tag_id': row['tag_id'], 'count': row['note_count']})
+        else:
+            facets['status'][row['status']] = row['note_count']
 
-        cur.close()
-        conn.close()
+    facets['tags'].sort(key=lambda t: (-t['count'], t['tag_id']))
+    return facets
 
-        if not stats:
-            return jsonify({'error': 'Stats not found'}), 404
 
-        return jsonify({
-            'stats': {
-                'user_id': stats['user_id'],
-                'total_notes': note_stats['total_notes'],
-                'active_notes': note_stats['active_notes'],
-                'pinned_notes': note_stats['pinned_notes'],
-                'archived_notes': note_stats['archived_notes'],
-                'total_active_tags': tag_stats['active_tags'],
-                'last_login_date': stats['last_login_date'].isoformat() if stats['last_login_date'] else None
-            }
-        }), 200
+def fetch_note_facets(cur, user_id, where, params, both_tiers=False):
+    """Count matching notes per status and per tag in one aggregate pass."""
+    cur.execute(*build_facets_query(user_id, where, params, both_tiers))
+    return format_facets(cur.fetchall())
 
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
 
+def parse_page_args(args):
+    """Read optional limit/offset query parameters; raises ValueError if invalid."""
+    limit = args.get('limit', type=int)
+    offset = args.get('offset', 0, type=int)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    if offset < 0:
+        raise ValueError('offset cannot be negative')
+    return limit, offset
 
-def update_user_stats(cur, user_id):
-    """Helper function to update user statistics."""
-    cur.execute("SELECT COUNT(*) as count FROM notes WHERE user_id = %s", (user_id,))
-    total_notes = cur.fetchone()['count']
+
+def parse_tag_filter_args(args):
+    """Read tag_ids (or legacy tag_id) and tag_mode; raises ValueError if invalid."""
+    raw = args.get('tag_ids') or args.get('tag_id') or ''
+    try:
+        tag_ids = sorted({int(t) for t in raw.split(',') if t.strip()})
+    except ValueError:
+        raise ValueError('tag_ids must be a comma-separated list of integers')
+
+    tag_mode = args.get('tag_mode', 'any').lower()
+    if tag_mode not in TAG_MODES:
+        raise ValueError(f'tag_mode must be one of: {", ".join(TAG_MODES)}')
+    return tag_ids, tag_mode
+
+
+def parse_archived_arg(args):
+    """Read whether archived notes are included, excluded or the only ones; raises ValueError if invalid."""
+    archived = args.get('archived', 'include').lower()
+    if archived not in ARCHIVED_MODES:
+        raise ValueError(f'archived must be one of: {", ".join(ARCHIVED_MODES)}')
+    return archived
+
+
+def parse_date_range_args(args):
+    """Read the created_/modified_ after/before bounds (ISO 8601); raises ValueError if invalid."""
+    date_range = {}
+    for name in DATE_RANGE_FILTERS:
+        value = args.get(name)
+        if not value:
+            continue
+        try:
+            bound = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f'{name} must be an ISO 8601 date or date and time')
+        # Timestamps are stored in server local time without a zone; comparing
+        # them to an aware value would keep the date indexes from being used
+        if bound.tzinfo is not None:
+            bound = bound.astimezone().replace(tzinfo=None)
+        date_range[name] = bound
+
+    for field in ['created', 'modified']:
+        after, before = date_range.get(f'{field}_after'), date_range.get(f'{field}_before')
+        if after and before and after >= before:
+            raise ValueError(f'{field}_after must be earlier than {field}_before')
+    return date_range
+
+
+def fetch_tags_for_notes(cur, user_id, note_ids):
+    """Load the tags of many notes in one query; returns {note_id: [tag, ...]}."""
+    tags_by_note = {note_id: [] for note_id in note_ids}
+    if not note_ids:
+        return tags_by_note
 
     cur.execute(
         """
-        SELECT COUNT(DISTINCT nt.tag_id) as count
+        SELECT nt.note_id, t.tag_id, t.tag_name, t.color
         FROM notetags nt
-        JOIN notes n ON nt.note_id = n.note_id
-        WHERE n.user_id = %s
+        JOIN tags t ON t.tag_id = nt.tag_id
+        WHERE nt.user_id = %s AND nt.note_id = ANY(%s)
         """,
-        (user_id,)
+        (user_id, list(note_ids))
     )
-    total_active_tags = cur.fetchone()['count']
-
+    for t in cur.fetchall():
+        tags_by_note[t['note_id']].append({'tag_id': t['tag_id'], 'tag_name': t['tag_name'], 'color': t['color']})
+    return tags_by_note
+
+
+def format_note(note, tags):
+    """Serialize a note row and its tags for a JSON response.
+
+    For offloaded notes content is only the preview; content_truncated is
+    set and the full body is loaded through GET /api/notes/<id>.
+    """
+    return {
+        'note_id': note['note_id'],
+        'title': note['title'],
+        'content': note['content'],
+        'content_length': note_content_length(note),
+        'content_truncated': note['content_offloaded'],
+        'status': note['status'],
+        'created_date': note['created_date'].isoformat(),
+        'last_modified': note['last_modified'].isoformat(),
+        'user_id': note['user_id'],
+        'version': note['version'],
+        'tags': tags
+    }
+
+
+def note_content_length(note):
+    """Length of a note's full body, whether inline or offloaded."""
+    return note['content_length'] if note['content_offloaded'] else len(note['content'])
+
+
+def split_note_content(content):
+    """Return (notes.content value, content_length, content_offloaded) for a note body."""
+    if len(content) > app.config['CONTENT_OFFLOAD_THRESHOLD']:
+        return content[:CONTENT_PREVIEW_CHARS], len(content), True
+    return content, None, False
+
+
+def write_content_chunks(cur, note_id, pieces, first_chunk=0):
+    """COPY a body given as an iterable of text pieces into chunks; returns its length.
+
+    With first_chunk the pieces are the body from that chunk on, and the
+    earlier chunks are left as they are.
+    """
+    buffer = ''
+    chunk_no = first_chunk
+    length = 0
+    with cur.copy("COPY note_content_chunks (note_id, chunk_no, data) FROM STDIN") as copy:
+        for piece in pieces:
+            buffer += piece
+            length += len(piece)
+            while len(buffer) >= CONTENT_CHUNK_CHARS:
+                copy.write_row((note_id, chunk_no, buffer[:CONTENT_CHUNK_CHARS]))
+                buffer = buffer[CONTENT_CHUNK_CHARS:]
+                chunk_no += 1
+        if buffer:
+            copy.write_row((note_id, chunk_no, buffer))
+    return length
+
+
+def read_note_content(cur, note, offset=0, length=None):
+    """Return a note's body, or its [offset, offset + length) slice.
+
+    Offloaded bodies are read from only the chunks overlapping the range.
+    """
+    if not note['content_offloaded']:
+        return note['content'][offset:None if length is None else offset + length]
+
+    end = note['content_length'] if length is None else min(note['content_length'], offset + length)
+    if offset >= end:
+        return ''
+
+    first_chunk = offset // CONTENT_CHUNK_CHARS
     cur.execute(
         """
-        UPDATE userstats 
-        SET total_notes = %s, total_active_tags = %s
-        WHERE user_id = %s
+        SELECT data FROM note_content_chunks
+        WHERE note_id = %s AND chunk_no BETWEEN %s AND %s
+        ORDER BY chunk_no
         """,
-        (total_notes, total_active_tags, user_id)
+        (note['note_id'], first_chunk, (end - 1) // CONTENT_CHUNK_CHARS)
     )
+    text = ''.join(row['data'] for row in cur.fetchall())
+    start = offset - first_chunk * CONTENT_CHUNK_CHARS
+    return text[start:start + end - offset]
+
+
+def parse_content_range_args(args):
+    """Read optional offset/length query parameters for ranged content reads; raises ValueError if invalid."""
+    offset = args.get('offset', type=int)
+    length = args.get('length', type=int)
+    if offset is not None and offset < 0:
+        raise ValueError('offset cannot be negative')
+    if length is not None and length < 1:
+        raise ValueError('length must be positive')
+    return offset, length
+
+
+def parse_content_edits(edits):
+    """Validate PATCH content edits; raises ValueError if invalid.
+
+    Each edit is {"offset", "delete", "insert"} in characters of the base
+    version. Edits must be sorted by offset and must not overlap.
+    """
+    if not isinstance(edits, list) or not 1 <= len(edits) <= MAX_CONTENT_EDITS:
+        raise ValueError(f'edits must be a list of 1 to {MAX_CONTENT_EDITS} edits')
+
+    parsed = []
+    previous_end = 0
+    for edit in edits:
+        try:
+            offset, delete, insert = int(edit['offset']), int(edit.get('delete', 0)), edit.get('insert', '')
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('each edit needs an integer offset and delete and a string insert')
+        if not isinstance(insert, str) or offset < 0 or delete < 0:
+            raise ValueError('each edit needs an integer offset and delete and a string insert')
+        if offset < previous_end:
+            raise ValueError('edits must be sorted by offset and must not overlap')
+        previous_end = offset + delete
+        parsed.append((offset, delete, insert))
+    return parsed
+
+
+def apply_content_edits(text, edits, base_offset=0):
+    """Apply parsed edits to text that starts at base_offset of the body; raises ValueError if out of range."""
+    if edits and edits[-1][0] + edits[-1][1] - base_offset > len(text):
+        raise ValueError('edit range is past the end of the content')
+    parts = []
+    position = 0
+    for offset, delete, insert in edits:
+        parts.append(text[position:offset - base_offset])
+        parts.append(insert)
+        position = offset - base_offset + delete
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def read_body_text(stream, block_size=65536):
+    """Yield a UTF-8 request body as text, one block at a time."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        yield decoder.decode(block)
+    yield decoder.decode(b'', final=True)
 
 
-# ==================== NOTES ENDPOINTS ====================
-
 @app.route('/api/notes', methods=['GET'])
 @token_required
+@coalesced
+@admission_controlled('read')
 def get_notes(current_user_id):
     """Get all notes for the current user with optional filtering."""
     try:
         status = request.args.get('status')
-        tag_id = request.args.get('tag_id')
         search = request.args.get('search')
         sort_by = request.args.get('sort_by', 'last_modified')
         order = request.args.get('order', 'desc')
 
-        conn = get_db_connection()
+        try:
+            limit, offset = parse_page_args(request.args)
+            tag_ids, tag_mode = parse_tag_filter_args(request.args)
+            archived = parse_archived_arg(request.args)
+            date_range = parse_date_range_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        query, params = build_notes_query(current_user_id, status, tag_ids, search,
+                                          sort_by, order, limit, offset, tag_mode, archived, date_range)
+
+        # The token is still taken before the listing, in the same round trip
+        conn = get_db_connection(current_user_id)
+        xmin_rows, notes = run_pipeline(conn, [(SYNC_XMIN_QUERY, ()), (query, params)])
+        sync_token = make_sync_token(xmin_rows[0]['xmin'], conn.shard)
+
         cur = conn.cursor()
+        tags_by_note = fetch_tags_for_notes(cur, current_user_id, [note['note_id'] for note in notes])
+        notes_list = [format_note(note, tags_by_note[note['note_id']]) for note in notes]
 
-        query = """
-            SELECT DISTINCT n.note_id, n.title, n.content, n.status, 
-                   n.created_date, n.last_modified, n.user_id
-            FROM notes n
-            LEFT JOIN notetags nt ON n.note_id = nt.note_id
-            WHERE n.user_id = %s
-        """
-        params = [current_user_id]
+        response = {'notes': notes_list, 'sync_token': sync_token}
+        if request.args.get('facets') == 'true':
+            where, params = build_notes_filter(current_user_id, status, tag_ids, search, tag_mode,
+                                               archived, date_range)
+            response['facets'] = fetch_note_facets(cur, current_user_id, where, params,
+                                                   spans_tiers(status, archived))
 
-        if status:
-            query += " AND n.status = %s"
-            params.append(status)
+        cur.close()
+        conn.close()
 
-        if tag_id:
-            query += " AND nt.tag_id = %s"
-            params.append(tag_id)
+        return jsonify(response), 200
 
-        if search:
-            query += " AND (n.title ILIKE %s OR n.content ILIKE %s)"
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        valid_sort_fields = ['created_date', 'last_modified', 'title']
-        if sort_by not in valid_sort_fields:
-            sort_by = 'last_modified'
 
-        order = 'DESC' if order.lower() == 'desc' else 'ASC'
-        query += f" ORDER BY n.{sort_by} {order}"
+def build_histogram_query(user_id, interval, field, status=None, tag_ids=None, search=None,
+                          tag_mode='any', archived='include', date_range=None):
+    """Build the note count per day, week or month of a date column; returns (query, params).
 
-        cur.execute(query, params)
-        notes = cur.fetchall()
+    Both tiers are counted through their own (user_id, date) indexes.
+    """
+    where, params = build_notes_filter(user_id, status, tag_ids, search, tag_mode, archived, date_range)
+    if spans_tiers(status, archived):
+        source, params = build_tiered_query(f"n.{field}", where, params)
+    else:
+        source = f"SELECT n.{field} FROM notes n WHERE {where}"
+    query = f"""
+        SELECT date_trunc(%s, n.{field}) AS bucket, COUNT(*) AS note_count
+        FROM ({source}) n
+        GROUP BY bucket
+        ORDER BY bucket
+    """
+    return query, [interval] + params
 
-        notes_list = []
-        for note in notes:
-            cur.execute(
-                """
-                SELECT t.tag_id, t.tag_name, t.color
-                FROM tags t
-                JOIN notetags nt ON t.tag_id = nt.tag_id
-                WHERE nt.note_id = %s
-                """,
-                (note['note_id'],)
-            )
-            tags = cur.fetchall()
 
-            notes_list.append({
-                'note_id': note['note_id'],
-                'title': note['title'],
-                'content': note['content'],
-                'status': note['status'],
-                'created_date': note['created_date'].isoformat(),
-                'last_modified': note['last_modified'].isoformat(),
-                'user_id': note['user_id'],
-                'tags': [{'tag_id': t['tag_id'], 'tag_name': t['tag_name'], 'color': t['color']} for t in tags]
-            })
+@app.route('/api/notes/histogram', methods=['GET'])
+@token_required
+@coalesced
+@admission_controlled('read')
+def get_notes_histogram(current_user_id):
+    """Count notes per day, week or month for timeline views.
+
+    Buckets are keyed by the start of the period (weeks start on Monday)
+    and periods without notes are left out. Takes the same filters as
+    GET /api/notes.
+    """
+    try:
+        interval = request.args.get('interval', 'day').lower()
+        field = request.args.get('field', 'created_date')
+        if interval not in HISTOGRAM_INTERVALS:
+            return jsonify({'error': f'interval must be one of: {", ".join(HISTOGRAM_INTERVALS)}'}), 400
+        if field not in HISTOGRAM_FIELDS:
+            return jsonify({'error': f'field must be one of: {", ".join(HISTOGRAM_FIELDS)}'}), 400
+
+        try:
+            tag_ids, tag_mode = parse_tag_filter_args(request.args)
+            archived = parse_archived_arg(request.args)
+            date_range = parse_date_range_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        conn = get_db_connection(current_user_id)
+        cur = conn.cursor()
+
+        cur.execute(*build_histogram_query(current_user_id, interval, field, request.args.get('status'),
+                                           tag_ids, request.args.get('search'), tag_mode, archived,
+                                           date_range))
+        buckets = [{'start': row['bucket'].isoformat(), 'count': row['note_count']} for row in cur.fetchall()]
 
         cur.close()
         conn.close()
 
-        return jsonify({'notes': notes_list}), 200
+        return jsonify({
+            'interval': interval,
+            'field': field,
+            'total': sum(bucket['count'] for bucket in buckets),
+            'buckets': buckets
+        }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -552,15 +1815,32 @@ def get_notes(current_user_id):
 
 @app.route('/api/notes/<int:note_id>', methods=['GET'])
 @token_required
+@coalesced
+@admission_controlled('read')
 def get_note(current_user_id, note_id):
-    """Get a specific note by ID."""
+    """Get a specific note by ID.
+
+    Returns the full body, loading offloaded content from its chunks. With
+    offset and/or length only that character range of the body is returned,
+    so editors can load very large notes progressively; next_offset is null
+    once the end of the body has been reached.
+    """
     try:
-        conn = get_db_connection()
+        try:
+            offset, length = parse_content_range_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Read-your-writes for autosaved edits still in the draft buffer
+        draft_buffer.flush(note_id, current_user_id)
+
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
         cur.execute(
             """
-            SELECT note_id, title, content, status, created_date, last_modified, user_id
+            SELECT note_id, title, content, status, created_date, last_modified, user_id, version,
+                   content_length, content_offloaded
             FROM notes WHERE note_id = %s AND user_id = %s
             """,
             (note_id, current_user_id)
@@ -572,32 +1852,22 @@ def get_note(current_user_id, note_id):
             conn.close()
             return jsonify({'error': 'Note not found'}), 404
 
-        cur.execute(
-            """
-            SELECT t.tag_id, t.tag_name, t.color
-            FROM tags t
-            JOIN notetags nt ON t.tag_id = nt.tag_id
-            WHERE nt.note_id = %s
-            """,
-            (note_id,)
-        )
-        tags = cur.fetchall()
+        content = read_note_content(cur, note, offset or 0, length)
+        tags = fetch_tags_for_notes(cur, current_user_id, [note_id])[note_id]
 
         cur.close()
         conn.close()
 
-        return jsonify({
-            'note': {
-                'note_id': note['note_id'],
-                'title': note['title'],
-                'content': note['content'],
-                'status': note['status'],
-                'created_date': note['created_date'].isoformat(),
-                'last_modified': note['last_modified'].isoformat(),
-                'user_id': note['user_id'],
-                'tags': [{'tag_id': t['tag_id'], 'tag_name': t['tag_name'], 'color': t['color']} for t in tags]
-            }
-        }), 200
+        response = format_note(note, tags)
+        response['content'] = content
+        response['content_truncated'] = False
+        if offset is not None or length is not None:
+            next_offset = (offset or 0) + len(content)
+            response['content_offset'] = offset or 0
+            response['next_offset'] = next_offset if next_offset < response['content_length'] else None
+            response['content_truncated'] = response['next_offset'] is not None or bool(offset)
+
+        return jsonify({'note': response}), 200, {'ETag': f'"{note["version"]}"'}
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -605,6 +1875,7 @@ def get_note(current_user_id, note_id):
 
 @app.route('/api/notes', methods=['POST'])
 @token_required
+@admission_controlled('write')
 def create_note(current_user_id):
     """Create a new note."""
     try:
@@ -616,164 +1887,550 @@ def create_note(current_user_id):
         title = data['title']
         content = data.get('content', '')
         status = data.get('status', 'Active')
-        tag_ids = data.get('tag_ids', [])
+        try:
+            tag_ids = parse_tag_ids(data.get('tag_ids', []))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'tag_ids must be a list of integers'}), 400
 
         valid_statuses = ['Active', 'Archived', 'Pinned']
         if status not in valid_statuses:
             return jsonify({'error': f'Status must be one of: {", ".join(valid_statuses)}'}), 400
 
-        conn = get_db_connection()
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
+        # Tag ids are checked against the catalog before anything is written,
+        # then the note and all of its tag assignments go in as one statement.
         cur.execute(
             """
-            INSERT INTO notes (title, content, status, user_id, created_date, last_modified)
-            VALUES (%s, %s, %s, %s, NOW(), NOW())
-            RETURNING note_id, title, content, status, created_date, last_modified, user_id
+            WITH missing_tags AS (
+                SELECT array_agg(t.tag_id) AS tag_ids
+                FROM unnest(%s::int[]) AS t(tag_id)
+                WHERE NOT EXISTS (SELECT 1 FROM tags WHERE tags.tag_id = t.tag_id)
+            ), new_note AS (
+                INSERT INTO notes (title, content, content_length, content_offloaded,
+                                   status, user_id, created_date, last_modified)
+                SELECT %s, %s, %s, %s, %s, %s, NOW(), NOW()
+                WHERE (SELECT tag_ids FROM missing_tags) IS NULL
+                RETURNING note_id, title, content, status, created_date, last_modified, user_id, version,
+                          content_length, content_offloaded
+            ), assigned AS (
+                INSERT INTO notetags (note_id, user_id, tag_id, assigned_date)
+                SELECT new_note.note_id, new_note.user_id, t.tag_id, NOW()
+                FROM new_note, (SELECT DISTINCT unnest(%s::int[])) AS t(tag_id)
+                RETURNING tag_id
+            )
+            SELECT (SELECT tag_ids FROM missing_tags) AS missing_tag_ids,
+                   n.*,
+                   COALESCE((
+                       SELECT json_agg(json_build_object('tag_id', t.tag_id, 'tag_name', t.tag_name,
+                                                         'color', t.color))
+                       FROM assigned a JOIN tags t ON t.tag_id = a.tag_id
+                   ), '[]') AS tags
+            FROM (SELECT 1) AS one
+            LEFT JOIN new_note n ON TRUE
             """,
-            (title, content, status, current_user_id)
+            (tag_ids, title, *split_note_content(content), status, current_user_id, tag_ids)
         )
         new_note = cur.fetchone()
 
-        tags = []
-        for tag_id in tag_ids:
-            try:
-                cur.execute(
-                    """
-                    INSERT INTO notetags (note_id, tag_id, assigned_date)
-                    VALUES (%s, %s, NOW())
-                    """,
-                    (new_note['note_id'], tag_id)
-                )
-                cur.execute("SELECT tag_id, tag_name, color FROM tags WHERE tag_id = %s", (tag_id,))
-                tag = cur.fetchone()
-                if tag:
-                    tags.append({'tag_id': tag['tag_id'], 'tag_name': tag['tag_name'], 'color': tag['color']})
-            except psycopg.errors.ForeignKeyViolation:
-                conn.rollback()
-                return jsonify({'error': f'Tag with id {tag_id} does not exist'}), 400
+        if new_note['missing_tag_ids']:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'error': f'Tag with id {new_note["missing_tag_ids"][0]} does not exist'}), 400
 
-        update_user_stats(cur, current_user_id)
+        if new_note['content_offloaded']:
+            write_content_chunks(cur, new_note['note_id'], [content])
 
         conn.commit()
         cur.close()
         conn.close()
 
+        schedule_user_stats_refresh(current_user_id)
+
         return jsonify({
             'message': 'Note created successfully',
-            'note': {
-                'note_id': new_note['note_id'],
-                'title': new_note['title'],
-                'content': new_note['content'],
-                'status': new_note['status'],
-                'created_date': new_note['created_date'].isoformat(),
-                'last_modified': new_note['last_modified'].isoformat(),
-                'user_id': new_note['user_id'],
-                'tags': tags
-            }
-        }), 201
+            'note': format_note(new_note, new_note['tags'])
+        }), 201, {'ETag': f'"{new_note["version"]}"'}
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/notes/<int:note_id>', methods=['PUT'])
-@token_required
-def update_note(current_user_id, note_id):
-    """Update an existing note."""
-    try:
-        data = request.get_json()
-
-        conn = get_db_connection()
-        cur = conn.cursor()
-
+def parse_tag_ids(value):
+    """Read a request's tag_ids; raises ValueError unless it is a list of integers."""
+    if not isinstance(value, list):
+        raise ValueError('tag_ids must be a list')
+    return [int(t) for t in value]
+
+
+def parse_expected_version(data):
+    """Read the version a write is based on from If-Match or the body; None if absent."""
+    if_match = request.headers.get('If-Match')
+    if if_match and if_match != '*':
+        return int(if_match.replace('W/', '').strip('" '))
+    if data.get('version') is not None:
+        return int(data['version'])
+    return None
+
+
+def write_note(cur, note_id, user_id, data, expected_version=None, tag_ids=None):
+    """Apply an update to a note inside the caller's transaction.
+
+    The ownership check, version check, update and tag changes run as one
+    data-modifying CTE, so a save is a single round trip and a concurrent
+    edit is reported instead of being silently overwritten. The new tag set
+    is diffed against the current one, so unchanged tags keep their rows
+    (and assigned_date) and an unchanged set writes nothing. The replaced
+    title and body come back from the same statement and are stored as a
+    revision. Shared by PUT /api/notes/<id> and the autosave draft buffer.
+    tag_ids, already parsed, replaces the note's tags; None leaves them.
+
+    Returns the statement's row: note_id is None when nothing was written,
+    with current_version None for a missing note, missing_tag_ids set for
+    unknown tags, and otherwise a version conflict. tags_changed tells the
+    caller to refresh the user's stats once the transaction has committed.
+    """
+    update_fields = ["last_modified = NOW()", "version = n.version + 1"]
+    values = []
+
+    if 'title' in data:
+        update_fields.append("title = %s")
+        values.append(data['title'])
+
+    if 'content' in data:
+        update_fields.append("content = %s, content_length = %s, content_offloaded = %s")
+        values.extend(split_note_content(data['content'] or ''))
+
+    if 'status' in data:
+        update_fields.append("status = %s")
+        values.append(data['status'])
+
+    replace_tags = tag_ids is not None
+    tag_ids = tag_ids if replace_tags else []
+
+    # The update only applies to the row version the statement read, so
+    # the old title and body it returns are exact. A write that lands in
+    # between makes it match nothing; without an expected version that is retried.
+    for _ in range(UPDATE_ATTEMPTS):
         cur.execute(
-            "SELECT note_id FROM notes WHERE note_id = %s AND user_id = %s",
-            (note_id, current_user_id)
+            f"""
+            WITH target AS (
+                SELECT note_id, user_id, version, title, content FROM notes
+                WHERE note_id = %s AND user_id = %s
+            ), old_chunks AS (
+                SELECT string_agg(c.data, '' ORDER BY c.chunk_no) AS body
+                FROM note_content_chunks c JOIN target ON c.note_id = target.note_id
+                WHERE %s
+            ), current_tags AS (
+                SELECT COALESCE(array_agg(nt.tag_id), ARRAY[]::int[]) AS tag_ids
+                FROM notetags nt JOIN target ON nt.user_id = target.user_id AND nt.note_id = target.note_id
+            ), missing_tags AS (
+                SELECT array_agg(t.tag_id) AS tag_ids
+                FROM unnest(%s::int[]) AS t(tag_id)
+                WHERE NOT EXISTS (SELECT 1 FROM tags WHERE tags.tag_id = t.tag_id)
+            ), updated AS (
+                UPDATE notes n SET {', '.join(update_fields)}
+                FROM target
+                WHERE n.user_id = target.user_id AND n.note_id = target.note_id AND n.version = target.version
+                  AND (%s::int IS NULL OR n.version = %s::int)
+                  AND (SELECT tag_ids FROM missing_tags) IS NULL
+                RETURNING n.note_id, n.title, n.content, n.status,
+                          n.created_date, n.last_modified, n.user_id, n.version,
+                          n.content_length, n.content_offloaded
+            ), dropped_chunks AS (
+                DELETE FROM note_content_chunks c USING updated
+                WHERE %s AND c.note_id = updated.note_id
+            ), removed AS (
+                DELETE FROM notetags nt USING updated
+                WHERE %s AND nt.user_id = updated.user_id AND nt.note_id = updated.note_id AND NOT (nt.tag_id = ANY(%s::int[]))
+                RETURNING nt.tag_id
+            ), added AS (
+                INSERT INTO notetags (note_id, user_id, tag_id, assigned_date)
+                SELECT DISTINCT updated.note_id, updated.user_id, t.tag_id, NOW()
+                FROM updated, current_tags, unnest(%s::int[]) AS t(tag_id)
+                WHERE %s AND NOT (t.tag_id = ANY(current_tags.tag_ids))
+                ON CONFLICT (note_id, user_id, tag_id) DO NOTHING
+                RETURNING tag_id
+            )
+            SELECT (SELECT version FROM target) AS current_version,
+                   (SELECT tag_ids FROM missing_tags) AS missing_tag_ids,
+                   EXISTS (SELECT 1 FROM removed) OR EXISTS (SELECT 1 FROM added) AS tags_changed,
+                   (SELECT title FROM target) AS old_title,
+                   (SELECT content FROM target) AS old_content,
+                   (SELECT body FROM old_chunks) AS old_chunk_body,
+                   u.*,
+                   COALESCE((
+                       SELECT json_agg(json_build_object('tag_id', t.tag_id, 'tag_name', t.tag_name,
+                                                         'color', t.color))
+                       FROM tags t
+                       WHERE CASE WHEN %s THEN t.tag_id = ANY(%s::int[])
+                                  ELSE t.tag_id IN (SELECT tag_id FROM notetags
+                                                    WHERE user_id = u.user_id AND note_id = u.note_id)
+                             END
+                   ), '[]') AS tags
+            FROM (SELECT 1) AS one
+            LEFT JOIN updated u ON TRUE
+            """,
+            [note_id, user_id, 'content' in data, tag_ids] + values + [
+                expected_version, expected_version,
+                'content' in data,
+                replace_tags, tag_ids,
+                tag_ids, replace_tags,
+                replace_tags, tag_ids
+            ]
         )
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Note not found'}), 404
+        result = cur.fetchone()
+        if (result['note_id'] is not None or expected_version is not None
+                or result['current_version'] is None or result['missing_tag_ids']):
+            break
 
-        update_fields = ["last_modified = NOW()"]
-        values = []
+    if result['note_id'] is None:
+        return result
 
-        if 'title' in data:
-            if not data['title']:
-                return jsonify({'error': 'Title cannot be empty'}), 400
-            update_fields.append("title = %s")
-            values.append(data['title'])
+    if result['content_offloaded'] and 'content' in data:
+        write_content_chunks(cur, note_id, [data['content']])
 
-        if 'content' in data:
-            update_fields.append("content = %s")
-            values.append(data['content'])
+    if 'content' in data:
+        old_body = result['old_chunk_body'] or result['old_content'] or ''
+        content_changed = old_body != (data['content'] or '')
+    else:
+        content_changed = False
+    if content_changed:
+        record_revision(cur, note_id, result['current_version'], result['old_title'], len(old_body),
+                        diff_content_edits(data['content'] or '', old_body), lambda: old_body)
+    elif result['old_title'] != result['title']:
+        record_revision(cur, note_id, result['current_version'], result['old_title'],
+                        note_content_length(result), [], lambda: read_note_content(cur, result))
+
+    return result
+
+
+@app.route('/api/notes/<int:note_id>', methods=['PUT'])
+@token_required
+@admission_controlled('write')
+def update_note(current_user_id, note_id):
+    """Update an existing note; a stale If-Match or version gets 409."""
+    try:
+        data = request.get_json()
+
+        if 'title' in data and not data['title']:
+            return jsonify({'error': 'Title cannot be empty'}), 400
 
         if 'status' in data:
             valid_statuses = ['Active', 'Archived', 'Pinned']
             if data['status'] not in valid_statuses:
                 return jsonify({'error': f'Status must be one of: {", ".join(valid_statuses)}'}), 400
-            update_fields.append("status = %s")
-            values.append(data['status'])
 
-        values.append(note_id)
+        try:
+            tag_ids = parse_tag_ids(data['tag_ids']) if 'tag_ids' in data else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'tag_ids must be a list of integers'}), 400
+
+        try:
+            expected_version = parse_expected_version(data)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Version must be an integer'}), 400
+
+        conn = get_db_connection(current_user_id)
+        cur = conn.cursor()
+
+        result = write_note(cur, note_id, current_user_id, data, expected_version, tag_ids)
+
+        if result['current_version'] is None:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Note not found'}), 404
+
+        if result['missing_tag_ids']:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'error': f'Tag with id {result["missing_tag_ids"][0]} does not exist'}), 400
+
+        if result['note_id'] is None:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({
+                'error': 'Note was modified by another request',
+                'current_version': result['current_version']
+            }), 409
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        # Only the tag count can change; the note count is unaffected by an update
+        if result['tags_changed']:
+            schedule_user_stats_refresh(current_user_id)
 
+        return jsonify({
+            'message': 'Note updated successfully',
+            'note': format_note(result, result['tags'])
+        }), 200, {'ETag': f'"{result["version"]}"'}
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/notes/<int:note_id>/content', methods=['PUT'])
+@token_required
+@admission_controlled('write')
+def upload_note_content(current_user_id, note_id):
+    """Replace a note's body with the raw (text/plain, UTF-8) request body.
+
+    The body is read from request.stream instead of request.get_json(), so a
+    large note is never buffered whole: once it passes
+    CONTENT_OFFLOAD_THRESHOLD it is COPYed into note_content_chunks as it
+    arrives. Honors If-Match like PUT /api/notes/<id>. The new body is never
+    held whole, so the replaced one is kept as a full snapshot revision.
+    """
+    try:
+        try:
+            expected_version = parse_expected_version({})
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Version must be an integer'}), 400
+
+        conn = get_db_connection(current_user_id)
+        cur = conn.cursor()
+
+        # Lock the note so concurrent uploads cannot interleave their chunks
         cur.execute(
-            f"""
-            UPDATE notes SET {', '.join(update_fields)}
-            WHERE note_id = %s
-            RETURNING note_id, title, content, status, created_date, last_modified, user_id
+            """
+            SELECT note_id, title, content, version, content_length, content_offloaded
+            FROM notes WHERE note_id = %s AND user_id = %s FOR UPDATE
             """,
-            values
+            (note_id, current_user_id)
         )
-        updated_note = cur.fetchone()
+        current = cur.fetchone()
 
-        if 'tag_ids' in data:
-            cur.execute("DELETE FROM notetags WHERE note_id = %s", (note_id,))
+        if not current:
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Note not found'}), 404
 
-            for tag_id in data['tag_ids']:
-                try:
-                    cur.execute(
-                        """
-                        INSERT INTO notetags (note_id, tag_id, assigned_date)
-                        VALUES (%s, %s, NOW())
-                        """,
-                        (note_id, tag_id)
-                    )
-                except psycopg.errors.ForeignKeyViolation:
-                    conn.rollback()
-                    return jsonify({'error': f'Tag with id {tag_id} does not exist'}), 400
+        if expected_version is not None and current['version'] != expected_version:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({
+                'error': 'Note was modified by another request',
+                'current_version': current['version']
+            }), 409
+
+        record_revision(cur, note_id, current['version'], current['title'], note_content_length(current),
+                        None, lambda: read_note_content(cur, current))
+        cur.execute("DELETE FROM note_content_chunks WHERE note_id = %s", (note_id,))
+
+        try:
+            pieces = read_body_text(request.stream)
+            head = ''
+            for piece in pieces:
+                head += piece
+                if len(head) > app.config['CONTENT_OFFLOAD_THRESHOLD']:
+                    break
+
+            if len(head) > app.config['CONTENT_OFFLOAD_THRESHOLD']:
+                length = write_content_chunks(cur, note_id, itertools.chain([head], pieces))
+                content, offloaded = head[:CONTENT_PREVIEW_CHARS], True
+            else:
+                content, length, offloaded = head, None, False
+        except UnicodeDecodeError:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Content must be UTF-8 text'}), 400
 
         cur.execute(
             """
-            SELECT t.tag_id, t.tag_name, t.color
-            FROM tags t
-            JOIN notetags nt ON t.tag_id = nt.tag_id
-            WHERE nt.note_id = %s
+            UPDATE notes
+            SET content = %s, content_length = %s, content_offloaded = %s,
+                version = version + 1, last_modified = NOW()
+            WHERE note_id = %s AND user_id = %s
+            RETURNING note_id, title, content, status, created_date, last_modified, user_id, version,
+                      content_length, content_offloaded
             """,
-            (note_id,)
+            (content, length, offloaded, note_id, current_user_id)
         )
-        tags = cur.fetchall()
+        note = cur.fetchone()
+        tags = fetch_tags_for_notes(cur, current_user_id, [note_id])[note_id]
+
+        conn.commit()
+        cur.close()
+        conn.close()
+
+        return jsonify({
+            'message': 'Note content updated successfully',
+            'note': format_note(note, tags)
+        }), 200, {'ETag': f'"{note["version"]}"'}
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/notes/<int:note_id>/content', methods=['PATCH'])
+@token_required
+@admission_controlled('write')
+def patch_note_content(current_user_id, note_id):
+    """Apply text edits to a note's body against a base version.
+
+    Body: {"base_version": n, "edits": [{"offset", "delete", "insert"}, ...]}
+    (If-Match may carry the version instead). Offsets count characters of
+    the base version, so small edits to a large note send only the changed
+    text. Inline bodies are patched by a single UPDATE with nested overlay();
+    offloaded bodies, and edits that cross the offload threshold, are read,
+    patched and rewritten from the first chunk the edits touch. Either way
+    the replaced text is kept as a reverse-delta revision.
+    """
+    try:
+        data = request.get_json() or {}
+
+        try:
+            base_version = parse_expected_version({'version': data.get('base_version')})
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Version must be an integer'}), 400
+        if base_version is None:
+            return jsonify({'error': 'base_version is required'}), 400
 
-        update_user_stats(cur, current_user_id)
+        try:
+            edits = parse_content_edits(data.get('edits'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        returning = """
+            RETURNING note_id, title, content, status, created_date, last_modified, user_id, version,
+                      content_length, content_offloaded
+        """
+
+        # Applied last edit first so earlier offsets are not shifted
+        content_sql = "content"
+        content_params = []
+        for offset, delete, insert in reversed(edits):
+            content_sql = f"overlay({content_sql} placing %s from %s for %s)"
+            content_params.extend([insert, offset + 1, delete])
+        growth = sum(len(insert) - delete for _, delete, insert in edits)
+
+        # The replaced substrings, for the revision's reverse delta
+        deleted_sql = ", ".join(["substr(content, %s, %s)"] * len(edits))
+        deleted_params = [param for offset, delete, _ in edits for param in (offset + 1, delete)]
+
+        conn = get_db_connection(current_user_id)
+        cur = conn.cursor()
+
+        cur.execute(
+            f"""
+            WITH old AS (
+                SELECT note_id AS old_note_id, title AS old_title,
+                       ARRAY[{deleted_sql}]::text[] AS deleted
+                FROM notes
+                WHERE note_id = %s AND user_id = %s AND version = %s AND NOT content_offloaded
+                  AND length(content) >= %s AND length(content) + %s <= %s
+                FOR UPDATE
+            )
+            UPDATE notes SET content = {content_sql}, version = version + 1, last_modified = NOW()
+            FROM old
+            WHERE note_id = old.old_note_id AND user_id = %s
+            {returning}, old.old_title, old.deleted
+            """,
+            deleted_params + [note_id, current_user_id, base_version,
+                              edits[-1][0] + edits[-1][1], growth, app.config['CONTENT_OFFLOAD_THRESHOLD']]
+            + content_params + [current_user_id]
+        )
+        note = cur.fetchone()
+
+        if note:
+            reverse = reverse_content_edits(edits, note['deleted'])
+            record_revision(cur, note_id, base_version, note['old_title'], len(note['content']) - growth,
+                            reverse, lambda: apply_content_edits(note['content'], reverse))
+        else:
+            # Not a plain inline patch: find out why, or patch in Python
+            cur.execute(
+                """
+                SELECT note_id, title, content, version, content_length, content_offloaded
+                FROM notes WHERE note_id = %s AND user_id = %s FOR UPDATE
+                """,
+                (note_id, current_user_id)
+            )
+            current = cur.fetchone()
+
+            if not current:
+                cur.close()
+                conn.close()
+                return jsonify({'error': 'Note not found'}), 404
+
+            if current['version'] != base_version:
+                conn.rollback()
+                cur.close()
+                conn.close()
+                return jsonify({
+                    'error': 'Note was modified by another request',
+                    'current_version': current['version']
+                }), 409
+
+            # Chunks before the first edit stay as they are
+            first_chunk = edits[0][0] // CONTENT_CHUNK_CHARS if current['content_offloaded'] else 0
+            base_offset = first_chunk * CONTENT_CHUNK_CHARS
+            old_tail = read_note_content(cur, current, base_offset)
+            try:
+                tail = apply_content_edits(old_tail, edits, base_offset)
+            except ValueError as e:
+                conn.rollback()
+                cur.close()
+                conn.close()
+                return jsonify({'error': str(e)}), 400
+
+            deleted = [old_tail[offset - base_offset:offset - base_offset + delete] for offset, delete, _ in edits]
+            record_revision(
+                cur, note_id, base_version, current['title'], note_content_length(current),
+                reverse_content_edits(edits, deleted),
+                lambda: read_note_content(cur, current, 0, base_offset) + old_tail if base_offset else old_tail
+            )
+
+            length = base_offset + len(tail)
+            if length > app.config['CONTENT_OFFLOAD_THRESHOLD']:
+                if base_offset < CONTENT_PREVIEW_CHARS:
+                    preview = tail[:CONTENT_PREVIEW_CHARS]
+                else:
+                    preview = current['content']
+                cur.execute(
+                    "DELETE FROM note_content_chunks WHERE note_id = %s AND chunk_no >= %s",
+                    (note_id, first_chunk)
+                )
+                write_content_chunks(cur, note_id, [tail], first_chunk)
+                values = (preview, length, True)
+            else:
+                body = read_note_content(cur, current, 0, base_offset) + tail if base_offset else tail
+                cur.execute("DELETE FROM note_content_chunks WHERE note_id = %s", (note_id,))
+                values = (body, None, False)
+
+            cur.execute(
+                f"""
+                UPDATE notes
+                SET content = %s, content_length = %s, content_offloaded = %s,
+                    version = version + 1, last_modified = NOW()
+                WHERE note_id = %s AND user_id = %s
+                {returning}
+                """,
+                values + (note_id, current_user_id)
+            )
+            note = cur.fetchone()
 
         conn.commit()
         cur.close()
         conn.close()
 
         return jsonify({
-            'message': 'Note updated successfully',
+            'message': 'Note content updated successfully',
             'note': {
-                'note_id': updated_note['note_id'],
-                'title': updated_note['title'],
-                'content': updated_note['content'],
-                'status': updated_note['status'],
-                'created_date': updated_note['created_date'].isoformat(),
-                'last_modified': updated_note['last_modified'].isoformat(),
-                'user_id': updated_note['user_id'],
-                'tags': [{'tag_id': t['tag_id'], 'tag_name': t['tag_name'], 'color': t['color']} for t in tags]
+                'note_id': note['note_id'],
+                'version': note['version'],
+                'content_length': note_content_length(note),
+                'last_modified': note['last_modified'].isoformat()
             }
-        }), 200
+        }), 200, {'ETag': f'"{note["version"]}"'}
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -781,6 +2438,7 @@ def update_note(current_user_id, note_id):
 
 @app.route('/api/notes/<int:note_id>/status', methods=['PATCH'])
 @token_required
+@admission_controlled('write')
 def update_note_status(current_user_id, note_id):
     """Update note status (pin/archive/activate)."""
     try:
@@ -794,14 +2452,14 @@ def update_note_status(current_user_id, note_id):
         if status not in valid_statuses:
             return jsonify({'error': f'Status must be one of: {", ".join(valid_statuses)}'}), 400
 
-        conn = get_db_connection()
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
         cur.execute(
             """
-            UPDATE notes SET status = %s, last_modified = NOW()
+            UPDATE notes SET status = %s, last_modified = NOW(), version = version + 1
             WHERE note_id = %s AND user_id = %s
-            RETURNING note_id, title, status, last_modified
+            RETURNING note_id, title, status, last_modified, version
             """,
             (status, note_id, current_user_id)
         )
@@ -822,7 +2480,8 @@ def update_note_status(current_user_id, note_id):
                 'note_id': updated_note['note_id'],
                 'title': updated_note['title'],
                 'status': updated_note['status'],
-                'last_modified': updated_note['last_modified'].isoformat()
+                'last_modified': updated_note['last_modified'].isoformat(),
+                'version': updated_note['version']
             }
         }), 200
 
@@ -832,10 +2491,11 @@ def update_note_status(current_user_id, note_id):
 
 @app.route('/api/notes/<int:note_id>', methods=['DELETE'])
 @token_required
+@admission_controlled('write')
 def delete_note(current_user_id, note_id):
     """Delete a note."""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
         cur.execute(
@@ -849,26 +2509,709 @@ def delete_note(current_user_id, note_id):
             conn.close()
             return jsonify({'error': 'Note not found'}), 404
 
-        update_user_stats(cur, current_user_id)
-
         conn.commit()
         cur.close()
         conn.close()
 
+        draft_buffer.discard(note_id, current_user_id)
+        schedule_user_stats_refresh(current_user_id)
+
         return jsonify({'message': 'Note deleted successfully'}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== REVISION ENDPOINTS ====================
+
+# Oldest revisions beyond the retention period or the per-note cap; nothing
+# older depends on them, so they can go without re-encoding anything. Run
+# as a background job after each new revision.
+# Takes (note_id, retention_days, note_id, max_per_note).
+PRUNE_REVISIONS_QUERY = """
+    DELETE FROM note_revisions
+    WHERE note_id = %s
+      AND (created_at < NOW() - make_interval(days => %s)
+           OR version <= (SELECT version FROM note_revisions WHERE note_id = %s
+                          ORDER BY version DESC OFFSET %s LIMIT 1))
+"""
+
+
+def diff_content_edits(text, target):
+    """Return sorted edits that turn text into target, from a line-based diff."""
+    a = text.splitlines(keepends=True)
+    b = target.splitlines(keepends=True)
+
+    # Most saves change a small region; only that part goes through difflib
+    common = min(len(a), len(b))
+    start = 0
+    while start < common and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < common - start and a[len(a) - 1 - end] == b[len(b) - 1 - end]:
+        end += 1
+
+    edits = []
+    offset = sum(len(line) for line in a[:start])
+    matcher = difflib.SequenceMatcher(None, a[start:len(a) - end], b[start:len(b) - end], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        length = sum(len(line) for line in a[start + i1:start + i2])
+        if tag != 'equal':
+            edits.append((offset, length, ''.join(b[start + j1:start + j2])))
+        offset += length
+    return edits
+
+
+def reverse_content_edits(edits, deleted):
+    """Invert applied edits given the text each one deleted."""
+    reverse = []
+    shift = 0
+    for (offset, delete, insert), removed in zip(edits, deleted):
+        reverse.append((offset + shift, len(insert), removed))
+        shift += len(insert) - delete
+    return reverse
+
+
+def record_revision(cur, note_id, version, title, length, reverse_edits, load_body):
+    """Store the state a note had at `version` before a write replaced it.
+
+    reverse_edits turn the new body back into the old one; None forces a
+    full snapshot. load_body() returns the old body and is only called when
+    a snapshot is stored.
+    """
+    cur.execute(
+        """
+        SELECT COUNT(*) AS deltas FROM note_revisions
+        WHERE note_id = %s AND version > COALESCE(
+            (SELECT MAX(version) FROM note_revisions WHERE note_id = %s AND is_snapshot), 0)
+        """,
+        (note_id, note_id)
+    )
+    snapshot = (reverse_edits is None or
+                cur.fetchone()['deltas'] >= app.config['REVISION_SNAPSHOT_INTERVAL'] - 1)
+
+    cur.execute(
+        """
+        INSERT INTO note_revisions (note_id, version, title, content_length, is_snapshot, content, delta)
+        VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb)
+        """,
+        (note_id, version, title, length, snapshot,
+         load_body() if snapshot else None,
+         None if snapshot else json.dumps(reverse_edits))
+    )
+
+    job_queue.enqueue(('prune_revisions', cur.connection.shard, note_id), run_job_statement, PRUNE_REVISIONS_QUERY,
+                      (note_id, app.config['REVISION_RETENTION_DAYS'], note_id, app.config['REVISION_MAX_PER_NOTE']),
+                      cur.connection.shard)
+
+
+def reconstruct_revision(cur, note, version):
+    """Rebuild a stored revision of a note; returns the revision row with its content, or None.
+
+    Starts from the nearest newer snapshot (or the note itself) and applies
+    the reverse deltas down to `version`, so at most
+    REVISION_SNAPSHOT_INTERVAL deltas are applied.
+    """
+    cur.execute(
+        """
+        SELECT version, title, content_length, is_snapshot, content, delta, created_at
+        FROM note_revisions
+        WHERE note_id = %s AND version >= %s
+          AND version <= COALESCE((SELECT MIN(version) FROM note_revisions
+                                   WHERE note_id = %s AND version >= %s AND is_snapshot), %s)
+        ORDER BY version DESC
+        """,
+        (note['note_id'], version, note['note_id'], version, note['version'])
+    )
+    rows = cur.fetchall()
+    if not rows or rows[-1]['version'] != version:
+        return None
+
+    body = None if rows[0]['is_snapshot'] else read_note_content(cur, note)
+    for row in rows:
+        body = row['content'] if row['is_snapshot'] else apply_content_edits(body, row['delta'])
+
+    revision = rows[-1]
+    revision['content'] = body
+    return revision
+
+
+def compact_note_revisions(cur, note_id, user_id, before):
+    """Keep one revision per day before `before` and re-encode the note's history.
+
+    Dropping a revision breaks the delta of the one below it, so the kept
+    revisions are rebuilt newest first and stored again with fresh deltas
+    and evenly spaced snapshots. Returns the number of revisions removed.
+    """
+    cur.execute(
+        """
+        SELECT note_id, content, version, content_length, content_offloaded
+        FROM notes WHERE note_id = %s AND user_id = %s FOR UPDATE
+        """,
+        (note_id, user_id)
+    )
+    note = cur.fetchone()
+    if not note:
+        return 0
+
+    cur.execute(
+        """
+        SELECT version, title, is_snapshot, content, delta, created_at
+        FROM note_revisions WHERE note_id = %s ORDER BY version DESC
+        """,
+        (note_id,)
+    )
+    rows = cur.fetchall()
+
+    kept = []
+    days = set()
+    body = newer_body = read_note_content(cur, note)
+    since_snapshot = 0
+    for row in rows:
+        body = row['content'] if row['is_snapshot'] else apply_content_edits(body, row['delta'])
+        if row['created_at'] < before:
+            if row['created_at'].date() in days:
+                continue
+            days.add(row['created_at'].date())
+
+        snapshot = since_snapshot >= app.config['REVISION_SNAPSHOT_INTERVAL'] - 1
+        kept.append((note_id, row['version'], row['title'], len(body), snapshot,
+                     body if snapshot else None,
+                     None if snapshot else json.dumps(diff_content_edits(newer_body, body)),
+                     row['created_at']))
+        since_snapshot = 0 if snapshot else since_snapshot + 1
+        newer_body = body
+
+    cur.execute("DELETE FROM note_revisions WHERE note_id = %s", (note_id,))
+    cur.executemany(
+        """
+        INSERT INTO note_revisions (note_id, version, title, content_length, is_snapshot, content, delta, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb, %s)
+        """,
+        kept
+    )
+    return len(rows) - len(kept)
+
+
+def fetch_owned_note(cur, note_id, user_id):
+    """Load the note row needed to read its body; None if the user does not own it."""
+    cur.execute(
+        """
+        SELECT note_id, content, version, content_length, content_offloaded
+        FROM notes WHERE note_id = %s AND user_id = %s
+        """,
+        (note_id, user_id)
+    )
+    return cur.fetchone()
+
+
+@app.route('/api/notes/<int:note_id>/revisions', methods=['GET'])
+@token_required
+@admission_controlled('read')
+def get_note_revisions(current_user_id, note_id):
+    """List the stored revisions of a note, newest first."""
+    try:
+        try:
+            limit, offset = parse_page_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        conn = get_db_connection(current_user_id)
+        cur = conn.cursor()
+
+        if not fetch_owned_note(cur, note_id, current_user_id):
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Note not found'}), 404
+
+        cur.execute(
+            """
+            SELECT version, title, content_length, created_at
+            FROM note_revisions WHERE note_id = %s
+            ORDER BY version DESC
+            LIMIT %s OFFSET %s
+            """,
+            (note_id, limit, offset)
+        )
+        revisions = cur.fetchall()
+
+        cur.close()
+        conn.close()
+
+        return jsonify({
+            'revisions': [{
+                'version': r['version'],
+                'title': r['title'],
+                'content_length': r['content_length'],
+                'created_at': r['created_at'].isoformat()
+            } for r in revisions]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/notes/<int:note_id>/revisions/<int:version>', methods=['GET'])
+@token_required
+@admission_controlled('read')
+def get_note_revision(current_user_id, note_id, version):
+    """Reconstruct a note's title and body as of a stored revision."""
+    try:
+        conn = get_db_connection(current_user_id)
+        cur = conn.cursor()
+
+        note = fetch_owned_note(cur, note_id, current_user_id)
+        if not note:
+            cur.close()
+            conn.close()
+            return jsonify({'error': 'Note not found'}), 404
+
+        revision = reconstruct_revision(cur, note, version)
+
+        cur.close()
+        conn.close()
+
+        if not revision:
+            return jsonify({'error': 'Revision not found'}), 404
+
+        return jsonify({
+            'revision': {
+                'note_id': note_id,
+                'version': revision['version'],
+                'title': revision['title'],
+                'content': revision['content'],
+                'content_length': revision['content_length'],
+                'created_at': revision['created_at'].isoformat()
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== AUTOSAVE DRAFTS ====================
+
+# How long the outcome of a flush is remembered for clients still sending
+# drafts against the version they loaded
+DRAFT_SETTLED_SECONDS = 3600
+
+
+class DraftBuffer:
+    """Hold the latest autosaved title and body per note until it is written.
+
+    Keystroke-driven autosaves only replace the buffered draft; the note row
+    is written once, through write_note, when the draft has been idle for
+    DRAFT_IDLE_SECONDS, is DRAFT_MAX_AGE_SECONDS old, or is saved
+    explicitly. Clients keep sending drafts against the version they
+    loaded, so each flush remembers the version it produced and later
+    drafts are rebased onto it. A flush that finds the title or body edited
+    elsewhere drops the draft and reports the conflict to the next draft or
+    save; status and tag changes in between do not conflict. Drafts
+    live in this worker process; DRAFT_SPILL_DIR keeps a copy on disk.
+    Drafts are keyed by (user_id, note_id), as note ids are only unique
+    within a shard until rebalance_shards.py --prepare has run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.drafts = {}
+        self.settled = {}
+        self.flusher = None
+
+    def start(self):
+        """Start the flusher thread, first reloading drafts spilled by an earlier process."""
+        if self.flusher is not None:
+            return
+        with self.lock:
+            if self.flusher is not None:
+                return
+            for draft in self._load_spilled():
+                self.drafts.setdefault((draft['user_id'], draft['note_id']), draft)
+            self.flusher = threading.Thread(target=self._run, name='draft-flusher', daemon=True)
+            self.flusher.start()
+
+    def put(self, note_id, user_id, base_version, fields, verified=False):
+        """Buffer a draft made against base_version.
+
+        Returns (True, None) once buffered and (False, current_version) on a
+        conflict. (False, None) means nothing is known about this note and
+        base yet: the caller checks ownership and version in the database
+        and calls again with verified=True.
+        """
+        now = time.time()
+        key = (user_id, note_id)
+        shard = shard_router.shard_for(user_id)
+        with self.lock:
+            draft = self.drafts.get(key)
+            settled = self.settled.get(key)
+
+            if draft:
+                if base_version not in (draft['client_base'], draft['base_version']):
+                    return False, draft['base_version']
+                draft['fields'].update(fields)
+                draft['last_seen'] = now
+                draft['seq'] += 1
+                self._spill(draft)
+                return True, None
+
+            if settled and base_version in (settled['client_base'], settled['version']):
+                if settled['version'] is None:
+                    return False, settled['current_version']
+                base = settled['version']
+            elif verified:
+                base = base_version
+            else:
+                return False, None
+
+            draft = {
+                'note_id': note_id, 'user_id': user_id, 'shard': shard,
+                'client_base': base_version, 'base_version': base,
+                'fields': dict(fields), 'first_seen': now, 'last_seen': now, 'seq': 0
+            }
+            self.drafts[key] = draft
+            self._spill(draft)
+            return True, None
+
+    def flush(self, note_id, user_id):
+        """Write a user's pending draft for a note, if any, through write_note."""
+        key = (user_id, note_id)
+        if key not in self.drafts:
+            return
+        with self.flush_lock:
+            with self.lock:
+                draft = self.drafts.get(key)
+                if not draft:
+                    return
+                fields, seq = dict(draft['fields']), draft['seq']
+
+            conn = get_db_connection(draft['user_id'])
+            cur = conn.cursor()
+            try:
+                result = write_note(cur, note_id, draft['user_id'], fields, draft['base_version'])
+                if result['note_id'] is None and result['current_version'] is not None:
+                    # Every title or body change since the base left a revision; if
+                    # only status or tags moved on, the draft still applies
+                    cur.execute(
+                        "SELECT EXISTS (SELECT 1 FROM note_revisions WHERE note_id = %s AND version >= %s) AS edited",
+                        (note_id, draft['base_version'])
+                    )
+                    if not cur.fetchone()['edited']:
+                        result = write_note(cur, note_id, draft['user_id'], fields, result['current_version'])
+                if result['note_id'] is None:
+                    conn.rollback()
+                else:
+                    conn.commit()
+                    search_cache.invalidate(draft['user_id'])
+            finally:
+                cur.close()
+                conn.close()
+
+            now = time.time()
+            with self.lock:
+                self.settled[key] = {
+                    'client_base': draft['client_base'],
+                    'version': result['version'],
+                    'current_version': result['current_version'],
+                    'at': now
+                }
+                if result['note_id'] is not None and draft['seq'] != seq and self.drafts.get(key) is draft:
+                    # Edits that arrived during the write stay buffered on top of it
+                    draft['base_version'] = result['version']
+                    draft['first_seen'] = now
+                    self._spill(draft)
+                else:
+                    self.drafts.pop(key, None)
+                    self._unspill(draft)
+
+    def save(self, note_id, user_id, base_version):
+        """Flush a client's pending draft now.
+
+        Returns (version, None) with the version holding the client's
+        drafts, (None, current_version) on a conflict, or (None, None) if
+        nothing is known about this note and base.
+        """
+        self.flush(note_id, user_id)
+
+        with self.lock:
+            settled = self.settled.get((user_id, note_id))
+            if settled and base_version in (settled['client_base'], settled['version']):
+                return settled['version'], settled['current_version']
+        return None, None
+
+    def discard(self, note_id, user_id):
+        """Drop a note's pending draft; returns whether there was one."""
+        key = (user_id, note_id)
+        with self.lock:
+            draft = self.drafts.pop(key, None)
+            if not draft:
+                return False
+            self.settled.pop(key, None)
+            self._unspill(draft)
+            return True
+
+    def flush_all(self):
+        """Write every pending draft, e.g. at shutdown."""
+        for user_id, note_id in list(self.drafts):
+            try:
+                self.flush(note_id, user_id)
+            except Exception as e:
+                app.logger.warning(f'Draft flush for note {note_id} failed: {e}')
+
+    def _run(self):
+        idle = app.config['DRAFT_IDLE_SECONDS']
+        max_age = app.config['DRAFT_MAX_AGE_SECONDS']
+        while True:
+            time.sleep(min(idle, max_age) / 2)
+            now = time.time()
+            with self.lock:
+                due = [key for key, draft in self.drafts.items()
+                       if now - draft['last_seen'] >= idle or now - draft['first_seen'] >= max_age]
+                for key in [k for k, s in self.settled.items() if now - s['at'] > DRAFT_SETTLED_SECONDS]:
+                    del self.settled[key]
+            for user_id, note_id in due:
+                try:
+                    self.flush(note_id, user_id)
+                except Exception as e:
+                    # Kept buffered; retried on the next pass
+                    app.logger.warning(f'Draft flush for note {note_id} failed: {e}')
+
+    def _spill_path(self, draft):
+        filename = f"{draft['shard']}-{draft['user_id']}-{draft['note_id']}.json"
+        return os.path.join(app.config['DRAFT_SPILL_DIR'], filename)
+
+    def _spill(self, draft):
+        if not app.config['DRAFT_SPILL_DIR']:
+            return
+        path = self._spill_path(draft)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(draft, f)
+            if app.config['DRAFT_SPILL_FSYNC']:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def _unspill(self, draft):
+        if not app.config['DRAFT_SPILL_DIR']:
+            return
+        try:
+            os.remove(self._spill_path(draft))
+        except FileNotFoundError:
+            pass
+
+    def _load_spilled(self):
+        spill_dir = app.config['DRAFT_SPILL_DIR']
+        if not spill_dir:
+            return []
+        os.makedirs(spill_dir, exist_ok=True)
+        drafts = []
+        for filename in os.listdir(spill_dir):
+            if filename.endswith('.json'):
+                path = os.path.join(spill_dir, filename)
+                with open(path, encoding='utf-8') as f:
+                    drafts.append(json.load(f))
+        return drafts
+
+
+draft_buffer = DraftBuffer()
+atexit.register(draft_buffer.flush_all)
+
+
+@app.before_request
+def start_draft_buffer():
+    draft_buffer.start()
+
+
+def parse_draft_base_version(data):
+    """Read a draft's base_version from the body or If-Match; raises ValueError if absent."""
+    try:
+        base_version = parse_expected_version({'version': data.get('base_version')})
+    except (TypeError, ValueError):
+        raise ValueError('Version must be an integer')
+    if base_version is None:
+        raise ValueError('base_version is required')
+    return base_version
+
+
+def check_draft_base(note_id, user_id, base_version):
+    """Look up the note for a draft the buffer knows nothing about; returns an error response or None."""
+    conn = get_db_connection(user_id)
+    cur = conn.cursor()
+    note = fetch_owned_note(cur, note_id, user_id)
+    cur.close()
+    conn.close()
+
+    if not note:
+        return jsonify({'error': 'Note not found'}), 404
+    if note['version'] != base_version:
+        return jsonify({
+            'error': 'Note was modified by another request',
+            'current_version': note['version']
+        }), 409
+    return None
+
+
+@app.route('/api/notes/<int:note_id>/draft', methods=['PUT'])
+@token_required
+@admission_controlled('write')
+def put_note_draft(current_user_id, note_id):
+    """Buffer an autosaved title and/or body for a note.
+
+    Body: {"base_version": n, "title": ..., "content": ...}. Only the first
+    draft against a version touches the database (to check the note);
+    later ones replace the buffered draft in memory until it is flushed.
+    """
+    try:
+        data = request.get_json() or {}
+
+        fields = {key: data[key] for key in ('title', 'content') if key in data}
+        if not fields:
+            return jsonify({'error': 'Draft must include title or content'}), 400
+        if 'title' in fields and not fields['title']:
+            return jsonify({'error': 'Title cannot be empty'}), 400
+
+        try:
+            base_version = parse_draft_base_version(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        buffered, current_version = draft_buffer.put(note_id, current_user_id, base_version, fields)
+        if not buffered and current_version is None:
+            error = check_draft_base(note_id, current_user_id, base_version)
+            if error:
+                return error
+            buffered, current_version = draft_buffer.put(note_id, current_user_id, base_version, fields,
+                                                          verified=True)
+
+        if not buffered:
+            return jsonify({
+                'error': 'Note was modified by another request',
+                'current_version': current_version
+            }), 409
+
+        return jsonify({
+            'message': 'Draft saved',
+            'draft': {'note_id': note_id, 'base_version': base_version}
+        }), 202
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/notes/<int:note_id>/draft/flush', methods=['POST'])
+@token_required
+@admission_controlled('write')
+def flush_note_draft(current_user_id, note_id):
+    """Write the pending draft now; returns the version that holds the client's drafts."""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        try:
+            base_version = parse_draft_base_version(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        version, current_version = draft_buffer.save(note_id, current_user_id, base_version)
+        if version is None and current_version is None:
+            # No draft of this client's was ever buffered; its version is still current
+            error = check_draft_base(note_id, current_user_id, base_version)
+            if error:
+                return error
+            version = base_version
+
+        if version is None:
+            return jsonify({
+                'error': 'Note was modified by another request',
+                'current_version': current_version
+            }), 409
+
+        return jsonify({
+            'message': 'Draft saved',
+            'note': {'note_id': note_id, 'version': version}
+        }), 200, {'ETag': f'"{version}"'}
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/notes/<int:note_id>/draft', methods=['DELETE'])
+@token_required
+@admission_controlled('write')
+def discard_note_draft(current_user_id, note_id):
+    """Drop a note's pending draft without writing it."""
+    if not draft_buffer.discard(note_id, current_user_id):
+        return jsonify({'error': 'No pending draft'}), 404
+    return jsonify({'message': 'Draft discarded'}), 200
+
+
 # ==================== TAGS ENDPOINTS ====================
 
+def replicate_tags(tag_ids=None):
+    """Copy tags from the catalog shard to every other shard (all tags by default).
+
+    Tags no longer in the catalog are deleted on the shards, which cascades
+    to their notetags there as it did on the catalog.
+    """
+    conn = get_db_connection()
+    try:
+        if tag_ids is None:
+            tags = conn.execute("SELECT tag_id, tag_name, color, created_at FROM tags").fetchall()
+        else:
+            tags = conn.execute(
+                "SELECT tag_id, tag_name, color, created_at FROM tags WHERE tag_id = ANY(%s)",
+                (list(tag_ids),)
+            ).fetchall()
+    finally:
+        conn.close()
+    present = [t['tag_id'] for t in tags]
+
+    for shard in range(1, shard_router.shard_count):
+        conn = shard_router.connect(shard)
+        try:
+            if tag_ids is None:
+                conn.execute("DELETE FROM tags WHERE NOT (tag_id = ANY(%s))", (present,))
+            else:
+                conn.execute("DELETE FROM tags WHERE tag_id = ANY(%s) AND NOT (tag_id = ANY(%s))",
+                             (list(tag_ids), present))
+            # Unchanged rows are left alone, so clients do not resync them
+            conn.execute(
+                """
+                INSERT INTO tags (tag_id, tag_name, color, created_at)
+                SELECT * FROM unnest(%s::int[], %s::varchar[], %s::varchar[], %s::timestamp[])
+                ON CONFLICT (tag_id) DO UPDATE SET tag_name = EXCLUDED.tag_name, color = EXCLUDED.color
+                WHERE (tags.tag_name, tags.color) IS DISTINCT FROM (EXCLUDED.tag_name, EXCLUDED.color)
+                """,
+                ([t['tag_id'] for t in tags], [t['tag_name'] for t in tags],
+                 [t['color'] for t in tags], [t['created_at'] for t in tags])
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def replicate_tag_change(tag_id):
+    """Push a committed tag write to the other shards.
+
+    Done before responding, so the tag can be used on any shard right away;
+    if a shard is unreachable the copy is retried in the background.
+    """
+    if shard_router.shard_count == 1:
+        return
+    try:
+        replicate_tags([tag_id])
+    except Exception as e:
+        app.logger.warning(f'Replicating tag {tag_id} failed, retrying in the background: {e}')
+        job_queue.enqueue(('replicate_tag', tag_id), replicate_tags, [tag_id])
+
+
 @app.route('/api/tags', methods=['GET'])
 @token_required
+@coalesced
+@admission_controlled('read')
 def get_tags(current_user_id):
     """Get all available tags."""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
         cur.execute(
@@ -898,10 +3241,11 @@ def get_tags(current_user_id):
 
 @app.route('/api/tags/<int:tag_id>', methods=['GET'])
 @token_required
+@admission_controlled('read')
 def get_tag(current_user_id, tag_id):
     """Get a specific tag by ID."""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
         cur.execute(
@@ -931,6 +3275,7 @@ def get_tag(current_user_id, tag_id):
 
 @app.route('/api/tags', methods=['POST'])
 @token_required
+@admission_controlled('write')
 def create_tag(current_user_id):
     """Create a new tag."""
     try:
@@ -965,6 +3310,7 @@ def create_tag(current_user_id):
 
             cur.close()
             conn.close()
+            replicate_tag_change(new_tag['tag_id'])
 
             return jsonify({
                 'message': 'Tag created successfully',
@@ -986,6 +3332,7 @@ def create_tag(current_user_id):
 
 @app.route('/api/tags/<int:tag_id>', methods=['PUT'])
 @token_required
+@admission_controlled('write')
 def update_tag(current_user_id, tag_id):
     """Update a tag."""
     try:
@@ -1033,6 +3380,7 @@ def update_tag(current_user_id, tag_id):
             conn.commit()
             cur.close()
             conn.close()
+            replicate_tag_change(tag_id)
 
             return jsonify({
                 'message': 'Tag updated successfully',
@@ -1054,6 +3402,7 @@ def update_tag(current_user_id, tag_id):
 
 @app.route('/api/tags/<int:tag_id>', methods=['DELETE'])
 @token_required
+@admission_controlled('write')
 def delete_tag(current_user_id, tag_id):
     """Delete a tag."""
     try:
@@ -1071,6 +3420,7 @@ def delete_tag(current_user_id, tag_id):
         conn.commit()
         cur.close()
         conn.close()
+        replicate_tag_change(tag_id)
 
         return jsonify({'message': 'Tag deleted successfully'}), 200
 
@@ -1082,10 +3432,11 @@ def delete_tag(current_user_id, tag_id):
 
 @app.route('/api/notes/<int:note_id>/tags', methods=['GET'])
 @token_required
+@admission_controlled('read')
 def get_note_tags(current_user_id, note_id):
     """Get all tags for a specific note."""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
         cur.execute(
@@ -1102,10 +3453,10 @@ def get_note_tags(current_user_id, note_id):
             SELECT t.tag_id, t.tag_name, t.color, nt.assigned_date
             FROM tags t
             JOIN notetags nt ON t.tag_id = nt.tag_id
-            WHERE nt.note_id = %s
+            WHERE nt.user_id = %s AND nt.note_id = %s
             ORDER BY t.tag_name
             """,
-            (note_id,)
+            (current_user_id, note_id)
         )
         tags = cur.fetchall()
 
@@ -1127,58 +3478,54 @@ def get_note_tags(current_user_id, note_id):
 
 @app.route('/api/notes/<int:note_id>/tags/<int:tag_id>', methods=['POST'])
 @token_required
+@admission_controlled('write')
 def add_tag_to_note(current_user_id, note_id, tag_id):
     """Add a tag to a note."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute(
-            "SELECT note_id FROM notes WHERE note_id = %s AND user_id = %s",
-            (note_id, current_user_id)
-        )
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Note not found'}), 404
-
-        cur.execute("SELECT tag_id FROM tags WHERE tag_id = %s", (tag_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Tag not found'}), 404
-
-        try:
-            cur.execute(
+        conn = get_db_connection(current_user_id)
+
+        # The insert only happens when both checks pass, so the checks and
+        # the insert can be pipelined.
+        note_rows, tag_rows, inserted_rows = run_pipeline(conn, [
+            ("SELECT note_id FROM notes WHERE note_id = %s AND user_id = %s", (note_id, current_user_id)),
+            ("SELECT tag_id FROM tags WHERE tag_id = %s", (tag_id,)),
+            (
                 """
-                INSERT INTO notetags (note_id, tag_id, assigned_date)
-                VALUES (%s, %s, NOW())
+                INSERT INTO notetags (note_id, user_id, tag_id, assigned_date)
+                SELECT n.note_id, n.user_id, t.tag_id, NOW()
+                FROM notes n, tags t
+                WHERE n.note_id = %s AND n.user_id = %s AND t.tag_id = %s
+                ON CONFLICT (note_id, user_id, tag_id) DO NOTHING
                 RETURNING notetag_id, note_id, tag_id, assigned_date
                 """,
-                (note_id, tag_id)
-            )
-            new_notetag = cur.fetchone()
-
-            update_user_stats(cur, current_user_id)
-
-            conn.commit()
+                (note_id, current_user_id, tag_id)
+            ),
+        ])
 
-            cur.close()
+        if not note_rows or not tag_rows or not inserted_rows:
+            conn.rollback()
             conn.close()
+            if not note_rows:
+                return jsonify({'error': 'Note not found'}), 404
+            if not tag_rows:
+                return jsonify({'error': 'Tag not found'}), 404
+            return jsonify({'error': 'Tag is already assigned to this note'}), 409
 
-            return jsonify({
-                'message': 'Tag added to note successfully',
-                'notetag': {
-                    'notetag_id': new_notetag['notetag_id'],
-                    'note_id': new_notetag['note_id'],
-                    'tag_id': new_notetag['tag_id'],
-                    'assigned_date': new_notetag['assigned_date'].isoformat()
-                }
-            }), 201
+        conn.commit()
+        conn.close()
 
-        except psycopg.errors.UniqueViolation:
-            conn.rollback()
-            return jsonify({'error': 'Tag is already assigned to this note'}), 409
+        schedule_user_stats_refresh(current_user_id)
+
+        new_notetag = inserted_rows[0]
+        return jsonify({
+            'message': 'Tag added to note successfully',
+            'notetag': {
+                'notetag_id': new_notetag['notetag_id'],
+                'note_id': new_notetag['note_id'],
+                'tag_id': new_notetag['tag_id'],
+                'assigned_date': new_notetag['assigned_date'].isoformat()
+            }
+        }), 201
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1186,38 +3533,36 @@ def add_tag_to_note(current_user_id, note_id, tag_id):
 
 @app.route('/api/notes/<int:note_id>/tags/<int:tag_id>', methods=['DELETE'])
 @token_required
+@admission_controlled('write')
 def remove_tag_from_note(current_user_id, note_id, tag_id):
     """Remove a tag from a note."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute(
-            "SELECT note_id FROM notes WHERE note_id = %s AND user_id = %s",
-            (note_id, current_user_id)
-        )
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
-            return jsonify({'error': 'Note not found'}), 404
+        conn = get_db_connection(current_user_id)
 
-        cur.execute(
-            "DELETE FROM notetags WHERE note_id = %s AND tag_id = %s RETURNING notetag_id",
-            (note_id, tag_id)
-        )
-        deleted = cur.fetchone()
+        note_rows, deleted_rows = run_pipeline(conn, [
+            ("SELECT note_id FROM notes WHERE note_id = %s AND user_id = %s", (note_id, current_user_id)),
+            (
+                """
+                DELETE FROM notetags
+                WHERE user_id = %s AND note_id = %s AND tag_id = %s
+                RETURNING notetag_id
+                """,
+                (current_user_id, note_id, tag_id)
+            ),
+        ])
 
-        if not deleted:
-            cur.close()
+        if not note_rows or not deleted_rows:
+            conn.rollback()
             conn.close()
+            if not note_rows:
+                return jsonify({'error': 'Note not found'}), 404
             return jsonify({'error': 'Tag association not found'}), 404
 
-        update_user_stats(cur, current_user_id)
-
         conn.commit()
-        cur.close()
         conn.close()
 
+        schedule_user_stats_refresh(current_user_id)
+
         return jsonify({'message': 'Tag removed from note successfully'}), 200
 
     except Exception as e:
@@ -1226,10 +3571,12 @@ def remove_tag_from_note(current_user_id, note_id, tag_id):
 
 @app.route('/api/tags/<int:tag_id>/notes', methods=['GET'])
 @token_required
+@coalesced
+@admission_controlled('read')
 def get_notes_by_tag(current_user_id, tag_id):
     """Get all notes that have a specific tag."""
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
         cur.execute(
@@ -1237,11 +3584,11 @@ def get_notes_by_tag(current_user_id, tag_id):
             SELECT n.note_id, n.title, n.content, n.status, 
                    n.created_date, n.last_modified, n.user_id
             FROM notes n
-            JOIN notetags nt ON n.note_id = nt.note_id
-            WHERE nt.tag_id = %s AND n.user_id = %s
+            JOIN notetags nt ON n.user_id = nt.user_id AND n.note_id = nt.note_id
+            WHERE nt.tag_id = %s AND n.user_id = %s AND nt.user_id = %s
             ORDER BY n.last_modified DESC
             """,
-            (tag_id, current_user_id)
+            (tag_id, current_user_id, current_user_id)
         )
         notes = cur.fetchall()
 
@@ -1266,69 +3613,582 @@ def get_notes_by_tag(current_user_id, tag_id):
 
 # ==================== SEARCH ENDPOINT ====================
 
+class SearchCache:
+    """LRU cache of search results as note id lists, per user.
+
+    Entries are keyed by user, lowercased query and filters, and hold the
+    matching ids in result order, so every page of a search is served from
+    one entry. Each user has a generation that note and notetag writes
+    bump (through note_user_write, draft flushes and the change listener
+    for other worker processes); entries from older generations are
+    dropped. Results are only cached while the change listener is
+    connected, since otherwise writes elsewhere would go unnoticed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.id_bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evicted': 0, 'invalidated': 0}
+
+    def enabled(self):
+        if app.config['SEARCH_CACHE_ENTRIES'] <= 0:
+            return False
+        change_hub.start_listener()
+        return change_hub.listening
+
+    def generation(self, user_id):
+        with self.lock:
+            return self.generations.get(user_id, 0)
+
+    def get(self, user_id, key):
+        """Return the cached note ids for a search, or None."""
+        with self.lock:
+            entry_key = (user_id, self.generations.get(user_id, 0), key)
+            note_ids = self.entries.get(entry_key)
+            if note_ids is None:
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(entry_key)
+            self.counters['hits'] += 1
+            return note_ids
+
+    def put(self, user_id, generation, key, note_ids):
+        """Cache ids computed at generation, unless a write has happened since."""
+        note_ids = array.array('i', note_ids)
+        size = note_ids.itemsize * len(note_ids)
+        if size > app.config['SEARCH_CACHE_MAX_BYTES']:
+            return
+        with self.lock:
+            if self.generations.get(user_id, 0) != generation:
+                return
+            entry_key = (user_id, generation, key)
+            previous = self.entries.pop(entry_key, None)
+            if previous is not None:
+                self.id_bytes -= previous.itemsize * len(previous)
+            self.entries[entry_key] = note_ids
+            self.id_bytes += size
+            while (len(self.entries) > app.config['SEARCH_CACHE_ENTRIES']
+                   or self.id_bytes > app.config['SEARCH_CACHE_MAX_BYTES']):
+                _, evicted = self.entries.popitem(last=False)
+                self.id_bytes -= evicted.itemsize * len(evicted)
+                self.counters['evicted'] += 1
+
+    def invalidate(self, user_id):
+        """Start a new generation for a user and drop their cached results."""
+        with self.lock:
+            self.generations[user_id] = self.generations.get(user_id, 0) + 1
+            for entry_key in [k for k in self.entries if k[0] == user_id]:
+                note_ids = self.entries.pop(entry_key)
+                self.id_bytes -= note_ids.itemsize * len(note_ids)
+                self.counters['invalidated'] += 1
+
+    def clear(self):
+        with self.lock:
+            for user_id in {k[0] for k in self.entries}:
+                self.generations[user_id] = self.generations.get(user_id, 0) + 1
+            self.counters['invalidated'] += len(self.entries)
+            self.entries.clear()
+            self.id_bytes = 0
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_rate': round(self.counters['hits'] / lookups, 3) if lookups else None,
+                'entries': len(self.entries),
+                'id_bytes': self.id_bytes,
+                'listening': change_hub.listening
+            }
+
+
+search_cache = SearchCache()
+
+
+def build_search_ids_query(user_id, search, status=None, tag_ids=None, tag_mode='any',
+                           archived='include', date_range=None):
+    """Build the query for the ids of every note matching a search, most recently modified first."""
+    where, params = build_notes_filter(user_id, status, tag_ids, search, tag_mode, archived, date_range)
+    query = f"""
+        SELECT n.note_id FROM notes n
+        WHERE {where}
+        ORDER BY n.last_modified DESC, n.note_id DESC
+    """
+    return query, params
+
+
 @app.route('/api/search', methods=['GET'])
 @token_required
+@coalesced
+@admission_controlled('search')
 def search_notes(current_user_id):
-    """Search notes by title and content."""
+    """Search notes by title and content, one page at a time with limit/offset."""
     try:
         query = request.args.get('q', '')
+        status = request.args.get('status')
 
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
 
-        conn = get_db_connection()
+        try:
+            limit, offset = parse_page_args(request.args)
+            tag_ids, tag_mode = parse_tag_filter_args(request.args)
+            archived = parse_archived_arg(request.args)
+            date_range = parse_date_range_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        conn = get_db_connection(current_user_id)
         cur = conn.cursor()
 
-        search_param = f'%{query}%'
+        # ILIKE ignores case, so the query's case does not change the result
+        cache_key = (query.lower(), status, tuple(tag_ids), tag_mode, archived, tuple(sorted(date_range.items())))
+        use_cache = search_cache.enabled()
+        note_ids = search_cache.get(current_user_id, cache_key) if use_cache else None
+        if note_ids is None:
+            generation = search_cache.generation(current_user_id)
+            sql, params = build_search_ids_query(current_user_id, query, status, tag_ids, tag_mode,
+                                                 archived, date_range)
+            cur.execute(sql, params)
+            note_ids = [row['note_id'] for row in cur.fetchall()]
+            if use_cache:
+                search_cache.put(current_user_id, generation, cache_key, note_ids)
+
+        page_ids = list(note_ids[offset:offset + limit] if limit is not None else note_ids[offset:])
         cur.execute(
             """
-            SELECT DISTINCT n.note_id, n.title, n.content, n.status, 
-                   n.created_date, n.last_modified, n.user_id
-            FROM notes n
-            WHERE n.user_id = %s AND (n.title ILIKE %s OR n.content ILIKE %s)
-            ORDER BY n.last_modified DESC
+            SELECT note_id, title, content, status, created_date, last_modified,
+                   user_id, version, content_length, content_offloaded
+            FROM notes
+            WHERE note_id = ANY(%s) AND user_id = %s
             """,
-            (current_user_id, search_param, search_param)
+            (page_ids, current_user_id)
         )
-        notes = cur.fetchall()
+        notes_by_id = {note['note_id']: note for note in cur.fetchall()}
+        notes = [notes_by_id[note_id] for note_id in page_ids if note_id in notes_by_id]
+
+        tags_by_note = fetch_tags_for_notes(cur, current_user_id, [note['note_id'] for note in notes])
+        notes_list = [format_note(note, tags_by_note[note['note_id']]) for note in notes]
+
+        response = {
+            'query': query,
+            'count': len(note_ids),
+            'offset': offset,
+            'notes': notes_list
+        }
+        if request.args.get('facets') == 'true':
+            where, params = build_notes_filter(current_user_id, status, tag_ids, query, tag_mode,
+                                               archived, date_range)
+            response['facets'] = fetch_note_facets(cur, current_user_id, where, params,
+                                                   spans_tiers(status, archived))
+
+        cur.close()
+        conn.close()
+
+        return jsonify(response), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+
+
+def escape_like(text):
+    """Escape LIKE wildcards so text only matches literally."""
+    return re.sub(r'([\\%_])', r'\\\1', text)
+
+
+def build_suggest_queries(user_id, prefix, limit):
+    """Build the title and tag name prefix queries behind /api/suggest; returns [(sql, params), ...].
+
+    Both are range scans on the text_pattern_ops indexes from migration 007,
+    read in the index's own (~<~) order so LIMIT stops after a few entries.
+    """
+    pattern = escape_like(prefix.lower()) + '%'
+    return [
+        (
+            """
+            SELECT note_id, title FROM notes
+            WHERE user_id = %s AND lower(title) LIKE %s
+            ORDER BY lower(title) USING ~<~
+            LIMIT %s
+            """,
+            (user_id, pattern, limit)
+        ),
+        (
+            """
+            SELECT tag_id, tag_name, color FROM tags
+            WHERE lower(tag_name) LIKE %s
+            ORDER BY lower(tag_name) USING ~<~
+            LIMIT %s
+            """,
+            (pattern, limit)
+        ),
+    ]
+
+
+@app.route('/api/suggest', methods=['GET'])
+@token_required
+@coalesced
+@admission_controlled('read')
+def suggest(current_user_id):
+    """Search-as-you-type suggestions: note titles and tag names starting with q."""
+    try:
+        prefix = request.args.get('q', '').strip()
+        limit = request.args.get('limit', SUGGEST_LIMIT, type=int)
+        if not 1 <= limit <= MAX_SUGGEST_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MAX_SUGGEST_LIMIT}'}), 400
+
+        if not prefix:
+            return jsonify({'query': prefix, 'titles': [], 'tags': []}), 200
+
+        conn = get_db_connection(current_user_id)
+        titles, tags = run_pipeline(conn, build_suggest_queries(current_user_id, prefix, limit))
+        conn.close()
+
+        return jsonify({
+            'query': prefix,
+            'titles': [{'note_id': t['note_id'], 'title': t['title']} for t in titles],
+            'tags': [{'tag_id': t['tag_id'], 'tag_name': t['tag_name'], 'color': t['color']} for t in tags]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
-        notes_list = []
-        for note in notes:
+# ==================== SYNC ENDPOINT ====================
+
+SYNC_XMIN_QUERY = "SELECT txid_snapshot_xmin(txid_current_snapshot()) AS xmin"
+
+
+def make_sync_token(xmin, shard):
+    """Encode a snapshot xmin, the issue time and the shard it came from as a sync token."""
+    return f"{xmin}-{int(time.time())}-{shard}"
+
+
+def current_sync_token(cur):
+    """Return a sync token for data read after this call.
+
+    The token holds the xmin of the current snapshot: every transaction
+    still in progress has a txid >= xmin, so rows they write are picked up
+    by the next sync (rows already seen may be sent again, which is harmless).
+    """
+    cur.execute(SYNC_XMIN_QUERY)
+    return make_sync_token(cur.fetchone()['xmin'], cur.connection.shard)
+
+
+def parse_sync_token(token, shard):
+    """Return the txid horizon of a sync token, or None if it needs a full sync."""
+    try:
+        parts = [int(part) for part in token.split('-')]
+    except (AttributeError, ValueError):
+        return None
+    if len(parts) == 2:
+        # Issued before sharding, by the catalog
+        parts.append(CATALOG_SHARD)
+    if len(parts) != 3:
+        return None
+    xmin, issued_at, token_shard = parts
+
+    # Transaction ids of another shard say nothing about this one; the
+    # user has been moved since the token was issued
+    if token_shard != shard:
+        return None
+
+    # Tombstones older than the retention period may already be pruned
+    if issued_at < time.time() - app.config['TOMBSTONE_RETENTION_DAYS'] * 86400:
+        return None
+    return xmin
+
+
+def format_tag(tag):
+    """Serialize a tag row for a JSON response."""
+    return {
+        'tag_id': tag['tag_id'],
+        'tag_name': tag['tag_name'],
+        'color': tag['color'],
+        'created_at': tag['created_at'].isoformat()
+    }
+
+
+@app.route('/api/sync', methods=['GET'])
+@token_required
+@coalesced
+@admission_controlled('read')
+def sync_notes(current_user_id):
+    """Return notes and tags changed or deleted since a sync token."""
+    try:
+        conn = get_db_connection(current_user_id)
+        cur = conn.cursor()
+
+        since = parse_sync_token(request.args.get('since'), conn.shard)
+        token = current_sync_token(cur)
+
+        if since is None:
+            query, params = build_notes_query(current_user_id)
+            cur.execute(query, params)
+            notes = cur.fetchall()
+            cur.execute("SELECT tag_id, tag_name, color, created_at FROM tags ORDER BY tag_name")
+            tags = cur.fetchall()
+            deleted = []
+        else:
             cur.execute(
                 """
-                SELECT t.tag_id, t.tag_name, t.color
-                FROM tags t
-                JOIN notetags nt ON t.tag_id = nt.tag_id
-                WHERE nt.note_id = %s
+                SELECT note_id, title, content, status, created_date, last_modified, user_id, version,
+                       content_length, content_offloaded
+                FROM notes
+                WHERE user_id = %s AND change_txid >= %s
+                ORDER BY last_modified DESC, note_id DESC
                 """,
-                (note['note_id'],)
+                (current_user_id, since)
+            )
+            notes = cur.fetchall()
+            cur.execute(
+                """
+                SELECT tag_id, tag_name, color, created_at
+                FROM tags WHERE change_txid >= %s
+                ORDER BY tag_name
+                """,
+                (since,)
             )
             tags = cur.fetchall()
+            # Read after the notes so a note deleted in between is reported as deleted
+            cur.execute(
+                """
+                SELECT entity, entity_id FROM tombstones
+                WHERE (user_id = %s OR user_id IS NULL) AND change_txid >= %s
+                """,
+                (current_user_id, since)
+            )
+            deleted = cur.fetchall()
 
-            notes_list.append({
-                'note_id': note['note_id'],
-                'title': note['title'],
-                'content': note['content'],
-                'status': note['status'],
-                'created_date': note['created_date'].isoformat(),
-                'last_modified': note['last_modified'].isoformat(),
-                'user_id': note['user_id'],
-                'tags': [{'tag_id': t['tag_id'], 'tag_name': t['tag_name'], 'color': t['color']} for t in tags]
-            })
+        tags_by_note = fetch_tags_for_notes(cur, current_user_id, [note['note_id'] for note in notes])
 
+        conn.commit()
         cur.close()
         conn.close()
 
         return jsonify({
-            'query': query,
-            'count': len(notes_list),
-            'notes': notes_list
+            'reset': since is None,
+            'token': token,
+            'notes': [format_note(note, tags_by_note[note['note_id']]) for note in notes],
+            'deleted_note_ids': sorted({d['entity_id'] for d in deleted if d['entity'] == 'note'}),
+            'tags': [format_tag(t) for t in tags],
+            'deleted_tag_ids': sorted({d['entity_id'] for d in deleted if d['entity'] == 'tag'})
         }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== BOOTSTRAP ENDPOINT ====================
+
+@app.route('/api/bootstrap', methods=['GET'])
+@token_required
+@coalesced
+@admission_controlled('read')
+def bootstrap(current_user_id):
+    """Everything the dashboard needs for its first render in one response.
+
+    The sync token, first page of notes (and their tags), tag catalog,
+    stats and tag facets are sent as one pipeline on a single connection,
+    so the whole response costs one network round trip to Postgres.
+    """
+    try:
+        page_size = app.config['BOOTSTRAP_PAGE_SIZE']
+        notes_query, notes_params = build_notes_query(current_user_id, limit=page_size + 1)
+        where, where_params = build_notes_filter(current_user_id)
+
+        statements = [
+            (SYNC_XMIN_QUERY, ()),
+            (notes_query, notes_params),
+            (
+                f"""
+                WITH page AS ({notes_query})
+                SELECT nt.note_id, t.tag_id, t.tag_name, t.color
+                FROM page
+                JOIN notetags nt ON nt.user_id = %s AND nt.note_id = page.note_id
+                JOIN tags t ON t.tag_id = nt.tag_id
+                """,
+                notes_params + [current_user_id]
+            ),
+            ("SELECT tag_id, tag_name, color, created_at FROM tags ORDER BY tag_name", ()),
+            build_facets_query(current_user_id, where, where_params, both_tiers=True),
+        ] + [(sql, (current_user_id,)) for sql in USER_STATS_QUERIES]
+
+        conn = get_db_connection(current_user_id)
+        (xmin_rows, notes, page_tags, tags, facet_rows,
+         stats_rows, note_stats_rows, tag_stats_rows) = run_pipeline(conn, statements)
+        conn.close()
+
+        tags_by_note = {note['note_id']: [] for note in notes}
+        for t in page_tags:
+            tags_by_note[t['note_id']].append({'tag_id': t['tag_id'], 'tag_name': t['tag_name'], 'color': t['color']})
+
+        stats = None
+        if stats_rows:
+            stats = format_user_stats(stats_rows[0], note_stats_rows[0], tag_stats_rows[0])
+
+        return jsonify({
+            'notes': [format_note(note, tags_by_note[note['note_id']]) for note in notes[:page_size]],
+            'has_more': len(notes) > page_size,
+            'tags': [format_tag(t) for t in tags],
+            'facets': format_facets(facet_rows),
+            'stats': stats,
+            'sync_token': make_sync_token(xmin_rows[0]['xmin'], conn.shard)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== CHANGE EVENTS ====================
+
+class ChangeHub:
+    """Fan out Postgres change notifications to Server-Sent Event subscribers.
+
+    One LISTEN connection per shard and worker process feeds every
+    subscriber. Events for the same user arriving within
+    EVENT_COALESCE_SECONDS are merged into a single event, and tag events
+    (user_id None) go to everyone.
+    """
+
+    CHANNEL = 'noteflow_changes'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.pending = {}
+        self.flush_timer = None
+        self.listeners = {}
+        self.connected = set()
+
+    @property
+    def listening(self):
+        """Whether notifications from every shard are being received."""
+        return len(self.connected) == shard_router.shard_count
+
+    def start_listener(self):
+        """Start a LISTEN thread per shard unless they are already running."""
+        with self.lock:
+            for shard in range(shard_router.shard_count):
+                listener = self.listeners.get(shard)
+                if listener is None or not listener.is_alive():
+                    listener = threading.Thread(target=self._listen, args=(shard,),
+                                                name=f'change-listener-{shard}', daemon=True)
+                    listener.start()
+                    self.listeners[shard] = listener
+
+    def subscribe(self, user_id):
+        """Register a subscriber and return the queue its events arrive on."""
+        q = queue.Queue(maxsize=16)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(q)
+        self.start_listener()
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self.lock:
+            queues = self.subscribers.get(user_id)
+            if queues:
+                queues.discard(q)
+                if not queues:
+                    del self.subscribers[user_id]
+
+    def publish(self, user_id, entity):
+        """Queue an event for a user (None for everyone), coalescing bursts."""
+        with self.lock:
+            self.pending.setdefault(user_id, set()).add(entity)
+            if self.flush_timer is None:
+                self.flush_timer = threading.Timer(app.config['EVENT_COALESCE_SECONDS'], self._flush)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+
+    def _flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flush_timer = None
+            broadcast = pending.pop(None, set())
+            targets = []
+            for user_id, queues in self.subscribers.items():
+                entities = pending.get(user_id, set()) | broadcast
+                if entities:
+                    targets.extend((q, entities) for q in queues)
+
+        for q, entities in targets:
+            try:
+                q.put_nowait(sorted(entities))
+            except queue.Full:
+                # The subscriber already has events waiting; it will resync anyway
+                pass
+
+    def _listen(self, shard):
+        reconnecting = False
+        while True:
+            try:
+                with shard_router.dedicated_connection(shard) as conn:
+                    conn.autocommit = True
+                    conn.execute(f"LISTEN {self.CHANNEL}")
+                    if reconnecting:
+                        # Notifications sent while disconnected are lost; tell everyone to resync
+                        self.publish(None, 'note')
+                        search_cache.clear()
+                    reconnecting = True
+                    self.connected.add(shard)
+                    for notify in conn.notifies():
+                        try:
+                            payload = json.loads(notify.payload)
+                            user_id, entity = payload.get('user_id'), payload.get('entity')
+                        except (ValueError, AttributeError):
+                            app.logger.warning(f'Ignoring malformed change notification on shard {shard}: '
+                                               f'{notify.payload!r}')
+                            continue
+                        self.publish(user_id, entity)
+                        if entity == 'note':
+                            # Writes by other worker processes
+                            search_cache.invalidate(user_id)
+            except Exception as e:
+                self.connected.discard(shard)
+                app.logger.warning(f'Change listener for shard {shard} disconnected: {e}')
+                time.sleep(1)
+
+
+change_hub = ChangeHub()
+
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of change notifications for the current user.
+
+    EventSource cannot send headers, so the JWT is passed as ?token=.
+    """
+    current_user_id, error = decode_auth_token(request.args.get('token', ''))
+    if error:
+        return jsonify({'error': error}), 401
+
+    events = change_hub.subscribe(current_user_id)
+    heartbeat = app.config['EVENT_HEARTBEAT_SECONDS']
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    entities = events.get(timeout=heartbeat)
+                    yield f"event: change\ndata: {json.dumps({'entities': entities})}\n\n"
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            change_hub.unsubscribe(current_user_id, events)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 # ==================== WEB INTERFACE ====================
 
 @app.route('/')
@@ -1341,18 +4201,33 @@ def index():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint; every shard has to answer."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        cur.close()
-        conn.close()
-        return jsonify({'status': 'healthy', 'database': 'connected'}), 200
+        for shard in range(shard_router.shard_count):
+            conn = shard_router.connect(shard)
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.close()
+        return jsonify({'status': 'healthy', 'database': 'connected', 'shards': shard_router.shard_count}), 200
     except Exception as e:
         return jsonify({'status': 'unhealthy', 'database': 'disconnected', 'error': str(e)}), 500
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Admission control, coalescing, background write, search cache, draft buffer and connection pool counters for this worker process."""
+    return jsonify({
+        'admission': admission_control.metrics(),
+        'coalescing': single_flight.metrics(),
+        'jobs': job_queue.metrics(),
+        'logins': login_recorder.metrics(),
+        'search_cache': search_cache.metrics(),
+        'drafts': {'pending': len(draft_buffer.drafts)},
+        'shards': shard_router.metrics()
+    }), 200
+
+
 # ==================== ERROR HANDLERS ====================
 
 @app.errorhandler(404)
@@ -1360,6 +4235,11 @@ def not_found(e):
     return jsonify({'error': 'Resource not found'}), 404
 
 
+@app.errorhandler(PoolTimeout)
+def database_unavailable(e):
+    return shard_unavailable()
+
+
 @app.errorhandler(500)
 def server_error(e):
     return jsonify({'error': 'Internal server error'}), 500
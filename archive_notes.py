@@ -0,0 +1,96 @@
+"""
+Archive notes nobody has touched for a while.
+
+Active notes not modified for --days days (AUTO_ARCHIVE_DAYS by default)
+are set to Archived, which moves them to the cold tier and out of the
+indexes everyday listings read (see migrations/010). Pinned notes are left
+alone. last_modified is kept, so listings keep their order; the version
+is bumped as for any status change, and clients pick the change up
+through sync and /api/events. Notes are archived in batches, each in its
+own short transaction, on every shard in turn.
+
+Usage:
+    python archive_notes.py                 # archive notes untouched for AUTO_ARCHIVE_DAYS
+    python archive_notes.py --days 365 --batch-size 500
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from app import app, shard_router
+
+# Archives one batch of stale notes with ids above `after`; takes cutoff, after and batch_size.
+# The last_modified check is repeated in the UPDATE itself, so a note edited
+# since the batch was picked stays active.
+ARCHIVE_BATCH_QUERY = """
+    UPDATE notes SET status = 'Archived', version = version + 1
+    WHERE (note_id, user_id) IN (
+        SELECT note_id, user_id FROM notes
+        WHERE status = 'Active' AND last_modified < %(cutoff)s AND note_id > %(after)s
+        ORDER BY note_id
+        LIMIT %(batch_size)s
+    )
+    AND status = 'Active' AND last_modified < %(cutoff)s
+    RETURNING note_id
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Archive NoteFlow notes that have not been modified for a while.')
+    parser.add_argument('--days', type=int, default=app.config['AUTO_ARCHIVE_DAYS'],
+                        help='archive active notes not modified for this many days')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='notes archived per transaction')
+    return parser.parse_args()
+
+
+def archive_shard(conn, cutoff, batch_size):
+    """Archive the stale notes stored on one shard; returns whether it succeeded."""
+    cur = conn.cursor()
+
+    try:
+        archived = 0
+        after = 0
+        while True:
+            cur.execute(ARCHIVE_BATCH_QUERY, {'cutoff': cutoff, 'after': after, 'batch_size': batch_size})
+            note_ids = [row['note_id'] for row in cur.fetchall()]
+            conn.commit()
+            if not note_ids:
+                break
+            archived += len(note_ids)
+            after = max(note_ids)
+
+        print(f"[SUCCESS] Archived {archived} notes")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERROR] Archiving failed: {e}")
+        return False
+
+    finally:
+        cur.close()
+
+
+def main():
+    args = parse_args()
+    if args.days < 1 or args.batch_size < 1:
+        print("[ERROR] --days and --batch-size must be positive")
+        return
+
+    cutoff = datetime.now() - timedelta(days=args.days)
+    print(f"[INFO] Archiving active notes not modified since {cutoff:%Y-%m-%d %H:%M}")
+
+    for shard in range(shard_router.shard_count):
+        if shard_router.shard_count > 1:
+            print(f"[INFO] Shard {shard}")
+        conn = shard_router.connect(shard)
+        try:
+            if not archive_shard(conn, cutoff, args.batch_size):
+                return
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
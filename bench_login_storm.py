@@ -0,0 +1,102 @@
+"""
+Login storm benchmark for write-behind last_login_date updates.
+
+Logs benchmark users in concurrently through Flask's test client, once with
+every login writing its own UPDATE (LOGIN_FLUSH_SECONDS=0) and once with
+the write-behind buffer, and reports the transactions committed per login
+from pg_stat_database.xact_commit. Logins borrow pooled connections and
+only read, so what is counted is the bookkeeping. Needs the users loaded
+by generate_data.py.
+
+Usage:
+    python bench_login_storm.py --logins 100 --threads 8
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, get_db_connection, job_queue, login_recorder
+
+
+def committed_transactions():
+    """Return xact_commit for the current database (the lookup itself commits too)."""
+    conn = get_db_connection()
+    conn.autocommit = True
+    conn.execute("SELECT pg_stat_clear_snapshot()")
+    row = conn.execute(
+        "SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()"
+    ).fetchone()
+    conn.close()
+    return row['xact_commit']
+
+
+def benchmark_users(count):
+    """Emails of up to count users created by generate_data.py."""
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT email FROM users WHERE email ~ '^bench[0-9]+@example[.]com$' ORDER BY user_id LIMIT %s",
+        (count,)
+    ).fetchall()
+    conn.close()
+    return [row['email'] for row in rows]
+
+
+def storm(label, emails, password, logins, threads, flush_seconds):
+    """Run one login storm and print its commit count."""
+    app.config['LOGIN_FLUSH_SECONDS'] = flush_seconds
+
+    def login(i):
+        client = app.test_client()
+        r = client.post('/api/auth/login', json={'email': emails[i % len(emails)], 'password': password})
+        return r.status_code
+
+    # Backends report their counters when they exit; let earlier ones settle
+    time.sleep(1)
+    before = committed_transactions()
+    overhead = committed_transactions() - before
+    before += overhead
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(login, range(logins)))
+    elapsed = time.monotonic() - started
+
+    login_recorder.flush()
+    job_queue.drain(30)
+    time.sleep(1)
+    commits = committed_transactions() - before - overhead
+
+    failed = sum(1 for status in statuses if status != 200)
+    print(f"  {label:<28} {elapsed:6.1f} s  {commits:5d} commits  "
+          f"({commits / logins:.2f} per login, {failed} failed)")
+    return commits
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare commits per login with and without write-behind.')
+    parser.add_argument('--logins', type=int, default=100, help='logins per storm')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--users', type=int, default=100, help='distinct benchmark users to log in')
+    parser.add_argument('--password', default='benchmark123', help='password of the benchmark users')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    emails = benchmark_users(args.users)
+    if not emails:
+        print("[ERROR] No benchmark users found; run generate_data.py first")
+        return
+
+    print(f"[INFO] {args.logins} logins by {len(emails)} users on {args.threads} threads")
+    batched_flush = app.config['LOGIN_FLUSH_SECONDS'] or 5
+    immediate = storm('one UPDATE per login', emails, args.password, args.logins, args.threads, 0)
+    batched = storm(f'write-behind ({batched_flush:g} s)', emails, args.password,
+                    args.logins, args.threads, batched_flush)
+    print(f"[SUCCESS] write-behind saved {immediate - batched} commits "
+          f"({(immediate - batched) / args.logins:.2f} per login)")
+
+
+if __name__ == '__main__':
+    main()
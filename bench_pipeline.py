@@ -0,0 +1,186 @@
+"""
+Round-trip benchmark for pipelined handlers.
+
+Starts a local TCP proxy in front of Postgres that delays every packet by
+--delay milliseconds in each direction, points the app at it and times the
+multi-statement handlers through Flask's test client. The same stats
+queries are also timed sequentially and through run_pipeline, which shows
+the saving per avoided round trip directly.
+
+Usage:
+    python bench_pipeline.py --delay 5 --requests 20
+"""
+
+import argparse
+import heapq
+import itertools
+import socket
+import threading
+import time
+import uuid
+
+import app as noteflow
+from app import app, get_db_connection, run_pipeline, USER_STATS_QUERIES
+
+
+class DelayProxy:
+    """TCP proxy that adds a fixed one-way latency to each direction."""
+
+    def __init__(self, target_host, target_port, delay):
+        self.target = (target_host, target_port)
+        self.delay = delay
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(64)
+        self.port = self.server.getsockname()[1]
+
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.server.accept()
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, upstream)
+            self._pipe(upstream, client)
+
+    def _pipe(self, src, dst):
+        """Forward src to dst, releasing each chunk `delay` seconds after it arrived."""
+        pending = []
+        ready = threading.Condition()
+        order = itertools.count()
+
+        def reader():
+            while True:
+                try:
+                    data = src.recv(65536)
+                except OSError:
+                    data = b''
+                with ready:
+                    heapq.heappush(pending, (time.monotonic() + self.delay, next(order), data))
+                    ready.notify()
+                if not data:
+                    return
+
+        def writer():
+            while True:
+                with ready:
+                    while not pending or pending[0][0] > time.monotonic():
+                        ready.wait(pending[0][0] - time.monotonic() if pending else None)
+                    _, _, data = heapq.heappop(pending)
+                try:
+                    if not data:
+                        dst.shutdown(socket.SHUT_WR)
+                        return
+                    dst.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=reader, daemon=True).start()
+        threading.Thread(target=writer, daemon=True).start()
+
+
+def timed(label, count, fn):
+    """Run fn count times and print the mean latency."""
+    fn()  # warm up
+    started = time.monotonic()
+    for _ in range(count):
+        fn()
+    elapsed = (time.monotonic() - started) / count * 1000
+    print(f"  {label:<40} {elapsed:8.1f} ms")
+    return elapsed
+
+
+def bench_stats_queries(user_id, count):
+    """Compare the dashboard stats queries sent one by one and pipelined."""
+    conn = get_db_connection()
+    conn.autocommit = True
+
+    def sequential():
+        cur = conn.cursor()
+        for sql in USER_STATS_QUERIES:
+            cur.execute(sql, (user_id,))
+            cur.fetchall()
+        cur.close()
+
+    def pipelined():
+        run_pipeline(conn, [(sql, (user_id,)) for sql in USER_STATS_QUERIES])
+
+    print("\nStats queries on one connection:")
+    seq = timed("sequential (3 round trips)", count, sequential)
+    pipe = timed("run_pipeline (1 round trip)", count, pipelined)
+    print(f"  saved {seq - pipe:.1f} ms per call")
+    conn.close()
+
+
+def bench_handlers(count):
+    """Time the pipelined HTTP handlers end to end; returns the benchmark user's id."""
+    client = app.test_client()
+    email = f'bench-pipeline-{uuid.uuid4().hex[:8]}@example.com'
+    password = 'benchmark123'
+
+    r = client.post('/api/auth/register', json={'name': 'Pipeline Bench', 'email': email, 'password': password})
+    user_id = r.get_json()['user']['user_id']
+    headers = {'Authorization': f"Bearer {r.get_json()['token']}"}
+    note_id = client.post('/api/notes', json={'title': 'Pipeline bench'}, headers=headers).get_json()['note']['note_id']
+    tag_id = client.get('/api/tags', headers=headers).get_json()['tags'][0]['tag_id']
+
+    def register():
+        client.post('/api/auth/register', json={
+            'name': 'Pipeline Bench', 'email': f'bench-pipeline-{uuid.uuid4().hex}@example.com',
+            'password': password
+        })
+
+    def toggle_tag():
+        client.post(f'/api/notes/{note_id}/tags/{tag_id}', headers=headers)
+        client.delete(f'/api/notes/{note_id}/tags/{tag_id}', headers=headers)
+
+    print("\nHandlers (pooled connections):")
+    timed("POST /api/auth/register", count, register)
+    timed("POST /api/auth/login", count,
+          lambda: client.post('/api/auth/login', json={'email': email, 'password': password}))
+    timed(f"GET /api/users/{user_id}/stats", count,
+          lambda: client.get(f'/api/users/{user_id}/stats', headers=headers))
+    timed("POST + DELETE /api/notes/:id/tags/:tagId", count, toggle_tag)
+    timed("GET /api/bootstrap", count, lambda: client.get('/api/bootstrap', headers=headers))
+    return user_id
+
+
+def cleanup():
+    """Remove the benchmark users; their notes and stats cascade."""
+    conn = get_db_connection()
+    conn.execute("DELETE FROM users WHERE email LIKE 'bench-pipeline-%@example.com'")
+    conn.commit()
+    conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark pipelined handlers over a slow network.')
+    parser.add_argument('--delay', type=float, default=5.0, help='one-way latency to add, in milliseconds')
+    parser.add_argument('--requests', type=int, default=20, help='timed calls per scenario')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    proxy = DelayProxy(noteflow.DB_CONFIG['host'], int(noteflow.DB_CONFIG['port']), args.delay / 1000)
+    proxy.start()
+    noteflow.DB_CONFIG['host'] = '127.0.0.1'
+    noteflow.DB_CONFIG['port'] = str(proxy.port)
+
+    print(f"[INFO] Proxying Postgres through 127.0.0.1:{proxy.port} "
+          f"with {args.delay:.1f} ms each way ({args.delay * 2:.1f} ms per round trip)")
+
+    try:
+        user_id = bench_handlers(args.requests)
+        bench_stats_queries(user_id, args.requests)
+    finally:
+        cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Compact note revision history.
+
+Revisions past REVISION_RETENTION_DAYS are deleted, and for every note with
+revisions older than --older-than-days only the last revision of each day
+is kept. Each note is compacted in its own transaction while holding its
+row lock, so the app can keep writing to other notes. Every shard is
+compacted in turn.
+
+Usage:
+    python compact_revisions.py                      # thin out history older than 7 days
+    python compact_revisions.py --older-than-days 1
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from app import app, compact_note_revisions, shard_router
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compact NoteFlow note revision history.')
+    parser.add_argument('--older-than-days', type=int, default=7,
+                        help='keep one revision per day for revisions older than this')
+    return parser.parse_args()
+
+
+def compact_shard(conn, before):
+    """Expire and thin out the revisions stored on one shard; returns whether it succeeded."""
+    cur = conn.cursor()
+
+    try:
+        cur.execute(
+            "DELETE FROM note_revisions WHERE created_at < NOW() - make_interval(days => %s)",
+            (app.config['REVISION_RETENTION_DAYS'],)
+        )
+        expired = cur.rowcount
+        conn.commit()
+        print(f"[INFO] Deleted {expired} revisions older than {app.config['REVISION_RETENTION_DAYS']} days")
+
+        # Only notes with more than one revision on some day before the cutoff
+        cur.execute(
+            """
+            SELECT DISTINCT r.note_id, n.user_id
+            FROM note_revisions r JOIN notes n ON n.note_id = r.note_id
+            WHERE r.created_at < %s
+            GROUP BY r.note_id, n.user_id, r.created_at::date
+            HAVING COUNT(*) > 1
+            """,
+            (before,)
+        )
+        notes = cur.fetchall()
+        print(f"[INFO] Compacting {len(notes)} notes")
+
+        removed = 0
+        for note in notes:
+            removed += compact_note_revisions(cur, note['note_id'], note['user_id'], before)
+            conn.commit()
+
+        print(f"[SUCCESS] Removed {removed} revisions")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERROR] Compaction failed: {e}")
+        return False
+
+    finally:
+        cur.close()
+
+
+def main():
+    args = parse_args()
+    before = datetime.now() - timedelta(days=args.older_than_days)
+
+    for shard in range(shard_router.shard_count):
+        if shard_router.shard_count > 1:
+            print(f"[INFO] Shard {shard}")
+        conn = shard_router.connect(shard)
+        try:
+            if not compact_shard(conn, before):
+                return
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""
+Deterministic benchmark dataset generator for NoteFlow.
+
+Creates users, notes and tag assignments with skewed (Zipfian / Pareto)
+distributions and bulk loads them with COPY, so EXPLAIN output and
+benchmarks run against realistic table sizes.
+
+Usage:
+    python generate_data.py --users 10000 --notes 1000000 --seed 42
+    python generate_data.py --reset --users 500 --notes 50000
+
+Every generated user shares the same password (--password), so any
+account can be logged into for manual testing.
+"""
+
+import argparse
+import bisect
+import random
+import time
+from datetime import datetime, timedelta
+
+import bcrypt
+
+from app import get_db_connection
+
+WORDS = (
+    "meeting project deadline review draft idea budget plan sprint design "
+    "research summary client report release feature bug fix deploy server "
+    "database index query cache latency schema migration backup monitor "
+    "alert customer feedback roadmap priority task follow up notes agenda "
+    "weekly daily standup retro goal metric target launch test coverage "
+    "refactor module api endpoint token session user account invoice travel "
+    "recipe grocery book article reading list workout health family weekend"
+).split()
+
+STATUSES = ['Active', 'Pinned', 'Archived']
+STATUS_WEIGHTS = [80, 5, 15]
+
+DATASET_START = datetime(2023, 1, 1)
+
+
+def zipf_cum_weights(n, s):
+    """Cumulative Zipf weights for ranks 1..n with exponent s."""
+    total = 0.0
+    cum = []
+    for rank in range(1, n + 1):
+        total += 1.0 / (rank ** s)
+        cum.append(total)
+    return cum
+
+
+def pick(rng, cum_weights):
+    """Pick an index from cumulative weights."""
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def make_content(rng, length):
+    """Build roughly `length` characters of filler text."""
+    words = rng.choices(WORDS, k=max(1, length // 7))
+    return ' '.join(words)[:length]
+
+
+def get_id_offsets(cur):
+    """Return the current max ids so generated rows append to existing data."""
+    cur.execute(
+        """
+        SELECT (SELECT COALESCE(MAX(user_id), 0) FROM users) AS max_user_id,
+               (SELECT COALESCE(MAX(note_id), 0) FROM notes) AS max_note_id
+        """
+    )
+    row = cur.fetchone()
+    return row['max_user_id'], row['max_note_id']
+
+
+def ensure_tags(cur, count):
+    """Create `count` benchmark tags and return all tag ids, most popular first."""
+    cur.execute(
+        """
+        INSERT INTO tags (tag_name, color)
+        SELECT 'bench-' || LPAD(i::text, 4, '0'),
+               '#' || LPAD(TO_HEX(MOD(i * 2654435761, 16777216)), 6, '0')
+        FROM generate_series(1, %s) AS i
+        ON CONFLICT (tag_name) DO NOTHING
+        """,
+        (count,)
+    )
+    cur.execute("SELECT tag_id FROM tags ORDER BY tag_id")
+    return [row['tag_id'] for row in cur.fetchall()]
+
+
+def reset_tables(cur):
+    """Remove all users, notes and assignments (tags are kept)."""
+    cur.execute("TRUNCATE notetags, notes, userstats, users RESTART IDENTITY CASCADE")
+
+
+def copy_users(cur, rng, first_id, count, password_hash):
+    """COPY users and their empty userstats rows."""
+    with cur.copy("COPY users (user_id, name, email, password, created_at) FROM STDIN") as copy:
+        for user_id in range(first_id, first_id + count):
+            created_at = DATASET_START - timedelta(days=rng.randint(1, 365))
+            copy.write_row((user_id, f'Bench User {user_id}', f'bench{user_id}@example.com',
+                            password_hash, created_at))
+
+    with cur.copy("COPY userstats (user_id, total_notes, total_active_tags) FROM STDIN") as copy:
+        for user_id in range(first_id, first_id + count):
+            copy.write_row((user_id, 0, 0))
+
+
+def copy_notes(cur, rng, args, first_user_id, first_note_id, tag_ids):
+    """COPY notes and their tag assignments; returns (notes, notetags) row counts."""
+    user_cum = zipf_cum_weights(args.users, args.zipf)
+    tag_cum = zipf_cum_weights(len(tag_ids), args.zipf)
+    tags_per_note_cum = zipf_cum_weights(args.max_tags_per_note + 1, args.zipf)
+
+    # Users are ranked by a seeded shuffle so the heavy accounts are not
+    # simply the lowest user ids.
+    user_ranks = list(range(first_user_id, first_user_id + args.users))
+    rng.shuffle(user_ranks)
+
+    # created_date grows with note_id, like a real insert-ordered table.
+    span_seconds = args.days * 86400
+    step = span_seconds / max(1, args.notes)
+
+    # Notes go in batches, each followed by its tag assignments, so only one
+    # batch of assignments is held in memory at a time.
+    assignment_count = 0
+    for batch_start in range(0, args.notes, args.batch_size):
+        assignments = []
+        with cur.copy(
+            "COPY notes (note_id, title, content, status, created_date, last_modified, user_id) FROM STDIN"
+        ) as copy:
+            for i in range(batch_start, min(args.notes, batch_start + args.batch_size)):
+                note_id = first_note_id + i
+                user_id = user_ranks[pick(rng, user_cum)]
+                created = DATASET_START + timedelta(seconds=i * step + rng.random() * step)
+                modified = created + timedelta(seconds=min(span_seconds, rng.expovariate(1 / 86400.0)))
+                length = min(args.max_content, int(args.min_content * rng.paretovariate(args.pareto)))
+                title = make_content(rng, rng.randint(12, 60)).capitalize()
+                status = rng.choices(STATUSES, weights=STATUS_WEIGHTS)[0]
+                copy.write_row((note_id, title, make_content(rng, length), status,
+                                created, modified, user_id))
+
+                wanted = min(pick(rng, tags_per_note_cum), len(tag_ids))
+                chosen = set()
+                while len(chosen) < wanted:
+                    chosen.add(tag_ids[pick(rng, tag_cum)])
+                for tag_id in chosen:
+                    assignments.append((note_id, user_id, tag_id, created))
+
+        with cur.copy("COPY notetags (note_id, user_id, tag_id, assigned_date) FROM STDIN") as copy:
+            for row in assignments:
+                copy.write_row(row)
+        assignment_count += len(assignments)
+
+    return args.notes, assignment_count
+
+
+def finalize(cur):
+    """Resync sequences and recompute userstats in one set-based pass."""
+    cur.execute("SELECT setval('users_user_id_seq', (SELECT COALESCE(MAX(user_id), 0) + 1 FROM users), false)")
+    cur.execute("SELECT setval('notes_note_id_seq', (SELECT COALESCE(MAX(note_id), 0) + 1 FROM notes), false)")
+    cur.execute(
+        """
+        UPDATE userstats s
+        SET total_notes = c.total_notes, total_active_tags = c.total_active_tags
+        FROM (
+            SELECT n.user_id,
+                   COUNT(DISTINCT n.note_id) AS total_notes,
+                   COUNT(DISTINCT nt.tag_id) AS total_active_tags
+            FROM notes n
+            LEFT JOIN notetags nt ON nt.user_id = n.user_id AND nt.note_id = n.note_id
+            GROUP BY n.user_id
+        ) c
+        WHERE s.user_id = c.user_id
+        """
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate a deterministic NoteFlow benchmark dataset.')
+    parser.add_argument('--users', type=int, default=1000, help='number of users to create')
+    parser.add_argument('--notes', type=int, default=100000, help='total number of notes to create')
+    parser.add_argument('--tags', type=int, default=200, help='number of benchmark tags to add to the catalog')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    parser.add_argument('--zipf', type=float, default=1.1,
+                        help='Zipf exponent for notes per user, tag popularity and tags per note')
+    parser.add_argument('--pareto', type=float, default=1.5, help='Pareto shape for content length')
+    parser.add_argument('--min-content', type=int, default=80, help='minimum content length in characters')
+    parser.add_argument('--max-content', type=int, default=50000, help='maximum content length in characters')
+    parser.add_argument('--max-tags-per-note', type=int, default=8, help='maximum tags assigned to a note')
+    parser.add_argument('--days', type=int, default=730, help='time span covered by created_date')
+    parser.add_argument('--password', default='benchmark123', help='password shared by all generated users')
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help='notes generated and loaded per batch, with their tag assignments')
+    parser.add_argument('--reset', action='store_true', help='truncate users, notes and notetags first')
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+    return args
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    password_hash = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    started = time.monotonic()
+
+    try:
+        if args.reset:
+            reset_tables(cur)
+
+        max_user_id, max_note_id = get_id_offsets(cur)
+        tag_ids = ensure_tags(cur, args.tags)
+
+        print(f"[INFO] Loading {args.users} users...")
+        copy_users(cur, rng, max_user_id + 1, args.users, password_hash)
+
+        print(f"[INFO] Loading {args.notes} notes...")
+        notes, notetags = copy_notes(cur, rng, args, max_user_id + 1, max_note_id + 1, tag_ids)
+
+        print("[INFO] Updating sequences and user statistics...")
+        finalize(cur)
+        conn.commit()
+
+        conn.autocommit = True
+        cur.execute("ANALYZE users, userstats, notes, notetags, tags")
+
+        elapsed = time.monotonic() - started
+        rows = args.users * 2 + notes + notetags
+        print(f"[SUCCESS] Loaded {args.users} users, {notes} notes, {notetags} note-tag rows "
+              f"in {elapsed:.1f}s ({rows / elapsed * 60:,.0f} rows/min)")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERROR] Data generation failed: {e}")
+
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Apply versioned schema migrations.
+
+Each file in migrations/ named <version>_<description>.sql is applied once,
+in version order, inside its own transaction, and recorded in the
+schema_migrations table. With DB_SHARDS set, every shard is migrated.
+
+Usage:
+    python migrate.py          # apply pending migrations
+    python migrate.py --list   # show applied and pending migrations
+"""
+
+import argparse
+import os
+
+from app import shard_router
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def list_migrations():
+    """Return (version, filename) pairs for all migration files, oldest first."""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if filename.endswith('.sql'):
+            migrations.append((filename.split('_', 1)[0], filename))
+    return migrations
+
+
+def applied_versions(cur):
+    """Return the set of versions already recorded in schema_migrations."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(20) PRIMARY KEY,
+            filename VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cur.fetchall()}
+
+
+def migrate(conn):
+    """Apply all pending migrations; returns the filenames applied."""
+    cur = conn.cursor()
+    applied = applied_versions(cur)
+    conn.commit()
+
+    done = []
+    for version, filename in list_migrations():
+        if version in applied:
+            continue
+
+        with open(os.path.join(MIGRATIONS_DIR, filename), 'r', encoding='utf-8') as f:
+            sql = f.read()
+
+        try:
+            cur.execute(sql)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, filename) VALUES (%s, %s)",
+                (version, filename)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        done.append(filename)
+
+    cur.close()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply NoteFlow schema migrations.')
+    parser.add_argument('--list', action='store_true', help='show migration status and exit')
+    args = parser.parse_args()
+
+    for shard in range(shard_router.shard_count):
+        label = f" on shard {shard}" if shard_router.shard_count > 1 else ""
+        conn = shard_router.connect(shard)
+
+        try:
+            if args.list:
+                cur = conn.cursor()
+                applied = applied_versions(cur)
+                conn.commit()
+                for version, filename in list_migrations():
+                    state = 'applied' if version in applied else 'pending'
+                    print(f"[{state.upper()}] {filename}{label}")
+                continue
+
+            done = migrate(conn)
+            for filename in done:
+                print(f"[SUCCESS] Applied {filename}{label}")
+            if not done:
+                print(f"[INFO] Database is up to date{label}")
+
+        except Exception as e:
+            print(f"[ERROR] Migration failed{label}: {e}")
+            return
+
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+-- Composite and partial indexes matching the note listing query shapes.
+--
+-- get_notes always filters by user_id and orders by last_modified,
+-- created_date or title (with note_id as tie-breaker), optionally filtered
+-- by status. Leading with user_id and ending with the sort key lets
+-- Postgres read one user's page straight off the index, in order, with no
+-- BitmapAnd or explicit Sort. ASC listings scan the same indexes backwards.
+
+CREATE INDEX idx_notes_user_modified ON notes (user_id, last_modified DESC, note_id DESC);
+CREATE INDEX idx_notes_user_created ON notes (user_id, created_date DESC, note_id DESC);
+CREATE INDEX idx_notes_user_title ON notes (user_id, title, note_id);
+CREATE INDEX idx_notes_user_status_modified ON notes (user_id, status, last_modified DESC, note_id DESC);
+
+-- Pinned notes are few but requested on every dashboard load
+CREATE INDEX idx_notes_user_pinned ON notes (user_id, last_modified DESC, note_id DESC)
+    WHERE status = 'Pinned';
+
+-- Covering index for tag filters: find a tag's notes without touching the heap.
+-- (note_id, tag_id) is already covered by the UNIQUE constraint.
+CREATE INDEX idx_notetags_tag_note ON notetags (tag_id, note_id);
+
+-- Superseded by the indexes above (leading-column prefixes or low selectivity)
+DROP INDEX IF EXISTS idx_notes_user_id;
+DROP INDEX IF EXISTS idx_notes_status;
+DROP INDEX IF EXISTS idx_notes_last_modified;
+DROP INDEX IF EXISTS idx_notetags_note_id;
+DROP INDEX IF EXISTS idx_notetags_tag_id;
@@ -0,0 +1,81 @@
+-- Change tracking for delta sync (/api/sync).
+--
+-- Every note and tag row records the id of the transaction that last wrote
+-- it in change_txid. A sync token is the xmin of the snapshot taken before
+-- reading, so any transaction that was still running at that point has a
+-- txid >= token and is picked up by the next sync. Deletions are recorded
+-- in a tombstone log that is pruned after a retention period.
+
+-- Existing rows get 0 (no table rewrite) and are only sent on a full sync
+ALTER TABLE notes ADD COLUMN change_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE notes ALTER COLUMN change_txid SET DEFAULT txid_current();
+ALTER TABLE tags ADD COLUMN change_txid BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE tags ALTER COLUMN change_txid SET DEFAULT txid_current();
+
+CREATE INDEX idx_notes_user_change ON notes (user_id, change_txid);
+
+CREATE TABLE tombstones (
+    tombstone_id BIGSERIAL PRIMARY KEY,
+    entity VARCHAR(10) NOT NULL CHECK (entity IN ('note', 'tag')),
+    entity_id INTEGER NOT NULL,
+    user_id INTEGER,  -- NULL for global entities (tags)
+    change_txid BIGINT NOT NULL DEFAULT txid_current(),
+    deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_tombstones_user_change ON tombstones (user_id, change_txid);
+CREATE INDEX idx_tombstones_deleted_at ON tombstones (deleted_at);
+
+-- Stamp updated notes and tags with the writing transaction
+CREATE OR REPLACE FUNCTION touch_change_txid() RETURNS trigger AS $$
+BEGIN
+    NEW.change_txid := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notes_touch_change BEFORE UPDATE ON notes
+    FOR EACH ROW EXECUTE FUNCTION touch_change_txid();
+CREATE TRIGGER tags_touch_change BEFORE UPDATE ON tags
+    FOR EACH ROW EXECUTE FUNCTION touch_change_txid();
+
+-- Adding or removing a tag changes the note as seen by clients
+CREATE OR REPLACE FUNCTION touch_notes_from_notetags() RETURNS trigger AS $$
+BEGIN
+    UPDATE notes SET change_txid = txid_current()
+    WHERE note_id IN (SELECT note_id FROM changed_notetags)
+      AND change_txid <> txid_current();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notetags_touch_insert AFTER INSERT ON notetags
+    REFERENCING NEW TABLE AS changed_notetags
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_notes_from_notetags();
+CREATE TRIGGER notetags_touch_delete AFTER DELETE ON notetags
+    REFERENCING OLD TABLE AS changed_notetags
+    FOR EACH STATEMENT EXECUTE FUNCTION touch_notes_from_notetags();
+
+-- Tombstones for deleted notes and tags
+CREATE OR REPLACE FUNCTION record_note_tombstones() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO tombstones (entity, entity_id, user_id)
+    SELECT 'note', note_id, user_id FROM deleted_notes;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_tag_tombstones() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO tombstones (entity, entity_id, user_id)
+    SELECT 'tag', tag_id, NULL FROM deleted_tags;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notes_tombstone AFTER DELETE ON notes
+    REFERENCING OLD TABLE AS deleted_notes
+    FOR EACH STATEMENT EXECUTE FUNCTION record_note_tombstones();
+CREATE TRIGGER tags_tombstone AFTER DELETE ON tags
+    REFERENCING OLD TABLE AS deleted_tags
+    FOR EACH STATEMENT EXECUTE FUNCTION record_tag_tombstones();
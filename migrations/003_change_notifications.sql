@@ -0,0 +1,28 @@
+-- Publish note and tag writes on the noteflow_changes channel for /api/events.
+--
+-- notetags changes already touch their note (see 002), so triggers on notes
+-- and tags cover every write. Postgres drops duplicate payloads within a
+-- transaction, so a bulk write sends one notification per user.
+
+CREATE OR REPLACE FUNCTION notify_note_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('noteflow_changes', json_build_object(
+        'entity', 'note',
+        'user_id', CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_tag_change() RETURNS trigger AS $$
+BEGIN
+    -- Tags are global, so every connected user is told
+    PERFORM pg_notify('noteflow_changes', json_build_object('entity', 'tag', 'user_id', NULL)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER notes_notify AFTER INSERT OR UPDATE OR DELETE ON notes
+    FOR EACH ROW EXECUTE FUNCTION notify_note_change();
+CREATE TRIGGER tags_notify AFTER INSERT OR UPDATE OR DELETE ON tags
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_tag_change();
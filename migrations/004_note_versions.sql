@@ -0,0 +1,17 @@
+-- Optimistic concurrency for note writes.
+--
+-- version is bumped by every note write. Clients send the version they
+-- edited (If-Match) and get 409 Conflict if someone else saved first.
+
+ALTER TABLE notes ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+
+-- Tag changes made outside a note update (POST/DELETE /api/notes/:id/tags)
+-- are edits too, so they bump the version along with change_txid.
+CREATE OR REPLACE FUNCTION touch_notes_from_notetags() RETURNS trigger AS $$
+BEGIN
+    UPDATE notes SET change_txid = txid_current(), version = version + 1
+    WHERE note_id IN (SELECT note_id FROM changed_notetags)
+      AND change_txid <> txid_current();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
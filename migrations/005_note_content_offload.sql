@@ -0,0 +1,30 @@
+-- Large note bodies live outside the notes table.
+--
+-- A body longer than CONTENT_OFFLOAD_THRESHOLD (default 16384 characters)
+-- is split into CONTENT_CHUNK_CHARS (32768) character chunks in
+-- note_content_chunks, and notes.content keeps only the first
+-- CONTENT_PREVIEW_CHARS (2000) characters. Listings, sync and bootstrap
+-- therefore never carry more than the threshold per note, and ranged reads
+-- only fetch the chunks they need. Chunks are well above the TOAST
+-- threshold, so Postgres stores them compressed out of line.
+
+-- Full body length, only set for offloaded notes (inline bodies use length(content))
+ALTER TABLE notes ADD COLUMN content_length INTEGER;
+ALTER TABLE notes ADD COLUMN content_offloaded BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE TABLE note_content_chunks (
+    note_id INTEGER NOT NULL REFERENCES notes(note_id) ON DELETE CASCADE,
+    chunk_no INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (note_id, chunk_no)
+);
+
+-- Offload existing large bodies with the default settings
+INSERT INTO note_content_chunks (note_id, chunk_no, data)
+SELECT n.note_id, c.chunk_no, substr(n.content, c.chunk_no * 32768 + 1, 32768)
+FROM notes n, generate_series(0, (length(n.content) - 1) / 32768) AS c(chunk_no)
+WHERE length(n.content) > 16384;
+
+UPDATE notes
+SET content_length = length(content), content_offloaded = TRUE, content = left(content, 2000)
+WHERE length(content) > 16384;
@@ -0,0 +1,24 @@
+-- Note revision history with reverse deltas.
+--
+-- Every write that changes a note's title or body stores the state it
+-- replaced, keyed by the version that state had. Most rows hold a reverse
+-- delta: [[offset, delete, insert], ...] edits that turn the next newer
+-- state (the next revision, or the note itself) back into this one. Every
+-- REVISION_SNAPSHOT_INTERVAL-th row holds the full body instead, so
+-- rebuilding any revision applies at most that many deltas. Old rows are
+-- pruned from the oldest end, which never breaks a newer row's chain.
+
+CREATE TABLE note_revisions (
+    note_id INTEGER NOT NULL REFERENCES notes(note_id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    content_length INTEGER NOT NULL,
+    is_snapshot BOOLEAN NOT NULL,
+    content TEXT,  -- full body, snapshots only
+    delta JSONB,   -- reverse delta, other rows
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (note_id, version),
+    CHECK (CASE WHEN is_snapshot THEN content IS NOT NULL ELSE delta IS NOT NULL END)
+);
+
+CREATE INDEX idx_note_revisions_created ON note_revisions (created_at);
@@ -0,0 +1,9 @@
+-- Prefix indexes for /api/suggest.
+--
+-- Suggestions match lower(title) / lower(tag_name) LIKE 'prefix%'.
+-- text_pattern_ops compares byte-wise, so such a prefix becomes an index
+-- range scan whatever the database collation, and the ~<~ order it keeps
+-- lets the first LIMIT matches be read straight off the index.
+
+CREATE INDEX idx_notes_user_title_prefix ON notes (user_id, lower(title) text_pattern_ops);
+CREATE INDEX idx_tags_name_prefix ON tags (lower(tag_name) text_pattern_ops);
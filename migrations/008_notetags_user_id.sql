@@ -0,0 +1,37 @@
+-- Owner column on notetags, the partition key for hash partitioning.
+--
+-- notes and notetags can be hash partitioned by user_id (partition_notes.py),
+-- which needs user_id on every notetags row and in every unique key. The
+-- app filters both tables by user_id in every query, so with partitions
+-- only the owner's partition is touched. (note_id, user_id) is unique on
+-- notes anyway; making it a key lets notetags reference its note by both.
+
+ALTER TABLE notetags ADD COLUMN user_id INTEGER;
+
+UPDATE notetags nt SET user_id = n.user_id
+FROM notes n WHERE n.note_id = nt.note_id;
+
+ALTER TABLE notetags ALTER COLUMN user_id SET NOT NULL;
+
+ALTER TABLE notes ADD CONSTRAINT notes_note_id_user_id_key UNIQUE (note_id, user_id);
+
+ALTER TABLE notetags DROP CONSTRAINT notetags_note_id_fkey;
+ALTER TABLE notetags ADD CONSTRAINT notetags_note_fkey
+    FOREIGN KEY (note_id, user_id) REFERENCES notes (note_id, user_id) ON DELETE CASCADE;
+
+ALTER TABLE notetags DROP CONSTRAINT notetags_note_id_tag_id_key;
+ALTER TABLE notetags ADD CONSTRAINT notetags_note_user_tag_key UNIQUE (note_id, user_id, tag_id);
+
+-- A user's tag usage (stats) and tag filters without touching notes
+CREATE INDEX idx_notetags_user_tag_note ON notetags (user_id, tag_id, note_id);
+
+-- Touch the tagged notes through the partition key as well; tag changes
+-- still bump the version (see 004)
+CREATE OR REPLACE FUNCTION touch_notes_from_notetags() RETURNS trigger AS $$
+BEGIN
+    UPDATE notes SET change_txid = txid_current(), version = version + 1
+    WHERE (user_id, note_id) IN (SELECT user_id, note_id FROM changed_notetags)
+      AND change_txid <> txid_current();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
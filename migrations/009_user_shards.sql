@@ -0,0 +1,14 @@
+-- Shard map: which database holds each user's notes, tags and stats.
+--
+-- Only read on the catalog shard (the first entry of DB_SHARDS); users
+-- without a row live on the catalog itself. `moving` is set by
+-- rebalance_shards.py while a user's rows are copied to another shard,
+-- and the app turns that user's requests away until it is cleared.
+
+CREATE TABLE user_shards (
+    user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    shard INTEGER NOT NULL CHECK (shard >= 0),
+    moving BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE INDEX idx_user_shards_shard ON user_shards (shard);
@@ -0,0 +1,33 @@
+-- Hot and cold tiers for notes.
+--
+-- Archived notes are rarely listed, yet they took up room in every listing
+-- index. The listing indexes are now split by status: one set covers the
+-- hot tier (Active and Pinned notes), the other the archived notes, so
+-- the indexes behind everyday listings stay small enough to stay in
+-- memory and the cold ones are only read when archived notes are listed.
+-- Changing a note's status moves its entries from one tier's indexes to
+-- the other's. A status filter reads one tier's indexes, which replaces
+-- the (user_id, status, ...) index.
+--
+-- Listings that span both tiers read each one in order and merge the two
+-- (see build_tiered_query in app.py), so they still need no large sort.
+
+CREATE INDEX idx_notes_hot_modified ON notes (user_id, last_modified DESC, note_id DESC)
+    WHERE status <> 'Archived';
+CREATE INDEX idx_notes_hot_created ON notes (user_id, created_date DESC, note_id DESC)
+    WHERE status <> 'Archived';
+CREATE INDEX idx_notes_hot_title ON notes (user_id, title, note_id)
+    WHERE status <> 'Archived';
+
+CREATE INDEX idx_notes_cold_modified ON notes (user_id, last_modified DESC, note_id DESC)
+    WHERE status = 'Archived';
+CREATE INDEX idx_notes_cold_created ON notes (user_id, created_date DESC, note_id DESC)
+    WHERE status = 'Archived';
+CREATE INDEX idx_notes_cold_title ON notes (user_id, title, note_id)
+    WHERE status = 'Archived';
+
+-- Superseded by the tier indexes; status filters use the tier matching the status
+DROP INDEX IF EXISTS idx_notes_user_modified;
+DROP INDEX IF EXISTS idx_notes_user_created;
+DROP INDEX IF EXISTS idx_notes_user_title;
+DROP INDEX IF EXISTS idx_notes_user_status_modified;
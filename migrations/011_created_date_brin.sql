@@ -0,0 +1,10 @@
+-- Block range index on notes.created_date for date-range filters.
+--
+-- Notes are inserted in creation order, so created_date follows the
+-- physical row order and a BRIN index needs only a few kilobytes (one
+-- min/max pair per 128 pages) to skip everything outside a window. One
+-- user's windows are answered by the (user_id, created_date) tier indexes
+-- from 010; this one serves windows across all users. autosummarize
+-- indexes the ranges filled by new inserts without waiting for VACUUM.
+
+CREATE INDEX idx_notes_created_brin ON notes USING brin (created_date) WITH (autosummarize = on);
@@ -0,0 +1,376 @@
+"""
+Hash partition notes and notetags by user_id, online.
+
+Builds partitioned copies of both tables (notes_p0 .. notes_p<N-1> and
+the same for notetags) with the same columns, indexes, foreign keys and
+triggers, and moves the rows across while the app keeps running:
+
+1. Create notes_partitioned and notetags_partitioned. Unique keys gain
+   user_id, since Postgres can only enforce uniqueness within a partition.
+2. Install a mirror trigger on notes that applies every insert, update
+   and delete to the copy, then copy the existing rows in note_id batches.
+   Each batch locks its source rows FOR SHARE, so a row deleted while it
+   is being copied cannot come back. Then the same for notetags, whose
+   notes are all in the copy by then.
+3. Swap in one short transaction: drop the mirrors, move the app triggers
+   and sequence ownership, replace foreign keys that reference notes
+   (note_content_chunks, note_revisions) with an ON DELETE trigger, and
+   rename the tables. The old tables stay behind as notes_unpartitioned
+   and notetags_unpartitioned until --drop-old.
+
+Needs migration 008 (notetags.user_id). Rerunning after an interruption
+picks up where it left off; copying is idempotent. With DB_SHARDS set,
+run it once per shard with --shard.
+
+Usage:
+    python partition_notes.py --partitions 16
+    python partition_notes.py --partitions 16 --batch-size 5000
+    python partition_notes.py --drop-old
+    python partition_notes.py --shard 1 --partitions 16
+"""
+
+import argparse
+import time
+
+import psycopg
+
+from app import shard_router
+
+# Partitioned tables in dependency order, with the column batches are copied by
+TABLES = [('notes', 'note_id'), ('notetags', 'notetag_id')]
+PARTITION_KEY = 'user_id'
+SWAP_ATTEMPTS = 5
+
+
+def relkind(cur, table):
+    """Return 'r' for a plain table, 'p' for a partitioned one, None if missing."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return row['relkind'] if row else None
+
+
+def table_columns(cur, table):
+    cur.execute(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+        """,
+        (table,)
+    )
+    return [row['attname'] for row in cur.fetchall()]
+
+
+def table_constraints(cur, table, types):
+    """Return name, type, columns, referenced table and definition of a table's constraints."""
+    cur.execute(
+        """
+        SELECT c.conname, c.contype, c.confrelid::regclass::text AS referenced,
+               pg_get_constraintdef(c.oid) AS definition,
+               ARRAY(SELECT a.attname FROM unnest(c.conkey) WITH ORDINALITY k(attnum, i)
+                     JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+                     ORDER BY k.i) AS columns
+        FROM pg_constraint c
+        WHERE c.conrelid = %s::regclass AND c.contype = ANY(%s)
+        ORDER BY c.contype <> 'p', c.conname
+        """,
+        (table, list(types))
+    )
+    return cur.fetchall()
+
+
+def plain_indexes(cur, table):
+    """Return (name, definition) of the indexes that do not back a constraint."""
+    cur.execute(
+        """
+        SELECT i.indexrelid::regclass::text AS name, pg_get_indexdef(i.indexrelid) AS definition
+        FROM pg_index i
+        WHERE i.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        ORDER BY 1
+        """,
+        (table,)
+    )
+    return cur.fetchall()
+
+
+def key_indexes(cur, table):
+    """Return the names of the indexes backing a table's primary key and unique constraints."""
+    cur.execute(
+        """
+        SELECT conindid::regclass::text AS name FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u')
+        ORDER BY 1
+        """,
+        (table,)
+    )
+    return [row['name'] for row in cur.fetchall()]
+
+
+def create_partitioned_table(cur, table, partitions):
+    """Create <table>_partitioned with its partitions, keys and indexes."""
+    copy = f"{table}_partitioned"
+    cur.execute(
+        f"CREATE TABLE {copy} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY HASH ({PARTITION_KEY})"
+    )
+    for remainder in range(partitions):
+        cur.execute(
+            f"CREATE TABLE {table}_p{remainder} PARTITION OF {copy} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+
+    # Unique keys must include the partition key; a key that becomes
+    # identical to one already created is dropped
+    created = set()
+    for con in table_constraints(cur, table, 'pu'):
+        columns = list(con['columns'])
+        if PARTITION_KEY not in columns:
+            columns.append(PARTITION_KEY)
+        if frozenset(columns) in created:
+            continue
+        created.add(frozenset(columns))
+        kind = 'PRIMARY KEY' if con['contype'] == 'p' else 'UNIQUE'
+        cur.execute(f"ALTER TABLE {copy} ADD CONSTRAINT {con['conname']}_partitioned {kind} ({', '.join(columns)})")
+
+    for index in plain_indexes(cur, table):
+        cur.execute(index['definition'].replace(
+            f"INDEX {index['name']} ON public.{table} ",
+            f"INDEX {index['name']}_partitioned ON public.{copy} ", 1
+        ))
+
+    # Foreign keys to other partitioned tables point at their copies
+    partitioned = {name for name, _ in TABLES}
+    for con in table_constraints(cur, table, 'f'):
+        definition = con['definition']
+        if con['referenced'] in partitioned:
+            definition = definition.replace(f"REFERENCES {con['referenced']}(",
+                                            f"REFERENCES {con['referenced']}_partitioned(", 1)
+        cur.execute(f"ALTER TABLE {copy} ADD CONSTRAINT {con['conname']} {definition}")
+
+
+def install_mirror(cur, table):
+    """Apply every later write on table to its partitioned copy as well."""
+    copy = f"{table}_partitioned"
+    columns = table_columns(cur, table)
+    key = next(con['columns'] for con in table_constraints(cur, copy, 'p'))
+    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c not in key)
+    match = ' AND '.join(f"{c} = OLD.{c}" for c in key)
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION mirror_{table}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                DELETE FROM {copy} WHERE {match};
+            ELSE
+                INSERT INTO {copy} SELECT (NEW).*
+                ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE OR REPLACE TRIGGER {table}_mirror AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION mirror_{table}()
+        """
+    )
+
+
+def copy_rows(conn, table, id_column, batch_size):
+    """Copy existing rows into the partitioned copy in id batches; returns rows copied."""
+    cur = conn.cursor()
+    cur.execute(f"SELECT COALESCE(MIN({id_column}), 0) AS low, COALESCE(MAX({id_column}), 0) AS high FROM {table}")
+    bounds = cur.fetchone()
+    conn.commit()
+
+    copied = 0
+    start = bounds['low'] - 1
+    # Rows added after this point reach the copy through the mirror trigger
+    while start < bounds['high']:
+        end = start + batch_size
+        cur.execute(
+            f"""
+            INSERT INTO {table}_partitioned
+            SELECT * FROM {table} WHERE {id_column} > %s AND {id_column} <= %s FOR SHARE
+            ON CONFLICT DO NOTHING
+            """,
+            (start, end)
+        )
+        copied += cur.rowcount
+        conn.commit()
+        start = end
+        print(f"[INFO] {table}: copied up to {id_column} {min(end, bounds['high'])} of {bounds['high']}")
+
+    cur.close()
+    return copied
+
+
+def replace_incoming_foreign_keys(cur, table):
+    """Turn foreign keys from other tables into an ON DELETE trigger on the copy.
+
+    A foreign key needs a unique key on the referenced columns alone, which
+    a partitioned table cannot have unless it contains the partition key.
+    """
+    partitioned = {name for name, _ in TABLES}
+    cur.execute(
+        """
+        SELECT c.conname, c.conrelid::regclass::text AS child,
+               a.attname AS child_column, ra.attname AS parent_column
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        JOIN pg_attribute ra ON ra.attrelid = c.confrelid AND ra.attnum = c.confkey[1]
+        WHERE c.contype = 'f' AND c.confrelid = %s::regclass AND cardinality(c.conkey) = 1
+        ORDER BY c.conname
+        """,
+        (table,)
+    )
+    children = [row for row in cur.fetchall() if row['child'] not in partitioned]
+    if not children:
+        return []
+
+    for child in children:
+        cur.execute(f"ALTER TABLE {child['child']} DROP CONSTRAINT {child['conname']}")
+    deletes = '\n'.join(
+        f"    DELETE FROM {c['child']} WHERE {c['child_column']} IN (SELECT {c['parent_column']} FROM deleted_rows);"
+        for c in children
+    )
+    cur.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION delete_{table}_dependents() RETURNS trigger AS $$
+        BEGIN
+        {deletes}
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    cur.execute(
+        f"""
+        CREATE TRIGGER {table}_delete_dependents AFTER DELETE ON {table}_partitioned
+            REFERENCING OLD TABLE AS deleted_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION delete_{table}_dependents()
+        """
+    )
+    return [child['child'] for child in children]
+
+
+def swap(conn):
+    """Put the partitioned copies in place of the original tables in one transaction."""
+    cur = conn.cursor()
+    names = [name for name, _ in TABLES]
+    cur.execute("SET LOCAL lock_timeout = '5s'")
+    cur.execute(f"LOCK TABLE {', '.join(names)} IN ACCESS EXCLUSIVE MODE")
+
+    for table in names:
+        copy = f"{table}_partitioned"
+        cur.execute(f"DROP TRIGGER {table}_mirror ON {table}")
+        cur.execute(f"DROP FUNCTION mirror_{table}()")
+
+        cur.execute(
+            "SELECT pg_get_triggerdef(oid) AS definition FROM pg_trigger "
+            "WHERE tgrelid = %s::regclass AND NOT tgisinternal ORDER BY tgname",
+            (table,)
+        )
+        for trigger in cur.fetchall():
+            cur.execute(trigger['definition'].replace(f" ON public.{table} ", f" ON public.{copy} ", 1))
+
+        for child in replace_incoming_foreign_keys(cur, table):
+            print(f"[INFO] {child} rows are now deleted with their {table} row by trigger")
+
+        for column in table_columns(cur, table):
+            cur.execute("SELECT pg_get_serial_sequence(%s, %s) AS seq", (table, column))
+            sequence = cur.fetchone()['seq']
+            if sequence:
+                cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {copy}.{column}")
+
+        old_indexes = [index['name'] for index in plain_indexes(cur, table)] + key_indexes(cur, table)
+        new_indexes = [index['name'] for index in plain_indexes(cur, copy)] + key_indexes(cur, copy)
+        for name in old_indexes:
+            cur.execute(f"ALTER INDEX {name} RENAME TO {name}_unpartitioned")
+        for name in new_indexes:
+            if name.endswith('_partitioned'):
+                cur.execute(f"ALTER INDEX {name} RENAME TO {name[:-len('_partitioned')]}")
+
+        cur.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        cur.execute(f"ALTER TABLE {copy} RENAME TO {table}")
+
+    conn.commit()
+    cur.close()
+
+
+def drop_old(conn):
+    cur = conn.cursor()
+    for table, _ in reversed(TABLES):
+        cur.execute(f"DROP TABLE IF EXISTS {table}_unpartitioned")
+    conn.commit()
+    cur.close()
+    print("[SUCCESS] Dropped the unpartitioned tables")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Hash partition notes and notetags by user_id.')
+    parser.add_argument('--partitions', type=int, default=16, help='number of hash partitions')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows copied per transaction')
+    parser.add_argument('--drop-old', action='store_true', help='drop the tables left behind by a finished swap')
+    parser.add_argument('--shard', type=int, default=0, help='shard to partition (0 is the catalog)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = shard_router.connect(args.shard)
+    cur = conn.cursor()
+
+    try:
+        if args.drop_old:
+            drop_old(conn)
+            return
+
+        if relkind(cur, 'notes') == 'p':
+            print("[INFO] notes is already partitioned")
+            return
+        if 'user_id' not in table_columns(cur, 'notetags'):
+            print("[ERROR] notetags has no user_id; run python migrate.py first")
+            return
+
+        for table, id_column in TABLES:
+            if relkind(cur, f"{table}_partitioned") is None:
+                create_partitioned_table(cur, table, args.partitions)
+                print(f"[INFO] Created {table}_partitioned with {args.partitions} partitions")
+            install_mirror(cur, table)
+            conn.commit()
+
+            copied = copy_rows(conn, table, id_column, args.batch_size)
+            print(f"[INFO] {table}: {copied} rows copied")
+
+        for attempt in range(1, SWAP_ATTEMPTS + 1):
+            try:
+                swap(conn)
+                break
+            except psycopg.errors.LockNotAvailable:
+                conn.rollback()
+                print(f"[INFO] Tables busy, retrying the swap ({attempt}/{SWAP_ATTEMPTS})")
+                time.sleep(1)
+        else:
+            print("[ERROR] Could not lock the tables for the swap; rerun when traffic is lower")
+            return
+
+        cur.execute(f"ANALYZE {', '.join(name for name, _ in TABLES)}")
+        conn.commit()
+        print("[SUCCESS] notes and notetags are partitioned; the old tables are kept as "
+              "notes_unpartitioned and notetags_unpartitioned, drop them with --drop-old")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERROR] Partitioning failed: {e}")
+
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Query plan regression tests for the note listing queries.
+
+Runs EXPLAIN on every get_notes variant and the /api/suggest title lookup
+for a heavy and a typical account and fails if a plan falls back to a
+sequential scan on the note tables, needs an explicit sort or, once
+partition_notes.py has run, reads more than one partition of a table.
+Queries that read every matching note (search, facets, sync, stats) are
+only checked for sequential scans and partitions.
+Run against the benchmark dataset:
+
+    python generate_data.py --reset --users 2000 --notes 200000
+    python migrate.py
+    python planTest.py
+"""
+
+import re
+import sys
+from datetime import datetime
+
+from app import (get_db_connection, build_notes_query, build_suggest_queries, SUGGEST_LIMIT,
+                 build_notes_filter, build_facets_query, build_search_ids_query, build_histogram_query,
+                 USER_STATS_QUERIES, UPDATE_USER_STATS_QUERY)
+
+PAGE_SIZE = 50
+
+# Tables that must always be reached through an index
+INDEXED_TABLES = {'notes', 'notetags'}
+
+# Hash partitions created by partition_notes.py are named <table>_p<n>
+PARTITION_NAME = re.compile(r'^(?P<table>\w+)_p\d+$')
+
+# Sorting a handful of rows for a small account is cheaper than an ordered
+# index walk over scattered heap pages; only larger sorts count as regressions.
+SORT_ROW_LIMIT = 1000
+
+# (name, build_notes_query keyword arguments)
+LISTING_VARIANTS = [
+    ("Default listing (last_modified desc)", {}),
+    ("Listing last_modified asc", {'order': 'asc'}),
+    ("Listing created_date desc", {'sort_by': 'created_date'}),
+    ("Listing created_date asc", {'sort_by': 'created_date', 'order': 'asc'}),
+    ("Listing title asc", {'sort_by': 'title', 'order': 'asc'}),
+    ("Listing title desc", {'sort_by': 'title'}),
+    ("Status Active", {'status': 'Active'}),
+    ("Status Pinned", {'status': 'Pinned'}),
+    ("Status Archived", {'status': 'Archived'}),
+    ("Archived excluded", {'archived': 'exclude'}),
+    ("Archived only", {'archived': 'only'}),
+    ("Archived only by title", {'archived': 'only', 'sort_by': 'title', 'order': 'asc'}),
+    ("Listing page 5 by created_date", {'sort_by': 'created_date', 'offset': 200}),
+    ("Created in a month", {'date_range': {'created_after': datetime(2024, 1, 1),
+                                           'created_before': datetime(2024, 2, 1)}}),
+    ("Created in a month by created_date", {'sort_by': 'created_date',
+                                            'date_range': {'created_after': datetime(2024, 1, 1),
+                                                           'created_before': datetime(2024, 2, 1)}}),
+    ("Modified since a date", {'date_range': {'modified_after': datetime(2024, 6, 1)}}),
+    ("Search", {'search': 'deadline'}),
+]
+
+# Typed prefixes for /api/suggest, from one letter to a full word
+SUGGEST_PREFIXES = ['a', 'pro', 'meeting']
+
+
+def print_result(test_name, success, problems=None):
+    """Print test result."""
+    status = "✅ PASS" if success else "❌ FAIL"
+    print(f"{status} - {test_name}")
+    for problem in problems or []:
+        print(f"       {problem}")
+
+
+def plan_nodes(node):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan tree."""
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def base_table(relation):
+    """Return the partitioned table a partition belongs to, or the relation itself."""
+    match = PARTITION_NAME.match(relation)
+    return match.group('table') if match else relation
+
+
+def plan_problems(plan, sort_limit=SORT_ROW_LIMIT):
+    """Return the regressions found in a plan; sorts are not checked when sort_limit is None."""
+    problems = []
+    partitions = {}
+    for node in plan_nodes(plan['Plan']):
+        node_type = node['Node Type']
+        relation = node.get('Relation Name')
+        if relation and base_table(relation) != relation:
+            partitions.setdefault(base_table(relation), set()).add(relation)
+        if node_type == 'Seq Scan' and relation and base_table(relation) in INDEXED_TABLES:
+            problems.append(f"Seq Scan on {relation}")
+        elif node_type == 'Sort' and sort_limit is not None and node['Plans'][0]['Plan Rows'] > sort_limit:
+            problems.append(f"Sort of ~{node['Plans'][0]['Plan Rows']} rows on "
+                            f"{', '.join(node.get('Sort Key', []))}")
+    for table, scanned in sorted(partitions.items()):
+        if len(scanned) > 1:
+            problems.append(f"{len(scanned)} partitions of {table} read, expected one")
+    return problems
+
+
+def explain(cur, query, params):
+    """Return the JSON plan for a query."""
+    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    return cur.fetchone()['QUERY PLAN'][0]
+
+
+def tag_variants(cur, user_id):
+    """Build tag filter variants from the account's most and least used tags."""
+    cur.execute(
+        """
+        SELECT tag_id, COUNT(*) AS uses
+        FROM notetags WHERE user_id = %s
+        GROUP BY tag_id ORDER BY uses DESC, tag_id
+        """,
+        (user_id,)
+    )
+    tag_ids = [row['tag_id'] for row in cur.fetchall()]
+    if len(tag_ids) < 2:
+        return []
+    common, rare = tag_ids[:2], tag_ids[-1:]
+    return [
+        ("Tag filter any (common tags)", {'tag_ids': common, 'tag_mode': 'any'}),
+        ("Tag filter all (common tags)", {'tag_ids': common, 'tag_mode': 'all'}),
+        ("Tag filter none (common tags)", {'tag_ids': common, 'tag_mode': 'none'}),
+        ("Tag filter any (rare tag)", {'tag_ids': rare, 'tag_mode': 'any'}),
+        ("Tag filter + status", {'tag_ids': common, 'status': 'Active'}),
+    ]
+
+
+def whole_account_queries(user_id):
+    """Build the queries that read all of an account's matching notes; returns [(name, sql, params)].
+
+    They have to sort or aggregate every match anyway, so only the access
+    path is checked: none may scan the note tables sequentially.
+    """
+    where, params = build_notes_filter(user_id)
+    return [
+        ("Search ids", *build_search_ids_query(user_id, 'deadline')),
+        ("Facets", *build_facets_query(user_id, where, params, both_tiers=True)),
+        ("Full sync listing", *build_notes_query(user_id)),
+        ("User note stats", USER_STATS_QUERIES[1], (user_id,)),
+        ("User stats refresh", UPDATE_USER_STATS_QUERY, (user_id, user_id, user_id)),
+        ("Histogram per week", *build_histogram_query(user_id, 'week', 'created_date')),
+    ]
+
+
+def pick_accounts(cur):
+    """Return {label: user_id} for the heaviest and the median account."""
+    cur.execute(
+        """
+        SELECT user_id, COUNT(*) AS note_count
+        FROM notes GROUP BY user_id ORDER BY note_count DESC
+        """
+    )
+    counts = cur.fetchall()
+    if not counts:
+        return {}
+    return {
+        f"heavy user {counts[0]['user_id']} ({counts[0]['note_count']} notes)": counts[0]['user_id'],
+        f"median user {counts[len(counts) // 2]['user_id']} "
+        f"({counts[len(counts) // 2]['note_count']} notes)": counts[len(counts) // 2]['user_id'],
+    }
+
+
+def run_all_tests():
+    """Run all plan tests."""
+    print("\n" + "=" * 60)
+    print("NOTE LISTING QUERY PLAN TESTS")
+    print("=" * 60)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    passed = 0
+    failed = 0
+
+    accounts = pick_accounts(cur)
+    if not accounts:
+        print("❌ FAIL - No notes found, load data with generate_data.py first")
+        return False
+
+    for label, user_id in accounts.items():
+        print(f"\n--- {label} ---\n")
+
+        for name, kwargs in LISTING_VARIANTS + tag_variants(cur, user_id):
+            query, params = build_notes_query(user_id, **{'limit': PAGE_SIZE, 'offset': 0, **kwargs})
+            problems = plan_problems(explain(cur, query, params))
+            print_result(name, not problems, problems)
+            if problems:
+                failed += 1
+            else:
+                passed += 1
+
+        for name, query, params in whole_account_queries(user_id):
+            problems = plan_problems(explain(cur, query, params), sort_limit=None)
+            print_result(name, not problems, problems)
+            if problems:
+                failed += 1
+            else:
+                passed += 1
+
+        for prefix in SUGGEST_PREFIXES:
+            query, params = build_suggest_queries(user_id, prefix, SUGGEST_LIMIT)[0]
+            problems = plan_problems(explain(cur, query, params))
+            print_result(f"Suggest titles '{prefix}'", not problems, problems)
+            if problems:
+                failed += 1
+            else:
+                passed += 1
+
+    cur.close()
+    conn.close()
+
+    print("\n" + "=" * 60)
+    print(f"RESULTS: {passed} passed, {failed} failed, {passed + failed} total")
+    print("=" * 60 + "\n")
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,255 @@
+"""
+Move users between shards, and prepare shards for it.
+
+Shards are listed in DB_SHARDS (see app.py); the first one is the catalog.
+Migrate every shard first (python migrate.py does all of them).
+
+--prepare is run once after configuring the shards, and again after adding
+one or bulk loading with generate_data.py:
+  * Note and notetag ids are interleaved: each shard's sequence steps by
+    ID_STRIDE from its own offset above the highest id on any shard, so
+    ids stay unique when a user's rows are moved.
+  * The tag catalog is copied from the catalog shard to the others.
+
+--user N --to S moves one user:
+  1. Mark the user `moving` in user_shards. Once the app's cached shard
+     map entries expire, their requests get a 503 with Retry-After. The
+     tool waits that long, plus the time buffered drafts and logins may
+     take to be written to the old shard.
+  2. Copy the user's row (unless the target is the catalog), stats, notes,
+     content chunks, revisions and notetags to the target in one
+     transaction. change_txid is not copied, so the rows count as changed
+     on the target; clients resync anyway, as their sync tokens name the
+     old shard.
+  3. Point user_shards at the target and clear `moving`.
+  4. Delete the user's data from the old shard.
+If the copy fails, the user stays where they were.
+
+To try it locally, create a second database on the same server (or start
+another Postgres instance), load schema.sql into it, and run:
+    export DB_SHARDS=postgresql://postgres:pw@localhost:5432/notetaking,postgresql://postgres:pw@localhost:5432/notetaking_1
+    python migrate.py
+    python rebalance_shards.py --prepare
+
+Usage:
+    python rebalance_shards.py --status
+    python rebalance_shards.py --prepare
+    python rebalance_shards.py --user 42 --to 1
+"""
+
+import argparse
+import time
+
+from app import app, CATALOG_SHARD, UPDATE_USER_STATS_QUERY, replicate_tags, shard_router
+
+# Ids on shard k are k modulo this, so at most this many shards
+ID_STRIDE = 1024
+
+# Tables with ids generated per shard, and their id column
+ID_SEQUENCES = [('notes', 'note_id'), ('notetags', 'notetag_id')]
+
+# A user's rows, in foreign key order; each condition takes (user_id,)
+USER_TABLES = [
+    ('userstats', 'user_id = %s'),
+    ('notes', 'user_id = %s'),
+    ('note_content_chunks', 'note_id IN (SELECT note_id FROM notes WHERE user_id = %s)'),
+    ('note_revisions', 'note_id IN (SELECT note_id FROM notes WHERE user_id = %s)'),
+    ('notetags', 'user_id = %s'),
+]
+
+# Set by the target shard's own default
+SKIPPED_COLUMNS = {'change_txid'}
+
+
+def copied_columns(cur, table):
+    """Columns of a table copied when moving rows, in table order."""
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+        """,
+        (table,)
+    )
+    return [row['column_name'] for row in cur.fetchall() if row['column_name'] not in SKIPPED_COLUMNS]
+
+
+def copy_user_rows(source, target, table, condition, user_id):
+    """Stream a user's rows of one table from the source to the target shard; returns the row count."""
+    src_cur = source.cursor()
+    dst_cur = target.cursor()
+    columns = ', '.join(copied_columns(src_cur, table))
+    with src_cur.copy(f"COPY (SELECT {columns} FROM {table} WHERE {condition}) TO STDOUT", (user_id,)) as out:
+        with dst_cur.copy(f"COPY {table} ({columns}) FROM STDIN") as into:
+            for data in out:
+                into.write(data)
+    copied = dst_cur.rowcount
+    src_cur.close()
+    dst_cur.close()
+    return copied
+
+
+def set_moving(catalog, user_id, shard, moving):
+    catalog.execute(
+        """
+        INSERT INTO user_shards (user_id, shard, moving) VALUES (%s, %s, %s)
+        ON CONFLICT (user_id) DO UPDATE SET shard = EXCLUDED.shard, moving = EXCLUDED.moving
+        """,
+        (user_id, shard, moving)
+    )
+    catalog.commit()
+
+
+def settle_seconds():
+    """How long until no process can still write to a user's old shard."""
+    return (app.config['SHARD_MAP_TTL_SECONDS']
+            + max(app.config['DRAFT_MAX_AGE_SECONDS'], app.config['LOGIN_FLUSH_SECONDS']) + 1)
+
+
+def move_user(user_id, target_shard, settle):
+    catalog = shard_router.connect()
+    try:
+        user = catalog.execute(
+            "SELECT user_id, name, email, password, created_at FROM users WHERE user_id = %s",
+            (user_id,)
+        ).fetchone()
+        if not user:
+            print(f"[ERROR] User {user_id} not found")
+            return
+        source_shard, moving = shard_router.lookup(user_id)
+        catalog.commit()
+        if source_shard == target_shard:
+            if moving:
+                # Left behind by an interrupted run
+                set_moving(catalog, user_id, source_shard, False)
+            print(f"[INFO] User {user_id} is already on shard {target_shard}")
+            return
+
+        set_moving(catalog, user_id, source_shard, True)
+        print(f"[INFO] User {user_id} marked as moving; waiting {settle:g} s for writes to settle")
+        time.sleep(settle)
+
+        source = shard_router.connect(source_shard)
+        target = shard_router.connect(target_shard)
+        try:
+            try:
+                if target_shard != CATALOG_SHARD:
+                    target.execute(
+                        "INSERT INTO users (user_id, name, email, password, created_at) VALUES (%s, %s, %s, %s, %s)",
+                        (user['user_id'], user['name'], user['email'], user['password'], user['created_at'])
+                    )
+                for table, condition in USER_TABLES:
+                    copied = copy_user_rows(source, target, table, condition, user_id)
+                    print(f"[INFO] {table}: {copied} rows copied")
+                target.execute(UPDATE_USER_STATS_QUERY, (user_id, user_id, user_id))
+                source.commit()
+                target.commit()
+            except Exception:
+                target.rollback()
+                source.rollback()
+                set_moving(catalog, user_id, source_shard, False)
+                raise
+
+            set_moving(catalog, user_id, target_shard, False)
+            print(f"[INFO] User {user_id} now lives on shard {target_shard}")
+
+            if source_shard == CATALOG_SHARD:
+                # The catalog keeps the user; notetags, chunks and revisions cascade from notes
+                source.execute("DELETE FROM notes WHERE user_id = %s", (user_id,))
+                source.execute("DELETE FROM userstats WHERE user_id = %s", (user_id,))
+            else:
+                source.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+            source.commit()
+        finally:
+            source.close()
+            target.close()
+
+        print(f"[SUCCESS] Moved user {user_id} from shard {source_shard} to shard {target_shard}")
+
+    finally:
+        catalog.close()
+
+
+def interleave_ids(conns):
+    """Give every shard its own residue of ID_STRIDE for note and notetag ids."""
+    for table, column in ID_SEQUENCES:
+        sequences = []
+        highest = 0
+        for conn in conns:
+            sequence = conn.execute("SELECT pg_get_serial_sequence(%s, %s) AS seq", (table, column)).fetchone()['seq']
+            used = conn.execute(
+                f"SELECT GREATEST((SELECT last_value FROM {sequence}), (SELECT MAX({column}) FROM {table})) AS used"
+            ).fetchone()['used']
+            sequences.append(sequence)
+            highest = max(highest, used or 0)
+
+        base = (highest // ID_STRIDE + 1) * ID_STRIDE
+        for shard, (conn, sequence) in enumerate(zip(conns, sequences)):
+            conn.execute(f"ALTER SEQUENCE {sequence} INCREMENT BY {ID_STRIDE}")
+            conn.execute("SELECT setval(%s::regclass, %s, false)", (sequence, base + shard))
+            conn.commit()
+        print(f"[INFO] {table}: ids from {base} on, step {ID_STRIDE}")
+
+
+def prepare():
+    if shard_router.shard_count > ID_STRIDE:
+        print(f"[ERROR] At most {ID_STRIDE} shards are supported")
+        return
+    conns = [shard_router.connect(shard) for shard in range(shard_router.shard_count)]
+    try:
+        interleave_ids(conns)
+    finally:
+        for conn in conns:
+            conn.close()
+    replicate_tags()
+    print(f"[SUCCESS] {shard_router.shard_count} shards prepared; the tag catalog is copied to all of them")
+
+
+def status():
+    catalog = shard_router.connect()
+    placed = {row['shard']: row for row in catalog.execute(
+        "SELECT shard, COUNT(*) AS users, COUNT(*) FILTER (WHERE moving) AS moving FROM user_shards GROUP BY shard"
+    ).fetchall()}
+    catalog.close()
+
+    for shard in range(shard_router.shard_count):
+        conn = shard_router.connect(shard)
+        notes = conn.execute("SELECT COUNT(*) AS notes, COUNT(DISTINCT user_id) AS owners FROM notes").fetchone()
+        conn.close()
+        row = placed.get(shard, {'users': 0, 'moving': 0})
+        label = 'catalog' if shard == CATALOG_SHARD else f'shard {shard}'
+        print(f"[INFO] {label}: {notes['notes']} notes of {notes['owners']} users, "
+              f"{row['users']} users mapped here, {row['moving']} moving")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Move NoteFlow users between database shards.')
+    parser.add_argument('--status', action='store_true', help='show how users and notes are spread')
+    parser.add_argument('--prepare', action='store_true', help='interleave id sequences and copy the tag catalog')
+    parser.add_argument('--user', type=int, help='user to move')
+    parser.add_argument('--to', type=int, help='shard to move the user to')
+    parser.add_argument('--settle-seconds', type=float, default=None,
+                        help='wait after marking the user as moving (default: derived from the app settings)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    try:
+        if args.prepare:
+            prepare()
+        elif args.user is not None:
+            if args.to is None or not 0 <= args.to < shard_router.shard_count:
+                print(f"[ERROR] --to must be a shard between 0 and {shard_router.shard_count - 1}")
+                return
+            move_user(args.user, args.to, settle_seconds() if args.settle_seconds is None else args.settle_seconds)
+        else:
+            status()
+
+    except Exception as e:
+        print(f"[ERROR] Rebalancing failed: {e}")
+
+
+if __name__ == '__main__':
+    main()
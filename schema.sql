@@ -1,6 +1,11 @@
 -- NoteFlow Schema
 
 -- Drop potentially pre-existing tables
+DROP TABLE IF EXISTS schema_migrations CASCADE;
+DROP TABLE IF EXISTS user_shards CASCADE;
+DROP TABLE IF EXISTS tombstones CASCADE;
+DROP TABLE IF EXISTS note_content_chunks CASCADE;
+DROP TABLE IF EXISTS note_revisions CASCADE;
 DROP TABLE IF EXISTS notetags CASCADE;
 DROP TABLE IF EXISTS notes CASCADE;
 DROP TABLE IF EXISTS tags CASCADE;
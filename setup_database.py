@@ -44,7 +44,7 @@ try:
     cur.close()
     conn.close()
     
-    print("\n[SUCCESS] Database setup complete, run: python app.py")
+    print("\n[SUCCESS] Database setup complete, run: python migrate.py && python app.py")
     
 except Exception as e:
     print(f"[ERROR] Setup failed: {e}")
@@ -3,6 +3,28 @@ let currentUser = null;
 let authToken = null;
 let allNotes = [];
 let allTags = [];
+let noteFacets = null;
+let syncToken = null;
+let changeEvents = null;
+
+// Bodies above this size are uploaded as a stream and loaded in ranges
+const LARGE_CONTENT_CHARS = 16384;
+const CONTENT_RANGE_CHARS = 262144;
+
+// What the open note looked like when loaded; saves send edits against it
+let editorBase = null;
+
+// Search box suggestions wait for a typing pause; a newer keystroke cancels the request
+const SUGGEST_DELAY_MS = 150;
+let suggestTimer = null;
+let suggestController = null;
+
+// Typing pauses this long before the editor autosaves a draft
+const AUTOSAVE_DELAY_MS = 1500;
+let autosaveTimer = null;
+let autosaveRequest = null;
+// Last title/content the server buffered as a draft of editorBase
+let autosaved = null;
 
 document.addEventListener('DOMContentLoaded', () => {
     checkAuth();
@@ -17,10 +39,13 @@ function setupEventListeners() {
     document.getElementById('newNoteBtn')?.addEventListener('click', () => openNoteModal());
     document.getElementById('saveNoteBtn')?.addEventListener('click', saveNote);
     document.getElementById('closeModalBtn')?.addEventListener('click', closeNoteModal);
+    document.getElementById('noteTitle')?.addEventListener('input', scheduleAutosave);
+    document.getElementById('noteContent')?.addEventListener('input', scheduleAutosave);
     
     document.getElementById('statusFilter')?.addEventListener('change', filterNotes);
     document.getElementById('tagFilter')?.addEventListener('change', filterNotes);
     document.getElementById('searchInput')?.addEventListener('input', filterNotes);
+    document.getElementById('searchInput')?.addEventListener('input', scheduleSuggestions);
 }
 
 function checkAuth() {
@@ -88,6 +113,7 @@ async function handleRegister(e) {
 }
 
 function handleLogout() {
+    closeChangeEvents();
     localStorage.removeItem('authToken');
     authToken = null;
     currentUser = null;
@@ -122,6 +148,25 @@ function showDashboard() {
     document.getElementById('dashboardPage').classList.remove('hidden');
     document.getElementById('userName').textContent = currentUser.name;
     loadDashboardData();
+    openChangeEvents();
+}
+
+function openChangeEvents() {
+    closeChangeEvents();
+    changeEvents = new EventSource(`${API_URL}/events?token=${encodeURIComponent(authToken)}`);
+    // The server coalesces bursts, so each event is worth one delta sync
+    changeEvents.addEventListener('change', () => {
+        if (syncToken) {
+            syncNotes();
+        }
+    });
+}
+
+function closeChangeEvents() {
+    if (changeEvents) {
+        changeEvents.close();
+        changeEvents = null;
+    }
 }
 
 function showLogin() {
@@ -135,58 +180,117 @@ function showRegister() {
 }
 
 async function loadDashboardData() {
-    await Promise.all([
-        fetchNotes(),
-        fetchTags(),
-        fetchStats()
-    ]);
-}
-
-async function fetchNotes() {
     try {
-        const response = await fetch(`${API_URL}/notes`, {
+        const response = await fetch(`${API_URL}/bootstrap`, {
             headers: { 'Authorization': `Bearer ${authToken}` }
         });
         
         if (response.ok) {
             const data = await response.json();
             allNotes = data.notes;
+            allTags = data.tags;
+            noteFacets = data.facets;
+            syncToken = data.sync_token;
             displayNotes(allNotes);
+            populateTagFilter();
+            if (data.stats) {
+                displayStats(data.stats);
+            }
+            if (data.has_more) {
+                await fetchRemainingNotes(allNotes.length);
+            }
         }
     } catch (error) {
-        console.error('Failed to fetch notes:', error);
+        console.error('Failed to load dashboard:', error);
     }
 }
 
-async function fetchTags() {
+async function fetchRemainingNotes(offset) {
     try {
-        const response = await fetch(`${API_URL}/tags`, {
+        const response = await fetch(`${API_URL}/notes?offset=${offset}`, {
             headers: { 'Authorization': `Bearer ${authToken}` }
         });
         
         if (response.ok) {
             const data = await response.json();
-            allTags = data.tags;
+            const loaded = new Set(allNotes.map(note => note.note_id));
+            allNotes = allNotes.concat(data.notes.filter(note => !loaded.has(note.note_id)));
+            noteFacets = computeLocalFacets();
             populateTagFilter();
+            filterNotes();
         }
     } catch (error) {
-        console.error('Failed to fetch tags:', error);
+        console.error('Failed to fetch notes:', error);
     }
 }
 
-async function fetchStats() {
+async function syncNotes() {
     try {
-        const response = await fetch(`${API_URL}/users/${currentUser.user_id}/stats`, {
+        const response = await fetch(`${API_URL}/sync?since=${encodeURIComponent(syncToken || '')}`, {
             headers: { 'Authorization': `Bearer ${authToken}` }
         });
         
         if (response.ok) {
-            const data = await response.json();
-            displayStats(data.stats);
+            applySyncDelta(await response.json());
         }
     } catch (error) {
-        console.error('Failed to fetch stats:', error);
+        console.error('Failed to sync notes:', error);
+    }
+}
+
+function applySyncDelta(delta) {
+    if (delta.reset) {
+        allNotes = delta.notes;
+        allTags = delta.tags;
+    } else {
+        const changedNotes = new Map(delta.notes.map(note => [note.note_id, note]));
+        const deletedNotes = new Set(delta.deleted_note_ids);
+        allNotes = allNotes
+            .filter(note => !changedNotes.has(note.note_id) && !deletedNotes.has(note.note_id))
+            .concat(delta.notes.filter(note => !deletedNotes.has(note.note_id)));
+
+        const changedTags = new Map(delta.tags.map(tag => [tag.tag_id, tag]));
+        const deletedTags = new Set(delta.deleted_tag_ids);
+        allTags = allTags
+            .filter(tag => !changedTags.has(tag.tag_id) && !deletedTags.has(tag.tag_id))
+            .concat(delta.tags)
+            .sort((a, b) => a.tag_name.localeCompare(b.tag_name));
+
+        // Renamed or recoloured tags are embedded in unchanged notes too
+        if (changedTags.size || deletedTags.size) {
+            allNotes.forEach(note => {
+                note.tags = note.tags
+                    .filter(tag => !deletedTags.has(tag.tag_id))
+                    .map(tag => changedTags.get(tag.tag_id) || tag);
+            });
+        }
     }
+    
+    allNotes.sort((a, b) => b.last_modified.localeCompare(a.last_modified) || b.note_id - a.note_id);
+    syncToken = delta.token;
+    
+    noteFacets = computeLocalFacets();
+    displayStats(computeLocalStats());
+    populateTagFilter();
+    filterNotes();
+}
+
+function computeLocalFacets() {
+    const counts = {};
+    allNotes.forEach(note => note.tags.forEach(tag => counts[tag.tag_id] = (counts[tag.tag_id] || 0) + 1));
+    return { tags: Object.entries(counts).map(([tag_id, count]) => ({ tag_id: Number(tag_id), count })) };
+}
+
+function computeLocalStats() {
+    const activeTags = new Set();
+    allNotes.forEach(note => note.tags.forEach(tag => activeTags.add(tag.tag_id)));
+    return {
+        total_notes: allNotes.length,
+        active_notes: allNotes.filter(note => note.status === 'Active').length,
+        pinned_notes: allNotes.filter(note => note.status === 'Pinned').length,
+        archived_notes: allNotes.filter(note => note.status === 'Archived').length,
+        total_active_tags: activeTags.size
+    };
 }
 
 function displayNotes(notes) {
@@ -231,8 +335,12 @@ function displayStats(stats) {
 
 function populateTagFilter() {
     const select = document.getElementById('tagFilter');
+    const selected = select.value;
+    const counts = {};
+    (noteFacets?.tags || []).forEach(facet => counts[facet.tag_id] = facet.count);
     select.innerHTML = '<option value="">All Tags</option>' + 
-        allTags.map(tag => `<option value="${tag.tag_id}">${escapeHtml(tag.tag_name)}</option>`).join('');
+        allTags.map(tag => `<option value="${tag.tag_id}">${escapeHtml(tag.tag_name)} (${counts[tag.tag_id] || 0})</option>`).join('');
+    select.value = selected;
 }
 
 function filterNotes() {
@@ -253,19 +361,63 @@ function filterNotes() {
     if (search) {
         filtered = filtered.filter(note => 
             note.title.toLowerCase().includes(search) || 
-            note.content.toLowerCase().includes(search)
+            note.content.toLowerCase().includes(search) ||
+            note.tags.some(tag => tag.tag_name.toLowerCase() === search)
         );
     }
     
     displayNotes(filtered);
 }
 
+function scheduleSuggestions() {
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(loadSuggestions, SUGGEST_DELAY_MS);
+}
+
+async function loadSuggestions() {
+    const query = document.getElementById('searchInput').value.trim();
+    const list = document.getElementById('searchSuggestions');
+    if (suggestController) {
+        suggestController.abort();
+    }
+    if (!query) {
+        list.replaceChildren();
+        return;
+    }
+    
+    suggestController = new AbortController();
+    try {
+        const response = await fetch(`${API_URL}/suggest?q=${encodeURIComponent(query)}`, {
+            headers: { 'Authorization': `Bearer ${authToken}` },
+            signal: suggestController.signal
+        });
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        const values = [...data.titles.map(t => t.title), ...data.tags.map(t => t.tag_name)];
+        list.replaceChildren(...values.map(value => {
+            const option = document.createElement('option');
+            option.value = value;
+            return option;
+        }));
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('Failed to load suggestions:', error);
+        }
+    }
+}
+
 function openNoteModal(noteId = null) {
     const modal = document.getElementById('noteModal');
     const title = document.getElementById('modalTitle');
     const noteTitle = document.getElementById('noteTitle');
     const noteContent = document.getElementById('noteContent');
     const tagSelector = document.getElementById('tagSelector');
+    noteContent.readOnly = false;
+    document.getElementById('saveNoteBtn').disabled = false;
+    clearTimeout(autosaveTimer);
+    autosaved = null;
     
     if (noteId) {
         const note = allNotes.find(n => n.note_id === noteId);
@@ -273,6 +425,16 @@ function openNoteModal(noteId = null) {
         noteTitle.value = note.title;
         noteContent.value = note.content;
         document.getElementById('noteModal').dataset.noteId = noteId;
+        editorBase = {
+            noteId,
+            version: note.version,
+            title: note.title,
+            tagIds: note.tags.map(t => t.tag_id).sort(),
+            content: note.content_truncated ? null : note.content
+        };
+        if (note.content_truncated) {
+            loadNoteContent(noteId);
+        }
         
         tagSelector.innerHTML = allTags.map(tag => `
             <div class="tag-option ${note.tags.some(t => t.tag_id === tag.tag_id) ? 'selected' : ''}" 
@@ -287,6 +449,7 @@ function openNoteModal(noteId = null) {
         noteTitle.value = '';
         noteContent.value = '';
         delete document.getElementById('noteModal').dataset.noteId;
+        editorBase = null;
         
         tagSelector.innerHTML = allTags.map(tag => `
             <div class="tag-option" 
@@ -301,14 +464,228 @@ function openNoteModal(noteId = null) {
     modal.classList.add('active');
 }
 
+async function loadNoteContent(noteId) {
+    const modal = document.getElementById('noteModal');
+    const noteContent = document.getElementById('noteContent');
+    const saveBtn = document.getElementById('saveNoteBtn');
+    noteContent.readOnly = true;
+    saveBtn.disabled = true;
+    
+    try {
+        let offset = 0;
+        let content = '';
+        let version = null;
+        while (offset !== null) {
+            const response = await fetch(`${API_URL}/notes/${noteId}?offset=${offset}&length=${CONTENT_RANGE_CHARS}`, {
+                headers: { 'Authorization': `Bearer ${authToken}` }
+            });
+            if (!response.ok || modal.dataset.noteId !== String(noteId)) {
+                return;
+            }
+            const data = await response.json();
+            if (version !== null && data.note.version !== version) {
+                // Saved elsewhere while loading: start over from the new version
+                offset = 0;
+                content = '';
+                version = null;
+                continue;
+            }
+            version = data.note.version;
+            content += data.note.content;
+            noteContent.value = content;
+            offset = data.note.next_offset;
+        }
+        if (editorBase && editorBase.noteId === noteId) {
+            editorBase.content = content;
+            editorBase.version = version;
+        }
+    } catch (error) {
+        console.error('Failed to load note content:', error);
+    } finally {
+        if (modal.dataset.noteId === String(noteId)) {
+            noteContent.readOnly = false;
+            saveBtn.disabled = false;
+        }
+    }
+}
+
 function closeNoteModal() {
     document.getElementById('noteModal').classList.remove('active');
 }
 
+function scheduleAutosave() {
+    // Only existing notes small enough to resend whole; the server buffers the drafts
+    clearTimeout(autosaveTimer);
+    if (!editorBase || editorBase.content === null || editorBase.conflict) {
+        return;
+    }
+    autosaveTimer = setTimeout(autosaveDraft, AUTOSAVE_DELAY_MS);
+}
+
+async function autosaveDraft() {
+    const base = editorBase;
+    const title = document.getElementById('noteTitle').value;
+    const content = document.getElementById('noteContent').value;
+    if (!base || !title.trim() || content.length > LARGE_CONTENT_CHARS) {
+        return;
+    }
+    
+    autosaveRequest = fetch(`${API_URL}/notes/${base.noteId}/draft`, {
+        method: 'PUT',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${authToken}`
+        },
+        body: JSON.stringify({ base_version: base.version, title, content })
+    }).then(response => {
+        if (response.ok && editorBase === base) {
+            autosaved = { title, content };
+        } else if (response.status === 409) {
+            // Edited elsewhere; the next save reports it
+            base.conflict = true;
+        }
+    }).catch(error => console.error('Autosave failed:', error));
+    await autosaveRequest;
+}
+
+async function flushDraft(base) {
+    // Writes any buffered draft and moves the base to the version that holds it
+    clearTimeout(autosaveTimer);
+    await autosaveRequest;
+    if (!autosaved) {
+        return base;
+    }
+    const response = await fetch(`${API_URL}/notes/${base.noteId}/draft/flush`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${authToken}`
+        },
+        body: JSON.stringify({ base_version: base.version })
+    });
+    if (!response.ok) {
+        return response;
+    }
+    const version = (await response.json()).note.version;
+    return version === base.version ? base : { ...base, version, ...autosaved };
+}
+
 function toggleTag(element) {
     element.classList.toggle('selected');
 }
 
+function codePointLength(text) {
+    let length = 0;
+    for (const _ of text) {
+        length++;
+    }
+    return length;
+}
+
+function diffContent(base, content) {
+    // One edit replacing the changed middle; offsets are in code points, like the server
+    const max = Math.min(base.length, content.length);
+    let start = 0;
+    while (start < max && base.charCodeAt(start) === content.charCodeAt(start)) {
+        start++;
+    }
+    let end = 0;
+    while (end < max - start &&
+           base.charCodeAt(base.length - 1 - end) === content.charCodeAt(content.length - 1 - end)) {
+        end++;
+    }
+    // Never split a surrogate pair
+    const isHigh = code => code >= 0xD800 && code <= 0xDBFF;
+    const isLow = code => code >= 0xDC00 && code <= 0xDFFF;
+    if (start > 0 && isHigh(base.charCodeAt(start - 1))) {
+        start--;
+    }
+    if (end > 0 && isLow(base.charCodeAt(base.length - end))) {
+        end--;
+    }
+    return [{
+        offset: codePointLength(base.slice(0, start)),
+        delete: codePointLength(base.slice(start, base.length - end)),
+        insert: content.slice(start, content.length - end)
+    }];
+}
+
+async function saveNoteEdits(base, title, content, tagIds) {
+    // Sends only what changed: title/tags as JSON, the body as a text patch
+    const headers = {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${authToken}`
+    };
+    let version = base.version;
+    let response = null;
+    
+    if (title !== base.title || tagIds.join() !== base.tagIds.join()) {
+        response = await fetch(`${API_URL}/notes/${base.noteId}`, {
+            method: 'PUT',
+            headers: { ...headers, 'If-Match': `"${version}"` },
+            body: JSON.stringify({ title, tag_ids: tagIds })
+        });
+        if (!response.ok) {
+            return response;
+        }
+        version = (await response.json()).note.version;
+    }
+    
+    if (content !== base.content) {
+        response = await fetch(`${API_URL}/notes/${base.noteId}/content`, {
+            method: 'PATCH',
+            headers,
+            body: JSON.stringify({ base_version: version, edits: diffContent(base.content, content) })
+        });
+    }
+    
+    return response;
+}
+
+async function saveWholeNote(noteId, title, content, tagIds) {
+    // Large bodies are streamed separately instead of inside the JSON
+    const largeContent = content.length > LARGE_CONTENT_CHARS;
+    const noteData = {
+        title,
+        tag_ids: tagIds
+    };
+    if (!largeContent) {
+        noteData.content = content;
+    }
+    
+    const url = noteId ? `${API_URL}/notes/${noteId}` : `${API_URL}/notes`;
+    const method = noteId ? 'PUT' : 'POST';
+    const headers = {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${authToken}`
+    };
+    const existing = noteId && allNotes.find(n => n.note_id === parseInt(noteId));
+    if (existing && existing.version) {
+        headers['If-Match'] = `"${existing.version}"`;
+    }
+    
+    let response = await fetch(url, {
+        method,
+        headers,
+        body: JSON.stringify(noteData)
+    });
+    
+    if (response.ok && largeContent) {
+        const saved = (await response.json()).note;
+        response = await fetch(`${API_URL}/notes/${saved.note_id}/content`, {
+            method: 'PUT',
+            headers: {
+                'Content-Type': 'text/plain; charset=utf-8',
+                'Authorization': `Bearer ${authToken}`,
+                'If-Match': `"${saved.version}"`
+            },
+            body: new Blob([content], { type: 'text/plain' })
+        });
+    }
+    
+    return response;
+}
+
 async function saveNote() {
     const noteId = document.getElementById('noteModal').dataset.noteId;
     const title = document.getElementById('noteTitle').value;
@@ -321,28 +698,25 @@ async function saveNote() {
         return;
     }
     
-    const noteData = {
-        title,
-        content,
-        tag_ids: selectedTags
-    };
-    
     try {
-        const url = noteId ? `${API_URL}/notes/${noteId}` : `${API_URL}/notes`;
-        const method = noteId ? 'PUT' : 'POST';
-        
-        const response = await fetch(url, {
-            method,
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${authToken}`
-            },
-            body: JSON.stringify(noteData)
-        });
+        const base = noteId && editorBase && editorBase.noteId === parseInt(noteId) && editorBase.content !== null
+            ? editorBase : null;
+        let response;
+        if (base) {
+            const flushed = await flushDraft(base);
+            response = flushed instanceof Response
+                ? flushed
+                : await saveNoteEdits(flushed, title, content, selectedTags.sort());
+        } else {
+            response = await saveWholeNote(noteId, title, content, selectedTags);
+        }
         
-        if (response.ok) {
+        if (!response || response.ok) {
             closeNoteModal();
-            await loadDashboardData();
+            await syncNotes();
+        } else if (response.status === 409) {
+            alert('This note was changed elsewhere. The latest version has been loaded; please reapply your edits.');
+            await syncNotes();
         } else {
             const data = await response.json();
             alert(data.error || 'Failed to save note');
@@ -364,7 +738,7 @@ async function updateNoteStatus(noteId, status) {
         });
         
         if (response.ok) {
-            await loadDashboardData();
+            await syncNotes();
         }
     } catch (error) {
         console.error('Failed to update note status:', error);
@@ -383,7 +757,7 @@ async function deleteNote(noteId) {
         });
         
         if (response.ok) {
-            await loadDashboardData();
+            await syncNotes();
         }
     } catch (error) {
         console.error('Failed to delete note:', error);